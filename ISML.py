@@ -1,204 +1,377 @@
 import os
-from shutil import copytree, rmtree, copy
+import sys
+import time
+import getpass
+import hashlib
+import tempfile
+import threading
+import subprocess
+from shutil import rmtree
 from functools import partial
-
-import pymel.core as pm
-import maya.cmds as cmds
-import maya.mel as mel
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+# The library itself doesn't use Maya and is in ISMLcore. This module is the Maya UI on top of it.
+import ISMLcore
+from ISMLcore import (docDirLok, docDirShared, loadConfigFile, writeConfigFile, mergeDirectoryLists, formatBytes,
+                      copyAndLinkTexturesInMaFile, relinkJournalPath, planRelinkJob, formatRelinkReport, runRelinkJob, libraryDataDirName,
+                      catalogFileName, replaceFile, iterDirEntries, iconMtimes, scanShaderDirectory, scanShaderDirectories,
+                      writeShaderMetadata, migrateHeaderMetadata, getShaderMetadata, invalidateShaderMetadata,
+                      newSearchIndex, addToSearchIndex, removeFromSearchIndex, getSearchIndexFields, searchIndex, renderQueueDir,
+                      renderBackends, queueIconRenders, recoverRenderJobs, runRenderWorker, collectFailedRenders, versionIndex, getShaderVersions,
+                      getLatestVersionPath, reserveVersionPath, publishReservedVersion, releaseVersionPath, addShaderVersion, packVersion,
+                      packOldVersions, materializeVersion, releaseVersion,
+                      syncJournalPath, planSync, runSync, formatSyncStats, exportArchive, importArchive, lockedFile, copyFileAtomic, touchShaderDir,
+                      textureAudit, auditTextures, formatAuditReport, findDuplicates, formatDuplicateReport, startTaskExecutor, submitTask,
+                      cancelTask, getActiveTasks, profiled, setProfiling, profileRecords, profileLogPath, readProfileLog, summarizeProfile,
+                      formatProfileSummary)
 
 
 # Global variables
 iconButtons = []
 deleteOptions = []
-iconlessButtons = []
-globalDirectoryList = []
+indexedShaderPaths = {}  # Icon name -> newest shader version, for updating the search index after metadata changes
+displayedDirectoryList = []  # The directory list the icons on screen were created from
+layoutIcons = {}  # Layout -> [(icon name, icon arguments)] of all icons of the tab, top to bottom
+iconSlots = {}  # Layout -> names of the icon buttons of the layout, top to bottom. They are reused for whichever icons are shown.
+slotStates = {}  # Icon button name -> (icon name, shader folder, icon path, icon mtime) it shows, or None if it's hidden
+firstShownIcons = {}  # Layout -> position of the first shown icon among the icons passing the filter
+iconFilter = None  # Returns if an icon name passes the current filter. None shows all icons.
+filterAuditTask = None  # Texture audit started by the textures filter
+lastWatchSignature = None
+
+# Stop the directory watcher of a previous reload(ISML) before its globals are reset.
+if globals().get("watcherStop") is not None:
+    watcherStop.set()
+watcherStop = None
+
+
+# Maya is imported and the config files are read the first time the UI is created, not when ISML is imported.
+pm = None
+cmds = None
+mel = None
+maya = None
 dirSetSh = set()
 dirSetLoc = set()
+globalDirectoryList = []
 
 
-# Open the config file and get dir list.
-docDirLok = "%s/maya/2020/scripts/ISMLconfig.txt" % os.environ.get("HOME")
-docDirShared = "O:/Maya/MayaScripts/ISML/ISMLconfig.txt"
+def importMaya():
+    global pm, cmds, mel, maya
+    if pm is None:
+        import pymel.core as pm
+        import maya.cmds as cmds
+        import maya.mel as mel
+        import maya.utils
 
-with open(docDirShared, "r") as configFileShared:  # Get paths from the shared config file in Addons.
-    for line in configFileShared:
-        if not line.startswith("#"):
-            if line.strip() != "":
-                line = line.strip()
-                splitIn = line.find("# ")
-                dirSetSh.add((line[splitIn+2 :], line[: splitIn]))
 
-with open(docDirLok, "r") as configFileLokal:  # Get paths from the local config file.
-    for line in configFileLokal:
-        if not line.startswith("#"):
-            if line.strip() != "":
-                line = line.strip()
-                splitIn = line.find("# ")
-                dirSetLoc.add((line[splitIn+2 :], line[: splitIn]))
+# Open the config files and get dir list. ISMLcore caches them, so a reload only checks their mtime.
+def loadConfig():
+    global dirSetSh, dirSetLoc, globalDirectoryList
+    dirSetSh, warningSh = loadConfigFile(docDirShared)  # Get paths from the shared config file in Addons.
+    dirSetLoc, warningLok = loadConfigFile(docDirLok)  # Get paths from the local config file.
+    for warning in (warningSh, warningLok):
+        if warning is not None:
+            pm.warning(warning)
+    globalDirectoryList = mergeDirectoryLists(dirSetSh, dirSetLoc)
 
 
-# Merge paths
-for both in dirSetSh.intersection(dirSetLoc):
-    both = list(both)
-    both.append("Both")
-    globalDirectoryList.append(both)
+""" Disk work of the UI runs on the task worker of ISMLcore, so a slow share doesn't freeze Maya. Results come back through executeDeferred.
+The task bar under the filters shows the running task and its progress and can cancel it.
+"""
 
-for shared in dirSetSh.difference(dirSetLoc):
-    shared = list(shared)
-    shared.append("Shared")
-    globalDirectoryList.append(shared)
+taskExecutor = None
 
-for local in dirSetLoc.difference(dirSetSh):
-    local = list(local)
-    local.append("Local")
-    globalDirectoryList.append(local)
 
+def runTask(name, func, onDone=None, withProgress=False):
+    global taskExecutor
+    if taskExecutor is None:
+        taskExecutor = startTaskExecutor(maya.utils.executeDeferred, showTaskProgress)
+    return submitTask(taskExecutor, name, func, onDone, partial(taskFailed, name), withProgress)
 
-""" The following functions are for copying textures to the material folder
-and renaming texture nodes inside the .ma file.
-"""
 
+def taskFailed(name, ex):
+    pm.warning("%s failed! :%s" % (name, ex))
 
-# Copy textures to shader dir
-def copyTexturesToShaderDir(oldPath, newPath):
-    try:
-        copy(oldPath, newPath)
-        return True
-    except Exception as ex:
-        pm.warning("%s cannot be copied! :\n%s" % (os.path.basename(oldPath), ex))
-    return False
 
+def showTaskProgress(task):
+    if not pm.text("taskStatusText", ex=True):  # The library window was closed.
+        return
+    tasks = getActiveTasks(taskExecutor)
+    if tasks == []:
+        pm.text("taskStatusText", e=True, l="")
+        pm.progressBar("taskProgressBar", e=True, pr=0)
+        pm.button("taskCancelButton", e=True, en=False)
+        return
+    status = "%s..." % tasks[0]["name"]
+    progress = tasks[0]["progress"]
+    percent = 0
+    if progress is not None:
+        doneFiles, totalFiles, doneBytes, totalBytes = progress
+        status += "  %s / %s files, %s / %s" % (doneFiles, totalFiles, formatBytes(doneBytes), formatBytes(totalBytes))
+        percent = int(100.0 * doneBytes / totalBytes) if totalBytes else int(100.0 * doneFiles / max(totalFiles, 1))
+    if len(tasks) > 1:
+        status += "  (%s more)" % (len(tasks) - 1)
+    pm.text("taskStatusText", e=True, l=status)
+    pm.progressBar("taskProgressBar", e=True, pr=percent)
+    pm.button("taskCancelButton", e=True, en=True)
 
-# Get all texture paths from a .ma file
-def copyAndLinkTexturesInMaFile(maFile, newTextureDirPath):
-    with open(maFile, "r") as mf:
-        writeNew = False
-        newNodeLines = []
-        
-        # Get index of all lines starting with "createNode"
-        i = 0
-        lines = mf.readlines()
-        for line in lines:
-            if line.startswith("createNode"):
-                newNodeLines.append(i)
-            i += 1
-            
-        # Find the end of the last "createNode"
-        for line in lines[newNodeLines[-1]+1 :]:
-            if not line.startswith("	"):
-                newNodeLines.append(lines.index(line))
-                break
-
-        for i in range(len(newNodeLines)-1):
-            ndLine = newNodeLines[i]
-            nextNdLine = newNodeLines[i+1]
-            if lines[ndLine][:15] == "createNode file":
-                for line in lines[ndLine+1 :nextNdLine]:
-                    if line.find('setAttr ".ftn"') != -1:
-                        pathStarti = line[:-3].rfind('"') + 1
-                        oldTexturePath = line[pathStarti:-3]
-                        newTexturePath = os.path.join(newTextureDirPath, os.path.basename(oldTexturePath)).replace("\\","/")
-                        if copyTexturesToShaderDir(oldTexturePath, newTexturePath):
-                            writeNew = True
-                            lnIndex = lines.index(line)
-                            lines[lnIndex] = line.replace(oldTexturePath, newTexturePath)
-    if writeNew:
-        with open(maFile, "w") as wmf:
-            for line in lines:
-                wmf.write(line)
-    else: 
-        pm.warning("No textures found in .ma scene. No changes will be written.")
-
-
-def copyAndReplaceTexturesSingleFile(shaderPath, *args):
+
+def cancelTasksHandler(*args):
+    for task in getActiveTasks(taskExecutor):
+        cancelTask(taskExecutor, task)
+
+
+""" The following functions show the texture copying and relinking of ISMLcore in Maya.
+"""
+
+def showTransferStats(stats):
+    for src, ex in stats["failed"]:
+        pm.warning("%s cannot be copied! :\n%s" % (os.path.basename(src), ex))
+    pm.displayInfo("Textures: %s copied (%s), %s linked (%s), %s already at the shader location (%s)" % (stats["copied"], formatBytes(stats["bytesCopied"]), stats["linked"], formatBytes(stats["bytesLinked"]), stats["skipped"], formatBytes(stats["bytesSkipped"])))
+
+
+# Runs on the task worker, the warnings are shown afterwards.
+def copyAndReplaceTexturesSingleFile(shaderPath, warnings):
     shaderDir = os.path.dirname(shaderPath)
     
     # Make texture folder in the shader folder if it doesnt exist.
     texturePath = "%s/textures" % shaderDir
     if not os.path.exists(texturePath):
         os.mkdir(texturePath)
-    copyAndLinkTexturesInMaFile(shaderPath, texturePath)
+    return copyAndLinkTexturesInMaFile(shaderPath, texturePath, warnings=warnings)
 
 
-def copyAndReplaceTextures(iconButtons, *args):
-    for iconButton in iconButtons:
-        shaderPath = iconButton.getDocTag().split("\n")[-1]
-        shaderDir = os.path.dirname(shaderPath)
-        
-        # Same as in the function above
-        texturePath = "%s/textures" % shaderDir
-        if not os.path.exists(texturePath):
-            os.mkdir(texturePath)
-        copyAndLinkTexturesInMaFile(shaderPath, texturePath)
+def copyAndReplaceTextures(shaderPaths, *args):
+    runTask("Reading textures of %s shaders" % len(shaderPaths), partial(planRelinkJob, shaderPaths), onDone=confirmRelinkJob)
+
+
+def confirmRelinkJob(job):
+    answer = pm.confirmDialog(t="Relink All Textures", m="%s textures (%s) will be copied to the shader folders of %s shaders.\n%s textures are missing, %s scenes can't be read." % (
+                                  job["files"], formatBytes(job["bytes"]), len(job["shaders"]), len(job["missing"]), len(job["unreadable"])),
+                              b=["Relink", "Report Only", "Cancel"], db="Relink", cb="Cancel", ds="Cancel")
+    if answer == "Report Only":
+        print(formatRelinkReport(job))
+        pm.displayInfo("The report was written to the script editor.")
+        return
+    if answer != "Relink":
+        return
+    runTask("Relinking textures", partial(runRelinkJob, job, relinkJournalPath), onDone=showTransferStats, withProgress=True)
 
 
 def MoveAllTexturesHandler(*args):
-    copyAndReplaceTextures(iconButtons)
+    copyAndReplaceTextures(sorted(set(indexedShaderPaths.values())))  # Also contains the icons that weren't created yet
 
 
-""" Given a path the following function, goes trough all of the paths folders and ignores files. Then goes trough all found folders
-and if they contain a maya scene file, saves it in a list. Additionaly, if a png image is found, then it is also stored in a list to be used as an icon.
-"""
+# Commands for the filter options. The textures filter audits the library the first time it is used and filters once the audit is done.
+def filterC(*args):
+    global filterAuditTask
+    if pm.optionMenu("textureFilter", q=True, v=True) != "All" and not any(shaderPath in textureAudit for shaderPath in indexedShaderPaths.values()):
+        if filterAuditTask is None or filterAuditTask["state"] not in ("queued", "running"):  # Typing in the search field doesn't start more audits
+            filterAuditTask = runTextureAudit(applyFilter)
+        return
+    applyFilter()
+
+
+def applyFilter(*args):
+    if not pm.optionMenu("textureFilter", ex=True):
+        return
+    project = pm.optionMenu("projectFilter", q=True, v=True)
+    tag = pm.optionMenu("tagOpMenu", q=True, v=True)
+    searchStr = pm.textField("shaderSearchField",q=True, tx=True)
+    textures = pm.optionMenu("textureFilter", q=True, v=True)
+    filterIcons(project, tag, searchStr, textures)
+
+
+def runTextureAudit(onDone):
+    warnings = []
+    return runTask("Checking textures", partial(auditTextures, [dir[0] for dir in globalDirectoryList], warnings), onDone=partial(textureAuditDone, warnings, onDone))
+
+
+def textureAuditDone(warnings, onDone, broken):
+    for warning in warnings:
+        pm.warning(warning)
+    onDone(broken)
+
+
+def auditTexturesHandler(*args):
+    runTextureAudit(showAuditResult)
+
+
+def showAuditResult(broken):
+    if broken == {}:
+        pm.displayInfo("No shader has missing textures.")
+        return
+    print(formatAuditReport(broken))
+    pm.optionMenu("textureFilter", e=True, v="Missing")
+    applyFilter()
+    pm.displayInfo("%s shaders have missing textures. The list was written to the script editor." % len(broken))
+
+
+def findDuplicatesHandler(*args):
+    warnings = []
+    runTask("Comparing shaders", partial(findDuplicates, [dir[0] for dir in globalDirectoryList], warnings), onDone=partial(showDuplicateReport, warnings))
+
+
+def showDuplicateReport(warnings, report):
+    for warning in warnings:
+        pm.warning(warning)
+    print(formatDuplicateReport(report))
+    pm.displayInfo("%s duplicate and %s similar shaders, %s duplicate textures, %s can be freed. The list was written to the script editor."
+                   % (sum(len(group) - 1 for group in report["exact"]), sum(len(group) - 1 for group in report["near"]), len(report["textures"]), formatBytes(report["reclaimableBytes"])))
+
+
+def toggleProfiling(*args):
+    setProfiling(pm.menuItem("profilingMItem", q=True, cb=True))
+
 
-def updatePathList(shaderDirDefaultPath):
-    mtlPathList = []
-    mtlIconPathList = []
+# Shows the timings of this session, or of the whole log, which also has the ones of earlier sessions.
+def profileSummaryWindow(*args):
+    createWindow(name="profileWindow", title="Timings", menuBar=False)
+    pm.columnLayout(cat=["both", 5])
+    pm.text(l="Log: %s" % profileLogPath, al="left")
+    summaryField = pm.scrollField("profileSummaryField", w=1000, h=300, ed=False, ww=False, fn="fixedWidthFont")
     
-    # Get all directories inside path
-    try:
-        shaderDirs = os.listdir(shaderDirDefaultPath)
-    except Exception as ex:
-        pm.warning("Path %s was not found! :%s" % (shaderDirDefaultPath, ex))
-        shaderDirs = []
-    
-    for dirName in shaderDirs:
-        mtlDir = os.path.join(shaderDirDefaultPath,dirName)  # Gets folder with material and icon
-        if os.path.isdir(mtlDir):
-            mtlFiles = sorted(os.listdir(mtlDir))  # Gets material and icon
-            if len(mtlFiles)>0:
-                mtl = []
-                mtlIcon = "blinn.svg"
-                for mtlFileName in mtlFiles:
-                    mtlFilePath = os.path.join(mtlDir,mtlFileName)
-                    if os.path.isfile(mtlFilePath):
-                        if os.path.splitext(mtlFilePath)[1] == '.ma' or os.path.splitext(mtlFilePath)[1] == '.mb':
-                            mtl.append(mtlFilePath)
-                        if os.path.splitext(mtlFilePath)[1] == '.png':
-                            mtlIcon = mtlFilePath
-                if mtl != []:
-                    mtlPathList.append(mtl)
-                    mtlIconPathList.append(mtlIcon)
-    return [mtlPathList, mtlIconPathList]
-
-
-# Write MaterialTag on the second line of the ma file.
+    def showSummary(records):
+        summaryField.setText(formatProfileSummary(summarizeProfile(records)) if records != [] else "Nothing was recorded. Turn on \"Record Timings\" first.")
+    
+    def showSession(*args):
+        showSummary(list(profileRecords))
+    
+    def showLog(*args):
+        showSummary(readProfileLog())
+    
+    def clearSession(*args):
+        profileRecords.clear()
+        showSummary([])
+    
+    pm.rowLayout(nc=3)
+    pm.button(l="This Session", w=100, c=partial(showSession))
+    pm.button(l="Whole Log", w=100, c=partial(showLog))
+    pm.button(l="Clear Session", w=100, c=partial(clearSession))
+    pm.setParent("..")
+    showSession()
+    pm.showWindow("profileWindow")
+
+
+def toggleTextureStore(*args):
+    ISMLcore.useTextureStore = pm.menuItem("textureStoreMItem", q=True, cb=True)
+
+
+def toggleVersionStore(*args):
+    ISMLcore.useVersionStore = pm.menuItem("versionStoreMItem", q=True, cb=True)
+
+
+def packOldVersionsHandler(*args):
+    warnings = []
+    runTask("Packing old versions", partial(packOldVersions, [dir[0] for dir in globalDirectoryList], warnings), onDone=partial(oldVersionsPacked, warnings))
+
+
+def oldVersionsPacked(warnings, result):
+    packed, savedBytes = result
+    for warning in warnings:
+        pm.warning(warning)
+    pm.displayInfo("%s old versions were packed, %s saved." % (packed, formatBytes(savedBytes)))
+
+
+# Exports the shaders that pass the current filter. They must all be in the same shader directory.
+def exportArchiveHandler(*args):
+    mtlDirs = sorted(set(os.path.dirname(shaderPath) for buttonName, shaderPath in indexedShaderPaths.items() if iconFilter is None or iconFilter(buttonName)))
+    shaderDirs = set(os.path.dirname(mtlDir) for mtlDir in mtlDirs)
+    if len(shaderDirs) != 1:
+        pm.warning("Choose a single project in the project filter first!")
+        return
+    archivePath = pm.fileDialog2(cap="Export Archive", fm=0, ff="Zip Archives (*.zip)", okc="Export")
+    if archivePath is None:
+        return
+    
+    warnings = []
+    runTask("Writing archive %s" % os.path.basename(archivePath[0]), partial(exportArchive, shaderDirs.pop(), archivePath[0], warnings, [os.path.basename(mtlDir) for mtlDir in mtlDirs]),
+            onDone=partial(archiveExported, mtlDirs, archivePath[0], warnings), withProgress=True)
+
+
+def archiveExported(mtlDirs, archivePath, warnings, result):
+    for warning in warnings:
+        pm.warning(warning)
+    if result is not None:
+        pm.displayInfo("%s shaders, %s files (%s) were exported to %s." % (len(mtlDirs), result[0], formatBytes(result[1]), archivePath))
+
+
+def importArchiveHandler(*args):
+    archivePath = pm.fileDialog2(cap="Import Archive", fm=1, ff="Zip Archives (*.zip)", okc="Select")
+    if archivePath is None:
+        return
+    shaderDir = pm.fileDialog2(cap="Import Into Shader Directory", fm=3, okc="Import")
+    if shaderDir is None:
+        return
+    
+    warnings = []
+    runTask("Extracting archive %s" % os.path.basename(archivePath[0]), partial(importArchive, archivePath[0], shaderDir[0], warnings),
+            onDone=partial(archiveImported, shaderDir[0], warnings), withProgress=True)
+
+
+def archiveImported(shaderDir, warnings, extracted):
+    for warning in warnings:
+        pm.warning(warning)
+    if extracted is None:
+        return  # Importing it again continues where it stopped
+    pm.displayInfo("%s files were extracted to %s." % (extracted, shaderDir))
+    if os.path.normcase(os.path.normpath(shaderDir)) not in [os.path.normcase(os.path.normpath(dir[0])) for dir in globalDirectoryList]:
+        pm.warning("%s is not in the directory list, add it to see the imported shaders." % shaderDir)
+    updateShaderTab()
+
+
+# Scans run on the task worker. The caller shows the warnings on the main thread.
+@profiled
+def updatePathList(shaderDirDefaultPath, warnings):
+    return scanShaderDirectory(shaderDirDefaultPath, warnings)
+
+
+# Scans all shader directories at the same time. Directories that didn't finish within the timeout are missing from the result.
+@profiled
+def updatePathLists(shaderDirs, warnings, timeout=None):
+    return scanShaderDirectories(shaderDirs, warnings, timeout)
+
+
+# Scans the shader directories for the tabs and returns the path lists with the directory signature of the watcher. It is taken before the scan,
+# so a change during the scan is found by the next poll.
+def scanForTabs(dirList, shaderDirs, warnings):
+    signature = getDirectorySignature(dirList)
+    return updatePathLists(shaderDirs, warnings), signature
+
+
+# Write MaterialTag
 def rewriteWithTag(shaderPath, tag):
-    with open(shaderPath, "r") as shaderFile:
-                    f = shaderFile.readlines()
-                    splitLine = 1
-                    if f[1][:14] == "//MaterialTag:":
-                        splitLine = 2   
-                    with open(shaderPath, "w") as newFile:
-                        newFile.write(f[0])
-                        newFile.write("//MaterialTag: %s\n" % tag)
-                        for line in f[splitLine:]:
-                            newFile.write(line)
-
-
-# Write a comment in the ma file.
+    runTask("Writing tag of %s" % os.path.basename(shaderPath), partial(writeShaderMetadata, shaderPath, tag=tag), onDone=partial(metadataWritten, shaderPath))
+
+
+# Write a comment
 def rewriteWithComment(shaderPath, comment):
-    comment = comment.replace("\n", "__nwlne__")
-    with open( shaderPath , "r" ) as shaderFile:
-                    f = shaderFile.readlines()
-                    splitLine = 2
-                    if f[2][:9] == "//ShComm:":
-                        splitLine = 3   
-                    with open(shaderPath, "w") as newFile:
-                        newFile.write(f[0])
-                        newFile.write(f[1])
-                        newFile.write("//ShComm: %s\n" % comment)
-                        for line in f[splitLine:]:
-                            newFile.write(line)
+    runTask("Writing comment of %s" % os.path.basename(shaderPath), partial(writeShaderMetadata, shaderPath, comment=comment), onDone=partial(metadataWritten, shaderPath))
+
+
+def metadataWritten(shaderPath, changed):
+    if changed:
+        reindexShaderPath(shaderPath)
+
+
+# Returns the newest version of a shader folder with its tag and comment. Runs on the task worker.
+def readLatestMetadata(mtlDir):
+    shaderPath = getLatestVersionPath(mtlDir)
+    return (shaderPath,) + getShaderMetadata(shaderPath, validate=True)
+
+
+def migrateHeaderMetadataHandler(*args):
+    warnings = []
+    runTask("Moving tags and comments", partial(migrateHeaderMetadata, [dir[0] for dir in globalDirectoryList], warnings), onDone=partial(headerMetadataMigrated, warnings))
+
+
+def headerMetadataMigrated(warnings, migrated):
+    for warning in warnings:
+        pm.warning(warning)
+    pm.displayInfo("Tags and comments of %s shaders were moved to metadata files." % migrated)
 
 
 """ Following functions are related to UI functionality
@@ -252,6 +425,8 @@ def exportOptionsWindow(*args):
         
     def okCommand(*args):
         shaderPath = exportSG()
+        if not shaderPath:
+            return
         opMenuVal = pm.optionMenu("expTagOpMenu",q=True, v=True)
         if opMenuVal != "None":
             rewriteWithTag(shaderPath, opMenuVal)
@@ -267,10 +442,12 @@ def exportOptionsWindow(*args):
 
 
 # Functions related to exporting
-def exportWithoutUVChoosers(shaderPath):
+@profiled
+def exportWithoutUVChoosers():
     """UVChooser nodes need to be disconnected since they are tied to meshes in the scene
     and will drag these meshes allong when exporting.  Only the Shader nodes must be exported.
     All connections must then be reconnected.
+    The selection is exported to the local temp folder, whose path is returned. publishExport() copies it to the shader directory on the task worker.
     """
     transformNodes = listNodeTypesFromNetwork(pm.ls(sl=True)[0], "transform")
     tNodesOutputs = set()
@@ -289,18 +466,54 @@ def exportWithoutUVChoosers(shaderPath):
     for connection in connectionLists:
         pm.disconnectAttr(connection[0])
    
-    cmds.file(shaderPath, op="v=0;", typ="mayaAscii", pr=True, es=True)  # Bugged in pymel, so cmds instead.
-    
-    # Reconnect all disconnected attributes using the connectionLists variable
-    for connection in connectionLists:
-        pm.connectAttr(connection[1],connection[0])
-    
-    # If selected, copy all connected textures to shader dir and change all texture node paths
+    # Exported to the local temp folder first and then copied over the shader, so nobody reads a half written scene from the shared drive.
+    exportFile, exportPath = tempfile.mkstemp(".ma", "ISMLexport")  # Unique, the copy of the previous export may still be queued
+    os.close(exportFile)
+    try:
+        cmds.file(exportPath, f=True, op="v=0;", typ="mayaAscii", pr=True, es=True)  # Bugged in pymel, so cmds instead.
+    except Exception:
+        os.remove(exportPath)
+        raise
+    finally:
+        # Reconnect all disconnected attributes using the connectionLists variable
+        for connection in connectionLists:
+            pm.connectAttr(connection[1],connection[0])
+    return exportPath
+
+
+# If selected, all connected textures are copied to the shader dir and the texture node paths are changed.
+def getCopyTexturesOption():
     if pm.checkBox("copyTexturesCheckBox", ex=True):
-        if pm.checkBox("copyTexturesCheckBox", q=True, v=True):
-            copyAndReplaceTexturesSingleFile(shaderPath)
-    else:
-        pm.warning("Textures will not be copied to shader location when exporting new version or overriding!")
+        return pm.checkBox("copyTexturesCheckBox", q=True, v=True)
+    pm.warning("Textures will not be copied to shader location when exporting new version or overriding!")
+    return False
+
+
+# Copies an exported scene over a shader file and, if wanted, the textures it uses to the shader folder. Runs on the task worker.
+@profiled
+def publishExport(exportPath, shaderPath, copyTextures, warnings, reserved=False):
+    try:
+        if not os.path.exists(os.path.dirname(shaderPath)):
+            os.mkdir(os.path.dirname(shaderPath))
+        with lockedFile(shaderPath):
+            if reserved:
+                publishReservedVersion(exportPath, shaderPath)
+            else:
+                copyFileAtomic(exportPath, shaderPath)
+                touchShaderDir(os.path.dirname(shaderPath))
+    finally:
+        if os.path.exists(exportPath):
+            os.remove(exportPath)
+    if copyTextures:
+        return copyAndReplaceTexturesSingleFile(shaderPath, warnings)
+    return None
+
+
+def exportPublished(warnings, stats):
+    for warning in warnings:
+        pm.warning(warning)
+    if stats is not None:
+        showTransferStats(stats)
 
 
 # Lists all objects of a certan type, that are connected to a node. Is used to get meshes, that have the material assigned.
@@ -326,45 +539,76 @@ def exportSG(*args):
     fileName = os.path.splitext(shaderPath[1])
     shaderDir = os.path.join(shaderPath[0], fileName[0])
     shaderPath = os.path.join(shaderDir, shaderPath[1])
-
-    if not os.path.exists(shaderDir):
-        os.mkdir(shaderDir)
     
-    exportWithoutUVChoosers(shaderPath)  
-   
-    # Refresh and exit
-    refreshShaderTab()
+    exportPath = exportWithoutUVChoosers()
+    warnings = []
+    runTask("Exporting %s" % fileName[0], partial(publishExport, exportPath, shaderPath, getCopyTexturesOption(), warnings), onDone=partial(shaderExported, warnings))
     return shaderPath
 
 
-# Read Tags
-def readTagLine(iconLink, skipLines=1):  # The tag is written on the second line of the ma file
-    with open(iconLink, "r") as mf:
-        for skipLn in range(skipLines):
-            mf.readline()
-        tagLine = mf.readline()
-    return tagLine
+# Refreshes the tab once the exported shader is on the share.
+def shaderExported(warnings, stats):
+    exportPublished(warnings, stats)
+    updateShaderTab()
+
+
+shaderSearchIndex = newSearchIndex()
+
+
+# Adds an icon button to the search index, with the tag and comment of its newest shader version.
+def indexIconButton(buttonName, shaderName, project, newestShaderVersion):
+    tag, comment = getShaderMetadata(newestShaderVersion)
+    addToSearchIndex(shaderSearchIndex, buttonName, name=shaderName, tag=tag, project=project, comment=comment)
+    indexedShaderPaths[buttonName] = newestShaderVersion
+
+
+def unindexIconButton(buttonName):
+    removeFromSearchIndex(shaderSearchIndex, buttonName)
+    indexedShaderPaths.pop(buttonName, None)
+
+
+# Updates the search index after the tag or comment of a shader changed, or after a new version was exported. Both apply to the whole shader folder.
+def reindexShaderPath(shaderPath):
+    for buttonName, newestShaderVersion in list(indexedShaderPaths.items()):
+        if os.path.dirname(newestShaderVersion) == os.path.dirname(shaderPath):
+            fields = getSearchIndexFields(shaderSearchIndex, buttonName)
+            indexIconButton(buttonName, fields["name"], fields["project"], shaderPath)
 
 
 # Filter by everything
-def filterIcons(iconList, project, tag, searchStr):
-    for icon in iconList:
-        # Get project of material
-        projectName = icon[icon.find("__pr_")+5 :]
-        # Get tag from the ma file
-        iconLink = pm.iconTextButton(icon, q=True, dtg=True).split("\n")[-1]
-        tagLine = readTagLine(iconLink).replace("//MaterialTag: ", "").strip("\n")
-        # Get name of icon
-        iconName = pm.iconTextButton(icon, q=True, l=True)
-        
-        pm.iconTextButton(icon, e=True, vis=False)
-        if projectName == project or project == "All":
-            if tagLine == str(tag) or tag == "All":
-                if iconName.lower().find(searchStr.lower()) != -1 or searchStr == "":
-                    pm.iconTextButton(icon, e=True, vis=True)
+@profiled
+def filterIcons(project, tag, searchStr, textures="All"):
+    """Name, tag, project and comment are all taken from the search index, so filtering doesn't open any files or query the icons.
+    The textures filter uses the result of the last texture audit. The filtered icons of every tab are shown from the top.
+    """
+    global iconFilter
+    matches = searchIndex(shaderSearchIndex, searchStr)
+    
+    def passesTextureFilter(icon):
+        if textures == "All":
+            return True
+        missing = textureAudit.get(indexedShaderPaths.get(icon))
+        if textures == "Missing":
+            return bool(missing)
+        return missing == []
+    
+    def passesFilter(icon):
+        fields = getSearchIndexFields(shaderSearchIndex, icon)
+        if icon in matches and fields is not None:
+            if fields["project"] == project or project == "All":
+                if fields["tag"] == str(tag) or tag == "All":
+                    return passesTextureFilter(icon)
+        return False
+    
+    iconFilter = None
+    if project != "All" or tag != "All" or searchStr.strip() != "" or textures != "All":
+        iconFilter = passesFilter
+    for layout in tabLayouts.values():
+        showIcons(layout, 0)
 
 
 # Import shader
+@profiled
 def importShader(path, *args):
     importedNodes = cmds.file(path, i=True, mergeNamespaceWithRoot=True, rpr="tprfx", rnn=True)
     shaderNodes = []
@@ -392,9 +636,14 @@ def importRenameShader(path, *args):
         renamingWindow(importedNodes,"tprfx_")
 
 
+# Imports the newest version of a shader folder. Used by the icon buttons, so they don't have to change when a new version is exported.
+def importLatestVersion(mtlDir, *args):
+    importRenameShader(getLatestVersionPath(mtlDir))
+
+
 # Import/Assign shader
 def importAssignShader(iconButton, selOverride, *args):  # Uses cmds in some places because of pyMel bug for some commands.
-    path = iconButton.getDocTag().split("\n")[-1]
+    path = getShPath(iconButton)
     
     if not selOverride:
         sel = cmds.ls(selection=True)  # Sets doesn't work if its pm
@@ -426,108 +675,216 @@ def vrRenderOutput(renderPath):
     mel.eval('vray vfbControl -saveimage "%s";' % renderPath)  # This can only be done with mel. May change in newer versions of vRay...
 
 
-# Assigns shaders to shader ball and renders them.
-def assignRenderIcons(toAssign, *args):
-    for shader in toAssign:
-        importAssignShader(shader, "shaderBall")
-        iconPath = os.path.split(shader.getDocTag().split("\n")[-1])
-        iName = "%s_icon.png" % os.path.splitext(iconPath[1])[0]
-        iconPath = os.path.join(iconPath[0], iName)
-        vrRenderOutput(iconPath.replace("\\", "/"))
+# Renders the scene with the output settings of V-Ray, since there is no VFB in mayapy. The image is written under a temporary name
+# and then renamed to renderPath, so a failed render doesn't remove the old icon.
+def vrRenderBatchOutput(renderPath):
+    if not cmds.objExists("vraySettings"):
+        mel.eval("vrayCreateVRaySettingsNode();")
+    tempPrefix = "%s.%s" % (os.path.splitext(renderPath)[0], os.getpid())
+    cmds.setAttr("defaultRenderGlobals.currentRenderer", "vray", type="string")
+    cmds.setAttr("vraySettings.animType", 0)  # A single frame, without a frame number in the file name
+    cmds.setAttr("vraySettings.dontSaveImage", 0)
+    cmds.setAttr("vraySettings.imageFormatStr", "png", type="string")
+    cmds.setAttr("vraySettings.fileNamePrefix", tempPrefix, type="string")
+    pm.vrend()
+    if not os.path.isfile(tempPrefix + ".png"):
+        raise RuntimeError("V-Ray didn't write %s.png" % tempPrefix)
+    replaceFile(tempPrefix + ".png", renderPath)
+
+
+""" Icons are rendered in the background by the render queue of ISMLcore, so rendering doesn't block the Maya session.
+Up to "renderWorkers" mayapy processes run this script with "--render-worker". Every job opens the template scene with the "shaderBall" mesh,
+assigns the shader and renders it with V-Ray.
+"""
+
+renderTemplateScene = os.path.join(os.path.dirname(docDirShared), "ISMLshaderBall.ma")
+renderWorkers = 2  # mayapy processes rendering at the same time
+renderBackend = "vray"
+mayapyPath = os.path.join(os.environ.get("MAYA_LOCATION", ""), "bin", "mayapy")
+renderProcesses = []
+
+
+# Opens the template scene, assigns the shader to "shaderBall" and renders it with V-Ray.
+def renderIconVray(shaderPath, iconPath, templateScene):
+    if not cmds.pluginInfo("vrayformaya", q=True, l=True):
+        cmds.loadPlugin("vrayformaya")
+    cmds.file(templateScene, o=True, f=True)
+    importedNodes = importShader(shaderPath)
+    mtlSG = ""
+    for node in importedNodes:
+        if pm.nodeType(node) == "shadingEngine":
+            mtlSG = node
+            break
+    if mtlSG == "":
+        raise RuntimeError("No Shading Group found in %s" % shaderPath)
+    cmds.sets("shaderBall", e=True, fe=mtlSG)
+    vrRenderBatchOutput(iconPath.replace("\\", "/"))
+
+
+renderBackends["vray"] = renderIconVray
+
+
+# Starts the worker processes. Their output goes to a log file in the queue folder.
+def startRenderWorkers(count=None):
+    global renderProcesses
+    renderProcesses = [process for process in renderProcesses if process.poll() is None]
+    if renderProcesses == []:
+        recoverRenderJobs(renderQueueDir)
+    
+    scriptPath = os.path.splitext(os.path.abspath(__file__))[0] + ".py"
+    newProcesses = []
+    for i in range(len(renderProcesses), count or renderWorkers):
+        with open(os.path.join(renderQueueDir, "worker%s.log" % i), "w") as logFile:
+            newProcesses.append(subprocess.Popen([mayapyPath, scriptPath, "--render-worker", renderQueueDir], stdout=logFile, stderr=subprocess.STDOUT))
+    renderProcesses += newProcesses
+    
+    thread = threading.Thread(target=waitForRenderWorkers, args=(newProcesses,))
+    thread.daemon = True
+    thread.start()
+
+
+def waitForRenderWorkers(processes):
+    for process in processes:
+        process.wait()
+    maya.utils.executeDeferred(renderWorkersDone)
+
+
+# Shows the new icons once the last worker is done.
+def renderWorkersDone():
+    if any(process.poll() is None for process in renderProcesses):
+        return
+    failed = collectFailedRenders(renderQueueDir)
+    for shaderPath, error in failed:
+        pm.warning("Icon of %s couldn't be rendered! :%s" % (shaderPath, error))
+    if failed != []:
+        pm.warning("%s icons couldn't be rendered. The log files are in %s" % (len(failed), renderQueueDir))
+    else:
+        pm.displayInfo("Icon rendering finished.")
+    updateShaderTab()
 
 
 # Opens a window with all shader versions.
 def importOlderVersion(iconButton, *args): 
+    mtlDir = iconButton.getDocTag()
+    versions = getShaderVersions(mtlDir)
     versionWindow = createWindow(name="versionWindow", title="Import Older Version", maxb=False, menuBar=False, resizeable=False)
     
     def doubleClickImport(*args):
-        importRenameShader(pm.textScrollList("verScrList",q=True, si=True))
+        version = versions[pm.textScrollList("verScrList",q=True, sii=True)[0]-1]
+        try:
+            versionPath = materializeVersion(os.path.join(mtlDir, version["file"]))  # Packed versions are rebuilt first
+        except (IOError, OSError, ValueError) as ex:
+            pm.warning(ex)
+            return
+        try:
+            importRenameShader(versionPath)
+        finally:
+            releaseVersion(versionPath)
+    items = ["%s    %s    %s    %s" % (str(version["number"]).zfill(4), time.strftime("%Y-%m-%d %H:%M", time.localtime(version["mtime"])), version["author"] or "-", version["file"]) for version in versions]
     pm.scrollLayout(w=700,h=500)
     pm.text(l="Double click to select:")
-    pm.textScrollList("verScrList", w=695, h=483, ams=False, a=iconButton.getDocTag().split("\n"), dcc=partial(doubleClickImport))
+    pm.textScrollList("verScrList", w=695, h=483, ams=False, a=items, dcc=partial(doubleClickImport))
     versionWindow.show()
 
 
 # UI content    
 def exportNewVersion(iconButton, override, *args):  # Handles both overwriting and saving new version.
-    shaderPath = iconButton.getDocTag().split("\n")
-    newestVersion = shaderPath[-1]
-    tagLine = readTagLine(newestVersion).strip("\n")
+    mtlDir = iconButton.getDocTag()
+    exportPath = exportWithoutUVChoosers()
+    warnings = []
+    runTask("Exporting %s" % os.path.basename(mtlDir), partial(publishNewVersion, exportPath, mtlDir, override, getCopyTexturesOption(), warnings, getpass.getuser()),
+            onDone=partial(newVersionPublished, warnings))
+
+
+# Copies an exported scene over the newest version of a shader folder, or to a new version. Runs on the task worker.
+def publishNewVersion(exportPath, mtlDir, override, copyTextures, warnings, author):
+    newestVersion = getLatestVersionPath(mtlDir)
+    previousVersion = newestVersion
+    tag, comment = getShaderMetadata(newestVersion, validate=True)
     
     if not override:
-        splitPath = os.path.split(newestVersion)
-        newName = os.path.splitext(splitPath[1])
-        versionNumber = newName[0][-5:]
-        newVersionNumber = "_%s" % str(len(shaderPath)+1).zfill(4)
-        
-        if versionNumber[0] == "_" and versionNumber[1:].isdigit() == True:
-            newName = "%s%s" % (newName[0].replace(versionNumber, newVersionNumber), newName[1])
-            newestVersion = os.path.join(splitPath[0], newName)
-        else:
-            newName = "%s%s%s" % (newName[0], newVersionNumber, newName[1])
-            newestVersion = os.path.join(splitPath[0], newName)
-        shaderPath.append(newestVersion)
-        # Update shader icons in "All"
-        iconButton.setDocTag("\n".join(shaderPath))
-        iconButton.setCommand(partial(importRenameShader, newestVersion))
-        pm.iconTextButton(iconButton.shortName(), e=True, dtg="\n".join(shaderPath))
-        pm.iconTextButton(iconButton.shortName(), e=True, c=partial(importRenameShader, newestVersion))   
-                
-    exportWithoutUVChoosers(newestVersion)
+        try:
+            newestVersion = reserveVersionPath(newestVersion)
+        except OSError as ex:
+            os.remove(exportPath)
+            warnings.append("No new version could be created! :%s" % ex)
+            return None, None
+    try:
+        stats = publishExport(exportPath, newestVersion, copyTextures, warnings, reserved=not override)
+    except Exception:
+        if not override:  # Free the reserved version number again
+            releaseVersionPath(newestVersion)
+        raise
+    invalidateShaderMetadata(newestVersion)
+    
+    # Shaders with the tag in the old scene header need a metadata file, since the new scene has no header.
+    if tag != "" or comment != "":
+        writeShaderMetadata(newestVersion, tag=tag, comment=comment)
+    addShaderVersion(newestVersion, author)
     
-    if tagLine[:14] == "//MaterialTag:":
-        rewriteWithTag(newestVersion, tagLine[15:])
+    if ISMLcore.useVersionStore and not override:
+        try:
+            packVersion(previousVersion)
+        except (IOError, OSError, ValueError) as ex:
+            warnings.append("The previous version could not be packed! :%s" % ex)
+    return newestVersion, stats
+
+
+def newVersionPublished(warnings, result):
+    newestVersion, stats = result
+    if newestVersion is not None:
+        reindexShaderPath(newestVersion)
+    exportPublished(warnings, stats)
 
 
 # Delete the whole shader folder or just the icon image
 
 # Delete folder
 def deleteShader(iconButton, *args):
-    global iconButtons
-    
-    shaderPath = iconButton.getDocTag().split("\n")[-1]
-    shaderDir = os.path.dirname(shaderPath)
-    rmtree(shaderDir)
-    buttonContent = iconButton.getDocTag()
-    for iButton in iconButtons:
-        if buttonContent == iButton.getDocTag():
-            iconButtons.remove(iButton)
-            pm.deleteUI(iButton)
+    shaderDir = iconButton.getDocTag()
+    runTask("Deleting %s" % os.path.basename(shaderDir), partial(rmtree, shaderDir), onDone=partial(shaderDeleted, shaderDir))
+
+
+def shaderDeleted(shaderDir, result):
+    versionIndex.pop(shaderDir, None)
+    for layout in layoutIcons:
+        for iconName, iconArgs in layoutIcons[layout]:
+            if os.path.dirname(iconArgs["shaderPath"][-1]) == shaderDir:
+                unindexIconButton(iconName)
+        layoutIcons[layout] = [(iconName, iconArgs) for iconName, iconArgs in layoutIcons[layout] if os.path.dirname(iconArgs["shaderPath"][-1]) != shaderDir]
+        showIcons(layout)
 
 # Delete icon image
 def deleteIconFile(iconButton, *args):
-    icon = iconButton.getImage()
+    icon = iconSources.get(iconButton.shortName(), iconButton.getImage())
     if icon == "blinn.svg":
         pm.warning("This shader doesn't have an icon.")
     else:
-        try:
-            os.remove(icon)
-            iconButton.setImage("blinn.svg")
-        except Exception as ex:
-            pm.warning(ex)
+        runTask("Deleting icon %s" % os.path.basename(icon), partial(os.remove, icon), onDone=partial(iconFileDeleted, getShownIconName(iconButton)))
+
+
+def iconFileDeleted(iconName, result):
+    for layout in layoutIcons:
+        for name, iconArgs in layoutIcons[layout]:
+            if name == iconName:
+                iconArgs["shaderIcon"] = "blinn.svg"
+                showIcons(layout)
 
 
 # Shader comment related functions
 
-# Gets the path from the doc tag of the icon button.
+# Gets the newest version of the shader folder in the doc tag of the icon button.
 def getShPath(iconButton):
-    return iconButton.getDocTag().split("\n")[-1]
+    return getLatestVersionPath(iconButton.getDocTag())
 
 
-#Read shader comment
-def readComment(iconButton, *args):
-    shaderPath = getShPath(iconButton)
-    commLine = readTagLine(shaderPath, skipLines=2)
-    if commLine[:9] != "//ShComm:":
-        return ""
-    else:
-        return commLine[10:].replace("__nwlne__", "\n")
+#Comment window. It opens once the comment was read.
+def commentWindow(iconButton, *args):
+    runTask("Reading comment", partial(readLatestMetadata, iconButton.getDocTag()), onDone=showCommentWindow)
 
 
-#Comment window
-def commentWindow(iconButton, *args):
-    # Get comment text
-    commentText = readComment(iconButton)
+def showCommentWindow(metadata):
+    shaderPath, shaderTag, commentText = metadata
     # Make comment window UI
     commentWindow = createWindow(name="CommentWindow", title="Comment", minb=False, maxb=False, menuBar=False)
     pm.paneLayout(cn= "horizontal2", ps=[2,100,5], shp=2)
@@ -537,14 +894,14 @@ def commentWindow(iconButton, *args):
     def cancelCommand(*args):
         pm.deleteUI("CommentWindow")
         
-    def okCommand(iconButton,*args):
+    def okCommand(*args):
         if commentField.getText() != commentText:
-            rewriteWithComment(getShPath(iconButton), commentField.getText())
+            rewriteWithComment(shaderPath, commentField.getText())
         pm.deleteUI("CommentWindow")
     
     
     pm.button("CancelCommentBt" ,l="Cancel", w=70, c=partial(cancelCommand))
-    pm.button("OKCommentBt",l="OK", w=70, c=partial(okCommand, iconButton))
+    pm.button("OKCommentBt",l="OK", w=70, c=partial(okCommand))
     pm.separator("CommentSep", st="none", h=5)
     pm.formLayout("CommentForm", e=True, af=(["OKCommentBt","right",10], ["CommentSep","bottom",0]), ac= ["CancelCommentBt","right",5,"OKCommentBt"])
     pm.showWindow("CommentWindow")
@@ -552,10 +909,13 @@ def commentWindow(iconButton, *args):
     commentField.setText(commentText)
 
 
-# Open Tag Window
+# Open Tag Window. It opens once the tag was read.
 def tagWindow(iconButton, *args):
-    shaderPath = getShPath(iconButton)
-    shaderTag = readTagLine(shaderPath).replace("//MaterialTag: ", "").strip("\n")
+    runTask("Reading tag", partial(readLatestMetadata, iconButton.getDocTag()), onDone=showTagWindow)
+
+
+def showTagWindow(metadata):
+    shaderPath, shaderTag, commentText = metadata
     tagWindow = createWindow(name="TagWindow", title="Change Tag", minb=False, maxb=False, menuBar=False, resizeable=False)
     
     pm.columnLayout(cw=520, cat=["both",10])
@@ -576,7 +936,8 @@ def tagWindow(iconButton, *args):
 
 # Show project
 def showProject(iconButton, *args):
-    projectName = iconButton[iconButton.find("__pr_")+5 :]
+    iconName = getShownIconName(iconButton)
+    projectName = iconName[iconName.find("__pr_")+5 :]
     showProjectWindow = createWindow(name="ShowProjectWindow", title="Project", height=10, minb=False, maxb=False, menuBar=False, resizeable=False)
     pm.columnLayout()
     pm.textField(tx=projectName, w=200)
@@ -584,31 +945,220 @@ def showProject(iconButton, *args):
 
 
 def showShaderLocation(iconButton, *args):
-    newestShaderVersion=pm.iconTextButton(iconButton, q= True, dtg= True).split("\n")[-1]
+    newestShaderVersion= getShPath(iconButton)
     shaderPathWindow= createWindow(name="shaderPathWindow", title="Shader Path", height= 10, minb= False, maxb=False, menuBar= False, resizeable=False)
     pm.columnLayout()
     pm.textField(tx= newestShaderVersion, w= 500)
     pm.showWindow(shaderPathWindow)     
 
 
-# Creates an icon for a given shader path.
-def createShaderIcon(shaderPath=[], iconSize=110, shaderIcon="blinn.svg", addToIconless=True, shaderLabel="", parentLayout="allShadersLayout", addToName=""):
-    """ Creates a clickable icon that imports and assigns the shader to the selection, by using the importAssignShader() function.
-    The "addToName" variable allows an additional string to be added to the name of the iconTextButton object.
+""" Icons are shown from a local thumbnail cache instead of the full size renders on the shader directories.
+A thumbnail is the icon scaled down to the icon size and is named after the icon path, its mtime and the icon size, so a new render gets a new thumbnail.
+Missing thumbnails are made on a background thread with QImage, while the button shows a placeholder. Only those icons are read from the shader directories.
+The least recently used thumbnails are removed once the cache is bigger than "thumbnailCacheSize".
+"""
+
+thumbnailCacheDir = os.path.join(os.path.dirname(docDirLok), "ISMLthumbnails")
+thumbnailCacheSize = 200 * 1024 * 1024  # Bytes
+iconSources = {}  # Icon button name -> icon path on the shader directory, the button itself may show a thumbnail
+thumbnailJobs = None
+canMakeThumbnails = None
+
+
+# Returns the path of the cached thumbnail of an icon.
+def getThumbnailPath(iconPath, mtime, iconSize):
+    key = "%s|%r|%s" % (iconPath, mtime, iconSize)
+    if not isinstance(key, bytes):
+        key = key.encode("utf-8")
+    return os.path.join(thumbnailCacheDir, hashlib.sha1(key).hexdigest() + ".png")
+
+
+# Scales an icon down and saves it as a thumbnail. Uses QImage, because unlike Maya it can be used outside of the main thread.
+def makeThumbnail(iconPath, thumbnailPath, iconSize):
+    from PySide2 import QtCore, QtGui
+    image = QtGui.QImage(iconPath)
+    if image.isNull():
+        return False
+    if image.width() > iconSize or image.height() > iconSize:
+        image = image.scaled(iconSize, iconSize, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+
+    tempPath = "%s.%s.tmp" % (thumbnailPath, threading.current_thread().ident)
+    if not image.save(tempPath, "PNG"):
+        return False
+    replaceFile(tempPath, thumbnailPath)
+    return True
+
+
+# Removes the least recently used thumbnails until the cache fits into "thumbnailCacheSize".
+def evictThumbnails():
+    thumbnails = []
+    try:
+        for fileEntry in iterDirEntries(thumbnailCacheDir):
+            if fileEntry.name.endswith(".png"):
+                fileStat = fileEntry.stat()
+                thumbnails.append((fileStat.st_mtime, fileStat.st_size, fileEntry.path))
+    except OSError:
+        return
+
+    cacheSize = sum(thumbnail[1] for thumbnail in thumbnails)
+    for mtime, size, path in sorted(thumbnails):
+        if cacheSize <= thumbnailCacheSize:
+            break
+        try:
+            os.remove(path)
+            cacheSize -= size
+        except OSError:
+            pass
+
+
+# Makes the queued thumbnails. Runs on a background thread and only calls Maya through executeDeferred().
+def thumbnailWorker(jobs):
+    while True:
+        buttonName, iconPath, mtime, iconSize = jobs.get()
+        image = iconPath
+        try:
+            if mtime is None:
+                mtime = os.stat(iconPath).st_mtime
+            thumbnailPath = getThumbnailPath(iconPath, mtime, iconSize)
+            if os.path.exists(thumbnailPath) or makeThumbnail(iconPath, thumbnailPath, iconSize):
+                image = thumbnailPath
+        except Exception:
+            pass
+        maya.utils.executeDeferred(partial(setThumbnail, buttonName, iconPath, image))
+        if jobs.empty():
+            evictThumbnails()
+
+
+# Shows the finished thumbnail, unless the button was deleted or got another icon in the meantime.
+def setThumbnail(buttonName, iconPath, image):
+    if iconSources.get(buttonName) == iconPath and pm.iconTextButton(buttonName, ex=True):
+        pm.iconTextButton(buttonName, e=True, i=image)
+
+
+def queueThumbnail(buttonName, iconPath, mtime, iconSize):
+    global thumbnailJobs
+    if thumbnailJobs is None:
+        if not os.path.isdir(thumbnailCacheDir):
+            os.makedirs(thumbnailCacheDir)
+        thumbnailJobs = Queue()
+        thread = threading.Thread(target=thumbnailWorker, args=(thumbnailJobs,))
+        thread.daemon = True
+        thread.start()
+    thumbnailJobs.put((buttonName, iconPath, mtime, iconSize))
+
+
+# Returns if a module can be imported, without importing it.
+def isModuleAvailable(name):
+    try:
+        from importlib.util import find_spec
+    except ImportError:  # Python 2
+        from imp import find_module
+        try:
+            find_module(name)
+        except ImportError:
+            return False
+        return True
+    return find_spec(name) is not None
+
+
+# Returns the image for an icon button. That is the cached thumbnail if there is one, otherwise a placeholder until the thumbnail is made.
+def getIconImage(buttonName, iconPath, iconSize=110):
+    global canMakeThumbnails
+    iconSources[buttonName] = iconPath
+    if iconPath == "blinn.svg":
+        return iconPath
+    if canMakeThumbnails is None:
+        canMakeThumbnails = isModuleAvailable("PySide2")
+    if not canMakeThumbnails:
+        return iconPath
+
+    mtime = iconMtimes.get(iconPath)
+    if mtime is not None:
+        thumbnailPath = getThumbnailPath(iconPath, mtime, iconSize)
+        try:
+            os.utime(thumbnailPath, None)  # Marks the thumbnail as recently used. Fails if it doesn't exist.
+            return thumbnailPath
+        except OSError:
+            pass
+    try:
+        queueThumbnail(buttonName, iconPath, mtime, iconSize)
+    except OSError as ex:
+        pm.warning("Thumbnail cache %s can't be created: %s" % (thumbnailCacheDir, ex))
+        canMakeThumbnails = False
+        return iconPath
+    return "blinn.svg"
+
+
+# The name of an icon. It is the key of the icon in the search index. The project name is stored after "__pr_".
+def getIconButtonName(shaderName, addToName):
+    return "%sButton__pr_%s" % (shaderName, addToName)
+
+
+# Returns the name of the icon an icon button shows, or "" if it's hidden.
+def getShownIconName(iconButton):
+    return (slotStates.get(iconButton.shortName()) or ("",))[0]
+
+
+# Creates icon buttons at the end of a layout until it has "count". They get their shader with showIconInSlot().
+def createIconSlots(layout, count, iconSize=110):
+    """ A clickable icon imports the shader of the folder in its doc tag. Its menu commands get the shader from the doc tag
+    and the shown icon when they are called, so they stay right when the button is reused for another shader.
     """
-    global iconlessButtons, deleteOptions, iconButtons
+    slots = iconSlots.setdefault(layout, [])
+    if len(slots) >= count:
+        return
+    removeLayoutEnd(layout)
+    for i in range(len(slots), count):
+        slotName = "%sIcon%s" % (layout, i)
+        iconButton = pm.iconTextButton(slotName, i="blinn.svg", l="", p=layout, st="iconAndTextVertical", sic=iconSize, w=iconSize, h=iconSize+20, vis=False)
+        slots.append(slotName)
+        slotStates[slotName] = None
         
-    shaderName = os.path.splitext(shaderLabel)[0]
-    newestShaderVersion = shaderPath[-1]
-    dcTag = "\n".join(shaderPath)
-    
-    iconButtonName = "%sButton__pr_%s" % (shaderName, addToName)
-    iconButton = pm.iconTextButton(iconButtonName ,i=shaderIcon, l=shaderName, p=parentLayout, st="iconAndTextVertical", sic=iconSize, w=iconSize, dtg=dcTag, h=iconSize+20, c=partial(importRenameShader, newestShaderVersion), ann=shaderName)
-    
-    if shaderIcon == "blinn.svg" and addToIconless:
-        iconlessButtons.append(iconButton)
-    
-    iconOptions = pm.popupMenu("iconButtonMenu",p=iconButton)
+        # The menu items are only created the first time the menu is opened.
+        iconOptions = pm.popupMenu("iconButtonMenu",p=iconButton, pmo=True)
+        pm.popupMenu(iconOptions, e=True, pmc=partial(buildIconMenu, iconButton, iconOptions))
+        iconButtons.append(iconButton)
+    addLayoutEnd(layout)
+
+
+# Points an icon button at a shader. Only what differs from the shader it showed before is changed.
+def showIconInSlot(slotName, iconName, iconArgs, iconSize=110):
+    shaderName = os.path.splitext(iconArgs["shaderLabel"])[0]
+    dcTag = os.path.dirname(iconArgs["shaderPath"][-1])  # The shader folder. Its versions are in the version index.
+    state = (iconName, dcTag, iconArgs["shaderIcon"], iconMtimes.get(iconArgs["shaderIcon"]))
+    previous = slotStates.get(slotName) or (None, None, None, None)
+    if previous == state:
+        return
+    edits = {}
+    if previous[0] != iconName:
+        edits.update(l=shaderName, ann=shaderName, vis=True)
+    if previous[1] != dcTag:
+        edits.update(dtg=dcTag, c=partial(importLatestVersion, dcTag))
+    if previous[2:] != state[2:]:
+        edits["i"] = getIconImage(slotName, iconArgs["shaderIcon"], iconSize)
+    pm.iconTextButton(slotName, e=True, **edits)
+    slotStates[slotName] = state
+
+
+def hideSlot(slotName):
+    if slotStates.get(slotName) is not None:
+        pm.iconTextButton(slotName, e=True, vis=False)
+        slotStates[slotName] = None
+        iconSources.pop(slotName, None)  # A thumbnail that is still being made isn't set anymore
+
+
+# The icon buttons belong to the layouts of a library window. A new window has new layouts.
+def forgetIconSlots():
+    global iconButtons, deleteOptions
+    iconSlots.clear()
+    slotStates.clear()
+    firstShownIcons.clear()
+    iconButtons = []
+    deleteOptions = []
+
+
+def buildIconMenu(iconButton, iconOptions, *args):
+    pm.setParent(iconOptions, menu=True)
     pm.menuItem("importAssign",l="Import And Assign", c=partial(importAssignShader, iconButton, False))
     pm.menuItem("importVersion",l="Import Specific Version", c=partial(importOlderVersion, iconButton))
     pm.menuItem("exportNewVersion",l="Export Selected As New Version", c=partial(exportNewVersion, iconButton, False))
@@ -620,10 +1170,9 @@ def createShaderIcon(shaderPath=[], iconSize=110, shaderIcon="blinn.svg", addToI
     pm.menuItem("showShLocation", l="Show Shader Location", c=partial(showShaderLocation, iconButton), p=iconOptions)
     pm.menuItem("iconSubMenu",l="Icon", sm= True, p=iconOptions)
     pm.menuItem("deleteIconMenu",l="Delete Icon", c=partial(deleteIconFile, iconButton))
-    deleteItem= pm.menuItem("deleteShader", l="Delete Shader",c=partial(deleteShader, iconButton), p=iconOptions, en=False)
+    deleteItem= pm.menuItem("deleteShader", l="Delete Shader",c=partial(deleteShader, iconButton), p=iconOptions, en=isDeleteModeEnabled())
     
     deleteOptions.append(deleteItem)
-    iconButtons.append(iconButton)
 
 
 # Creates an icon for a given asset path.
@@ -633,10 +1182,177 @@ def createAssetIcon(assetPath=[], iconSize=110, assetIcon="meshToPolygons.png",
     pass
 
 
-# Populate with icons
+# Populate with icons. The icons are only added to the search index and the icons of the layout here, showIcons() shows them.
+@profiled
 def populateWithIcons(mtlPathList, mtlIconPathList, parentLayout, addToName="", addToIconless=True):
+    icons = layoutIcons.setdefault(parentLayout, [])
     for i in range(len(mtlPathList)):
-        createShaderIcon(shaderPath=mtlPathList[i], shaderIcon=mtlIconPathList[i], shaderLabel=os.path.basename(mtlPathList[i][-1]), parentLayout=parentLayout, addToName=addToName, addToIconless=addToIconless)
+        shaderLabel = os.path.basename(mtlPathList[i][-1])
+        shaderName = os.path.splitext(shaderLabel)[0]
+        iconName = getIconButtonName(shaderName, addToName)
+        indexIconButton(iconName, shaderName, addToName, mtlPathList[i][-1])
+        icons.append((iconName, dict(shaderPath=mtlPathList[i], shaderIcon=mtlIconPathList[i], shaderLabel=shaderLabel, addToIconless=addToIconless)))
+
+
+""" A tab only has icon buttons for "iconPoolPages" pages of icons. A page is the visible part of the tab and two more rows.
+The buttons are created once and show a window of the icons passing the filter. When the tab is scrolled to the end of the window,
+the buttons are pointed at the icons one page further and the scroll position moves up by a page, so the same icons stay in view.
+Scrolling to the top moves the window back. Filtering uses the search index, so icons without a button are found too.
+"""
+
+iconPoolPages = 2  # Pages of icon buttons each tab has
+
+def getIconColumns(layout, iconSize=110):
+    return max(1, pm.shelfLayout(layout, q=True, w=True) // iconSize)
+
+
+def getIconPageSize(layout, iconSize=110):
+    rows = pm.shelfLayout(layout, q=True, h=True) // (iconSize+20) + 2
+    return getIconColumns(layout, iconSize) * rows
+
+
+def removeLayoutEnd(layout):
+    for control in ("%sShowMore" % layout, "%sEndSeparator" % layout):
+        if pm.control(control, ex=True):
+            pm.deleteUI(control)
+
+
+# Adds the "Show More" button and empty space at the end of a tab. Both must stay the last children of the layout.
+def addLayoutEnd(layout):
+    pm.button("%sShowMore" % layout, l="Show More", p=layout, w=110, h=40, vis=False, c=partial(showMoreIcons, layout))
+    pm.separator("%sEndSeparator" % layout, st="none", h=200, p=layout)
+
+
+# The icons of a layout that pass the current filter.
+def getFilteredIcons(layout):
+    return [(iconName, iconArgs) for iconName, iconArgs in layoutIcons.get(layout, []) if iconFilter is None or iconFilter(iconName)]
+
+
+def showIcons(layout, first=None):
+    """Points the icon buttons of a layout at the icons passing the filter, starting with the one at "first", or where they start now.
+    The start is moved to the beginning of a row and no further than needed to show the last icon. Returns the start.
+    """
+    if first is None:
+        first = firstShownIcons.get(layout, 0)
+    icons = getFilteredIcons(layout)
+    createIconSlots(layout, min(len(icons), getIconPageSize(layout) * iconPoolPages))
+    slots = iconSlots.get(layout, [])
+    columns = getIconColumns(layout)
+    first = max(0, min(first, -(-(len(icons) - len(slots)) // columns) * columns))
+    first -= first % columns
+    for i, slotName in enumerate(slots):
+        if first + i < len(icons):
+            showIconInSlot(slotName, *icons[first + i])
+        else:
+            hideSlot(slotName)
+    firstShownIcons[layout] = first
+    if slots != []:
+        pm.button("%sShowMore" % layout, e=True, vis=first + len(slots) < len(icons))
+    return first
+
+
+# Moves the icons of a layout by "count" icons, down if it's positive. Returns by how many icons they moved.
+def scrollIcons(layout, count):
+    if not pm.shelfLayout(layout, ex=True):
+        return 0
+    first = firstShownIcons.get(layout, 0)
+    return showIcons(layout, first + count) - first
+
+
+# Without a scroll bar to follow, the layout gets a page more icon buttons.
+def showMoreIcons(layout, *args):
+    createIconSlots(layout, len(iconSlots.get(layout, [])) + getIconPageSize(layout))
+    showIcons(layout)
+
+
+loadingLayouts = set()
+
+
+# Height of the rows that "icons" icons fill in a layout.
+def getIconRowsHeight(layout, icons, iconSize=110):
+    return -(-icons // getIconColumns(layout, iconSize)) * (iconSize+20)
+
+
+def loadIconsWhileScrolling(layout):
+    """Moves the icons one page further when the tab is scrolled to its end, and one page back when it is scrolled to its top.
+    The scroll position is moved by the height of the rows the icons moved, so the same icons stay in view.
+    This needs PySide2 to get to the scroll bar. Without it, the "Show More" button adds icon buttons instead.
+    """
+    try:
+        from maya import OpenMayaUI
+        from shiboken2 import wrapInstance
+        from PySide2 import QtWidgets
+    except ImportError:
+        return
+    pointer = OpenMayaUI.MQtUtil.findLayout(layout)
+    if pointer is None:
+        return
+    try:
+        pointer = long(pointer)  # Python 2
+    except NameError:
+        pointer = int(pointer)
+    widget = wrapInstance(pointer, QtWidgets.QWidget)
+    scrollArea = widget.findChild(QtWidgets.QScrollArea)
+    while scrollArea is None and widget is not None:
+        if isinstance(widget, QtWidgets.QScrollArea):
+            scrollArea = widget
+        widget = widget.parentWidget()
+    if scrollArea is None:
+        return
+    scrollBar = scrollArea.verticalScrollBar()
+    
+    # The buttons stay where they are, so only the scroll position changes and no icon seems to move.
+    def showNextPage():
+        try:
+            movedHeight = getIconRowsHeight(layout, scrollIcons(layout, getIconPageSize(layout)))
+            if movedHeight > 0:
+                scrollBar.setValue(max(0, scrollBar.value() - movedHeight))
+        finally:
+            loadingLayouts.discard(layout)
+    
+    def showPreviousPage():
+        try:
+            movedHeight = getIconRowsHeight(layout, -scrollIcons(layout, -getIconPageSize(layout)))
+            if movedHeight > 0:
+                scrollBar.setValue(scrollBar.value() + movedHeight)
+        finally:
+            loadingLayouts.discard(layout)
+    
+    def scrolled(value):
+        if layout in loadingLayouts:
+            return
+        if value >= scrollBar.maximum() - scrollBar.pageStep() and firstShownIcons.get(layout, 0) + len(iconSlots.get(layout, [])) < len(getFilteredIcons(layout)):
+            loadingLayouts.add(layout)
+            maya.utils.executeDeferred(showNextPage)  # Don't change the buttons while Qt is scrolling
+        elif value <= scrollBar.minimum() and firstShownIcons.get(layout):
+            loadingLayouts.add(layout)
+            maya.utils.executeDeferred(showPreviousPage)
+    scrollBar.valueChanged.connect(scrolled)
+
+
+def isDeleteModeEnabled():
+    return pm.shelfLayout("allShadersLayout",q=True, bgc=True)[0] >= 0.4
+
+
+# Queues all shaders without an icon for rendering, including the ones that aren't shown.
+def renderIconsHandler(*args):
+    shaderPaths = []
+    for icons in layoutIcons.values():
+        shaderPaths += [iconArgs["shaderPath"][-1] for iconName, iconArgs in icons if iconArgs["shaderIcon"] == "blinn.svg" and iconArgs["addToIconless"]]
+    if shaderPaths == []:
+        pm.displayInfo("All shaders have icons.")
+        return
+    if renderBackend != "stub" and not os.path.isfile(renderTemplateScene):
+        pm.warning("The shader ball scene %s was not found!" % renderTemplateScene)
+        return
+    
+    try:
+        queueIconRenders(shaderPaths, renderBackend, renderTemplateScene)
+        startRenderWorkers()
+    except (IOError, OSError) as ex:
+        pm.warning("Icons can't be rendered: %s" % ex)
+        return
+    pm.displayInfo("%s icons are rendered in the background. They are shown once rendering is finished." % len(shaderPaths))
 
 
 # Toggles the ability to delete shaders
@@ -675,58 +1391,190 @@ def createFrame(parentLayout, FrName="Frame", label="Label", mWidth=10, collapse
     return frame
 
 
-# Update all tabs
+# Layouts the icons of each tab are placed in.
+tabLayouts = {"Shader": "allShadersLayout", "Texture": "allTexturesLayout", "Asset": "allAssetsLayout"}
+
+
+# Update all tabs. The shader directories are scanned on the task worker, the icons are replaced once the scan is done.
 def refreshShaderTab(*args):
-    global globalDirectoryList, iconlessButtons, deleteOptions, iconButtons
-    iconButtons = []
-    deleteOptions = []
-    iconlessButtons = []
-    dirList = globalDirectoryList
-    """Deletes any existing icons and populates the Tabs with new ones from the chosen shader directories.
+    dirList = list(globalDirectoryList)
+    warnings = []
+    runTask("Scanning shader directories", partial(scanForTabs, dirList, [dir[0] for dir in dirList], warnings), onDone=partial(rebuildShaderTab, dirList, warnings))
+
+
+def rebuildShaderTab(dirList, warnings, result):
+    """Replaces the icons of the tabs with the ones from the chosen shader directories. The icon buttons are kept and show the new icons.
     """
+    global displayedDirectoryList, lastWatchSignature, iconFilter
+    for warning in warnings:
+        pm.warning(warning)
+    if not pm.shelfLayout("allShadersLayout", ex=True):  # The library window was closed.
+        return
+    pathLists, signature = result
+    shaderSearchIndex.update(newSearchIndex())
+    indexedShaderPaths.clear()
+    layoutIcons.clear()
+    iconFilter = None
     # Delete items from the projectFilter option menu
     pm.optionMenu("projectFilter", e=True, dai=True)
     pm.menuItem(p="projectFilter", l="All")
     
-    # Delete all icons in the tab
-    existingIcons = pm.shelfLayout("allShadersLayout",q=True, ca=True)
+    # Create new icons and frames
+    for dir in dirList:
+        tab = dir[1]
+        dir = dir[0]
+        pLists = pathLists.get(dir, [[], []])
+        dirName = dir[dir.rfind("/")+1 : len(dir)]
+        pm.menuItem(l=dirName, p="projectFilter")  # Add project name to project filter option menu.
+        
+        # Populate the "Shaders", "Textures" or "Assets" tab
+        if tab in tabLayouts:
+            populateWithIcons(pLists[0], pLists[1], tabLayouts[tab], addToName=dirName)
     
-    try:
-        existingIcons += pm.shelfLayout("allTexturesLayout",q=True, ca=True)
-    except:
-        pass
-    try:
-        existingIcons += pm.shelfLayout("allAssetsLayout",q=True, ca=True)
-    except:
-        pass
+    for layout in tabLayouts.values():
+        showIcons(layout, 0)
+    
+    displayedDirectoryList = sorted(tuple(dir) for dir in dirList)
+    lastWatchSignature = signature
+
+
+# Update only the icons that changed
+def updateShaderTab(*args):
+    dirList = list(globalDirectoryList)
+    if sorted(tuple(dir) for dir in dirList) != displayedDirectoryList:
+        refreshShaderTab()
+        return
+    warnings = []
+    runTask("Scanning shader directories", partial(scanForTabs, dirList, [dir[0] for dir in dirList if dir[1] in tabLayouts], warnings),
+            onDone=partial(applyShaderTabUpdate, dirList, warnings))
+
 
-    if existingIcons is not None:
-        pm.deleteUI(existingIcons)
+def applyShaderTabUpdate(dirList, warnings, result):
+    """Compares the shader folders on disk with the icons in the tabs. Only icons of shaders that were added, removed
+    or changed are touched, the rest stay as they are. If the directory list changed, the tabs are refreshed completely.
+    """
+    global lastWatchSignature
+    for warning in warnings:
+        pm.warning(warning)
+    if not pm.shelfLayout("allShadersLayout", ex=True):  # The library window was closed.
+        return
+    if sorted(tuple(dir) for dir in dirList) != displayedDirectoryList:  # Changed during the scan
+        refreshShaderTab()
+        return
+    pathLists, signature = result
     
-    # Create new icons and frames
+    # Icons that should be in the tabs: icon name -> (shader versions, icon, layout, project)
+    wantedIcons = {}
+    skippedProjects = set()  # Icons of directories that didn't respond are left alone
     for dir in dirList:
         tab = dir[1]
         dir = dir[0]
-        pLists = updatePathList(dir)
+        if tab not in tabLayouts:
+            continue
         dirName = dir[dir.rfind("/")+1 : len(dir)]
-        pm.menuItem(l=dirName, p="projectFilter")  # Add project name to project filter option menu.
-            
-        if tab == "Shader":
-            # Populate "Shaders" tab
-            populateWithIcons(pLists[0], pLists[1], "allShadersLayout", addToName=dirName)
-        if tab == "Texture":
-            # Populate "Textures" tab
-            populateWithIcons(pLists[0], pLists[1], "allTexturesLayout", addToName=dirName)
-        if tab == "Asset":
-            # Populate "Assets" tab
-            populateWithIcons(pLists[0], pLists[1], "allAssetsLayout", addToName=dirName)
- 
-    pm.separator(st="none", h=200, p="allShadersLayout")
-    pm.separator(st="none", h=200, p="allTexturesLayout")
-    pm.separator(st="none", h=200, p="allAssetsLayout")
-    
-    # Update list of iconless buttons to be rendered by the menu item command.
-    pm.menuItem("renderIconsMItem" , e=True, c=partial(assignRenderIcons, iconlessButtons))
+        if dir not in pathLists:
+            skippedProjects.add(dirName)
+            continue
+        pLists = pathLists[dir]
+        for i in range(len(pLists[0])):
+            shaderName = os.path.splitext(os.path.basename(pLists[0][i][-1]))[0]
+            wantedIcons[getIconButtonName(shaderName, dirName)] = (pLists[0][i], pLists[1][i], tabLayouts[tab], dirName)
+    
+    # Remove icons of deleted shaders and update the ones that changed.
+    existingIcons = set()
+    for layout in layoutIcons:
+        keptIcons = []
+        for iconName, iconArgs in layoutIcons[layout]:
+            wanted = wantedIcons.get(iconName)
+            if iconName[iconName.find("__pr_")+5 :] in skippedProjects:
+                keptIcons.append((iconName, iconArgs))
+                existingIcons.add(iconName)
+            elif wanted is None:
+                unindexIconButton(iconName)
+            else:
+                fields = getSearchIndexFields(shaderSearchIndex, iconName)
+                if fields is None or indexedShaderPaths.get(iconName) != wanted[0][-1] or (fields["tag"], fields["comment"]) != getShaderMetadata(wanted[0][-1]):
+                    indexIconButton(iconName, os.path.splitext(iconArgs["shaderLabel"])[0], wanted[3], wanted[0][-1])
+                iconArgs.update(shaderPath=wanted[0], shaderIcon=wanted[1])
+                keptIcons.append((iconName, iconArgs))
+                existingIcons.add(iconName)
+        layoutIcons[layout] = keptIcons
+    
+    # Add icons of new shaders after the shown icons, so they are shown right away if there is room.
+    for iconName in sorted(wantedIcons, reverse=True):  # Each is inserted before the previous one
+        if iconName in existingIcons:
+            continue
+        wanted = wantedIcons[iconName]
+        shaderLabel = os.path.basename(wanted[0][-1])
+        indexIconButton(iconName, os.path.splitext(shaderLabel)[0], wanted[3], wanted[0][-1])
+        icons = layoutIcons.setdefault(wanted[2], [])
+        shownIcons = set(state[0] for state in (slotStates.get(slotName) for slotName in iconSlots.get(wanted[2], [])) if state is not None)
+        position = len(icons)
+        while position > 0 and shownIcons and icons[position-1][0] not in shownIcons:
+            position -= 1
+        icons.insert(position, (iconName, dict(shaderPath=wanted[0], shaderIcon=wanted[1], shaderLabel=shaderLabel, addToIconless=True)))
+    
+    for layout in tabLayouts.values():
+        showIcons(layout)
+    lastWatchSignature = signature
+
+
+""" The directory watcher polls the shader directories on a background thread. Shaders being added or removed change the mtime
+of the directory, and every refresh by any user updates the catalog file. Only these two files are checked on every poll.
+When one of them changes, the tabs are updated on the main thread, since Maya UI can't be edited from other threads.
+"""
+
+watchInterval = 5.0  # Seconds between polls
+
+
+def getDirectorySignature(dirList):
+    signature = []
+    for dir in dirList:
+        for path in (dir[0], os.path.join(dir[0], libraryDataDirName, catalogFileName)):
+            try:
+                signature.append(os.stat(path).st_mtime)
+            except OSError:
+                signature.append(None)
+    return signature
+
+
+def watchDirectories(stopEvent, interval):
+    global lastWatchSignature
+    while not stopEvent.wait(interval):
+        signature = getDirectorySignature(list(globalDirectoryList))
+        if signature != lastWatchSignature:
+            lastWatchSignature = signature
+            maya.utils.executeDeferred(watcherUpdate)
+
+
+def watcherUpdate():
+    if not pm.shelfLayout("allShadersLayout", ex=True):  # The library window was closed.
+        stopDirectoryWatcher()
+        return
+    updateShaderTab()
+
+
+def startDirectoryWatcher():
+    global watcherStop
+    stopDirectoryWatcher()
+    watcherStop = threading.Event()
+    watcherThread = threading.Thread(target=watchDirectories, args=(watcherStop, watchInterval), name="ISMLDirectoryWatcher")
+    watcherThread.daemon = True
+    watcherThread.start()
+
+
+def stopDirectoryWatcher():
+    global watcherStop
+    if watcherStop is not None:
+        watcherStop.set()
+        watcherStop = None
+
+
+def toggleDirectoryWatcher(*args):
+    if pm.menuItem("watchDirsMItem", q=True, cb=True):
+        startDirectoryWatcher()
+    else:
+        stopDirectoryWatcher()
 
 
 # UI Windows
@@ -762,25 +1610,22 @@ def renamingWindow(nodes,prefix):
 
 
 def writePathsToConfig(dirListAll, dirListLok, dirListSh):
-    # Write changes to config file.    
+    # Write changes to config file. Paths that others added or removed since the file was read are kept.
     global globalDirectoryList, docDir
     globalDirectoryList = dirListAll
-
-    with open(docDirLok, "w") as configFile:
-        configFile.write("# Paths of shader directories:\n\n")
-        for path in dirListLok:
-            configFile.write("%s# %s\n" % (path[1], path[0]))
-            
-    with open(docDirShared, "w") as configFile:
-        configFile.write("# Paths of shader directories:\n\n")
-        for path in dirListSh:
-            configFile.write("%s# %s\n" % (path[1], path[0]))
+    try:
+        dirListLok = writeConfigFile(docDirLok, dirListLok)
+        dirListSh = writeConfigFile(docDirShared, dirListSh)
+    except (IOError, OSError) as ex:
+        pm.warning("The config files could not be written! :%s" % ex)
+        return
+    globalDirectoryList = mergeDirectoryLists(set(dirListSh), set(dirListLok))
 
 
 def shaderPathListWindow(*args):
     pathTextFields = []  # This variable will be used when writing the new paths to the config file
     
-    def copyDirTree(sourceField, dstField, *args):
+    def copyDirTree(sourceField, dstField, compareMenu, mirrorBox, *args):
         source = sourceField.getText()
         dst = dstField.getText()
         
@@ -788,10 +1633,29 @@ def shaderPathListWindow(*args):
         
         if dst == "":
             return 0
-        # Copies the content of whatever path is given in the text field to specified new path  
-        copytree(source, os.path.join(dst, dirName))
-        sourceField.setText(os.path.join(dst, dirName))
-        pm.deleteUI('copyPathWindow')
+        # Syncs the content of whatever path is given in the text field to specified new path, only the changed files are copied
+        destination = os.path.join(dst, dirName)
+        runTask("Comparing %s" % source, partial(planSync, source, destination, compareMenu.getValue().lower(), mirrorBox.getValue(), syncJournalPath),
+                onDone=partial(confirmSync, sourceField, source, destination))
+    
+    def confirmSync(sourceField, source, destination, job):
+        if job["delete"] != [] or job["deleteDirs"] != []:
+            answer = pm.confirmDialog(t="Copy To", m="%s files and %s folders in %s are not in %s and will be deleted." % (len(job["delete"]), len(job["deleteDirs"]), destination, source),
+                                      b=["Copy", "Cancel"], db="Copy", cb="Cancel", ds="Cancel")
+            if answer != "Copy":
+                return 0
+        runTask("Copying %s" % source, partial(runSync, job, syncJournalPath), onDone=partial(syncDone, sourceField, destination, job), withProgress=True)
+    
+    def syncDone(sourceField, destination, job, stats):
+        for path, ex in stats["failed"]:
+            pm.warning("%s cannot be copied! :%s" % (path, ex))
+        pm.displayInfo(formatSyncStats(stats))
+        if stats["failed"] != [] or stats["copied"] < job["files"]:
+            return 0  # Interrupted, copying again continues where it stopped
+        if pm.textField(sourceField, ex=True):
+            sourceField.setText(destination)
+        if pm.window("copyPathWindow", ex=True):
+            pm.deleteUI('copyPathWindow')
     
     def copyToWindow(pathField, *args):
         createWindow(name="copyPathWindow", title="Copy To", menuBar=False, resizeable=False)
@@ -801,12 +1665,20 @@ def shaderPathListWindow(*args):
         pm.separator(st="none", h=3)
         pm.text(l="Copy To: ")
         dstField = pm.textField("copyDestinationPath", w=400)
+        pm.text(l="Compare: ")
+        pm.rowColumnLayout(nc=2, cs=[2,10])
+        compareMenu = pm.optionMenu("copyCompareMenu", w=70)
+        for compare in ("Size", "Mtime", "Hash"):
+            pm.menuItem(l=compare, p=compareMenu)
+        pm.optionMenu("copyCompareMenu", e=True, v=ISMLcore.syncCompare.capitalize())
+        mirrorBox = pm.checkBox("copyMirrorBox", l="Delete files that are not in the source", v=False)
+        pm.setParent('..')
         pm.separator(st="none", h=12)
         pm.separator(st="none", h=12)
         pm.setParent('..')
         pm.rowColumnLayout(nc=2, cs=[2,10], co=[1,"left",180])
         pm.button("Cancel", c="pm.deleteUI('copyPathWindow')", w=50)
-        pm.button("Copy", c=partial(copyDirTree, pathField, dstField), w=50)
+        pm.button("Copy", c=partial(copyDirTree, pathField, dstField, compareMenu, mirrorBox), w=50)
         pm.separator(st="none", h=10)
         pm.showWindow("copyPathWindow")
 
@@ -908,36 +1780,35 @@ def shaderPathListWindow(*args):
 
 
 def createUI():
+    importMaya()
+    loadConfig()
 
     createWindow(name="mainWindow", title="IS_ML")
     pm.menu("utilityMenu", l="Utilities", p="mainWindow")
     pm.menuItem(l="Directory List", c=partial(shaderPathListWindow))
     pm.menuItem(l="Export Selected Shading Group", c=partial(exportOptionsWindow))
-    pm.menuItem(l="Refresh Shader List", c=partial(refreshShaderTab))
+    pm.menuItem(l="Refresh Shader List", c=partial(updateShaderTab))
+    pm.menuItem("watchDirsMItem", l="Watch Directories For Changes", cb=False, c=partial(toggleDirectoryWatcher))
     pm.menuItem(l="Render Icons", sm=True)
-    pm.menuItem("renderIconsMItem" ,l="Render using Vray")
+    pm.menuItem("renderIconsMItem" ,l="Render using Vray", c=partial(renderIconsHandler))
     pm.menuItem("deleteMode",l="Enable Delete Mode", p="utilityMenu", c=partial(deleteModeToggle))
+    pm.menuItem(l="Move Tags And Comments To Metadata Files", p="utilityMenu", c=partial(migrateHeaderMetadataHandler))
+    pm.menuItem("versionStoreSubMenu", l="Version Store", p="utilityMenu", sm=True)
+    pm.menuItem("versionStoreMItem", l="Pack Previous Version When Exporting", p="versionStoreSubMenu", cb=ISMLcore.useVersionStore, c=partial(toggleVersionStore))
+    pm.menuItem(l="Pack Old Versions Of All Shaders", p="versionStoreSubMenu", c=partial(packOldVersionsHandler))
+    pm.menuItem("archiveSubMenu", l="Archives", p="utilityMenu", sm=True)
+    pm.menuItem(l="Export Shown Shaders As Archive", p="archiveSubMenu", c=partial(exportArchiveHandler))
+    pm.menuItem(l="Import Archive", p="archiveSubMenu", c=partial(importArchiveHandler))
+    pm.menuItem(l="Find Shaders With Missing Textures", p="utilityMenu", c=partial(auditTexturesHandler))
+    pm.menuItem(l="Find Duplicate Shaders And Textures", p="utilityMenu", c=partial(findDuplicatesHandler))
+    pm.menuItem("profilingSubMenu", l="Performance", p="utilityMenu", sm=True)
+    pm.menuItem("profilingMItem", l="Record Timings", p="profilingSubMenu", cb=ISMLcore.profilingEnabled, c=partial(toggleProfiling))
+    pm.menuItem(l="Show Timings", p="profilingSubMenu", c=partial(profileSummaryWindow))
     pm.menuItem("copyTexturesSubMenu", l="Move all textures to shader location", p="utilityMenu", sm=True)
     pm.menuItem("copyTextures", l="Copy and relink all textures to shader dir" , p="copyTexturesSubMenu", c=partial(MoveAllTexturesHandler))
+    pm.menuItem("textureStoreMItem", l="Hardlink identical textures to a shared store", p="copyTexturesSubMenu", cb=ISMLcore.useTextureStore, c=partial(toggleTextureStore))
     
     
-    
-    # Commands for the filter options
-    def filterC(*args):
-        iconList = pm.shelfLayout("allShadersLayout", q=True, ca=True)[:-1]
-        try:
-            iconList += pm.shelfLayout("allTexturesLayout", q=True, ca=True)[:-1]
-        except:
-            pass
-        try:
-            iconList += pm.shelfLayout("allAssetsLayout", q=True, ca=True)[:-1]
-        except:
-            pass
-        project = pm.optionMenu("projectFilter", q=True, v=True)
-        tag = pm.optionMenu("tagOpMenu", q=True, v=True)
-        searchStr = pm.textField("shaderSearchField",q=True, tx=True)
-        filterIcons(iconList,project, tag, searchStr)
-    
     #Filter options
     pm.rowColumnLayout(nc=2)
     
@@ -952,9 +1823,21 @@ def createUI():
     pm.optionMenu("tagOpMenu", cc=partial(filterC))
     pm.menuItem(l="All")
     addTagOptions("tagOpMenu")
+    # Shaders with missing textures
+    pm.text(l="Textures: ", al="right")
+    pm.optionMenu("textureFilter", cc=partial(filterC))
+    pm.menuItem(l="All")
+    pm.menuItem(l="Missing")
+    pm.menuItem(l="Complete")
     # Search field
     pm.text(l= "Name: ", al="right")
-    pm.textField("shaderSearchField", w=280, ec=partial(filterC), sf=True, aie=True)
+    pm.textField("shaderSearchField", w=280, ec=partial(filterC), tcc=partial(filterC), sf=True, aie=True)
+    # Background tasks
+    pm.button("taskCancelButton", l="Cancel", w=50, en=False, c=partial(cancelTasksHandler))
+    pm.columnLayout()
+    pm.progressBar("taskProgressBar", w=280, h=8)
+    pm.text("taskStatusText", l="", al="left", w=280)
+    pm.setParent("..")
     pm.setParent("..")
     # Main tab layout
     pm.tabLayout("ISMLTabs")
@@ -965,6 +1848,9 @@ def createUI():
     pm.setParent("..")
     pm.shelfLayout("allAssetsLayout", bgc=[.17,.17,.17], w=350,h=940)
     pm.tabLayout("ISMLTabs",e=True, tli=([1,"Shaders"],[2,"Textures"],[3,"Assets"]))
+    forgetIconSlots()
+    for layout in tabLayouts.values():
+        loadIconsWhileScrolling(layout)
     # update shader list
     refreshShaderTab()
     pm.showWindow("mainWindow")
@@ -973,4 +1859,13 @@ def createUI():
     pm.dockControl("materialLibDock",l="IS_ML work", a="right", con="mainWindow")
 
 
-createUI()
\ No newline at end of file
+# Opens the library. Importing ISML doesn't open it, the shelf button calls ISML.main() after the import.
+def main():
+    createUI()
+
+
+# "mayapy ISML.py --render-worker <queue folder>" renders queued icons instead of opening the UI.
+if __name__ == "__main__" and sys.argv[1 :2] == ["--render-worker"]:
+    importMaya()
+    rendered, failed = runRenderWorker(sys.argv[2])
+    print("Rendered %s icons, %s failed." % (rendered, failed))
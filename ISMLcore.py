@@ -0,0 +1,3479 @@
+import os
+import re
+import sys
+import zlib
+import json
+import errno
+import time
+import socket
+import struct
+import hashlib
+import logging
+import zipfile
+import argparse
+import multiprocessing
+import tempfile
+import threading
+from stat import S_ISDIR, S_ISREG
+from shutil import copy2, rmtree
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import partial, wraps
+from collections import deque
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
+try:
+    from os import scandir
+except ImportError:  # Python 2
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+
+""" The shader library without Maya: config files, catalog, metadata, scanning, search, versions, texture relinking and the icon render queue.
+ISML builds the Maya UI on top of it. Warnings of functions that don't return them go to the "ISML" logger, which Maya shows in the script editor.
+Run "python ISMLcore.py --help" for the command line interface.
+"""
+
+log = logging.getLogger("ISML")
+
+
+# Paths of the config files
+docDirLok = "%s/maya/2020/scripts/ISMLconfig.txt" % os.environ.get("HOME")
+docDirShared = "O:/Maya/MayaScripts/ISML/ISMLconfig.txt"
+configTimeout = 5.0  # Seconds to wait for a config file on a drive that doesn't respond
+configCache = {}  # Config path -> ((mtime, size), (path, project name) pairs). Lives here, so it survives reload(ISML).
+
+
+# Returns the (path, project name) pairs of a config file. Every line is "project name# path".
+def readConfigFile(configPath):
+    dirSet = set()
+    with open(configPath, "r") as configFile:
+        for line in configFile:
+            if not line.startswith("#"):
+                if line.strip() != "":
+                    line = line.strip()
+                    splitIn = line.find("# ")
+                    dirSet.add((line[splitIn+2 :], line[: splitIn]))
+    return dirSet
+
+
+def writeConfigFile(configPath, dirList):
+    """Writes the (path, project name) pairs of a config file. If someone else changed the file since it was last read,
+    their added and removed paths are kept together with the changes in dirList. Returns the pairs that were written.
+    """
+    with lockedFile(configPath):
+        cached = configCache.get(configPath)
+        fileVersion = getFileVersion(configPath)
+        if cached is not None and fileVersion is not None and fileVersion != cached[0]:
+            current = readConfigFile(configPath)
+            dirList = [path for path in dirList if path in current or path not in cached[1]]
+            dirList += sorted(current - cached[1] - set(dirList))
+        writeFileAtomic(configPath, "# Paths of shader directories:\n\n" + "".join("%s# %s\n" % (path[1], path[0]) for path in dirList))
+        configCache[configPath] = (getFileVersion(configPath), set(tuple(path) for path in dirList))
+    return dirList
+
+
+def loadConfigFile(configPath, timeout=None):
+    """Returns the (path, project name) pairs of a config file and a warning, or None if it was read. The file is only read again if its mtime or size changed.
+    It is checked on another thread, so a shared drive that doesn't respond delays loading by "timeout" seconds at most.
+    The pairs from the last time the file could be read are used then, or none if it never could.
+    """
+    if timeout is None:
+        timeout = configTimeout
+    result = {}
+    
+    def read():
+        try:
+            fileStat = os.stat(configPath)
+            fileVersion = (fileStat.st_mtime, fileStat.st_size)
+            cached = configCache.get(configPath)
+            if cached is None or cached[0] != fileVersion:
+                configCache[configPath] = (fileVersion, readConfigFile(configPath))
+            result["dirs"] = configCache[configPath][1]
+        except (IOError, OSError) as ex:
+            result["error"] = ex
+    
+    thread = threading.Thread(target=read, name="ISMLConfig")
+    thread.daemon = True  # A hanging network drive must not keep Maya from closing
+    thread.start()
+    thread.join(timeout)
+    if "dirs" in result:
+        return set(result["dirs"]), None
+    
+    if "error" in result:
+        message = "Config file %s could not be read! :%s" % (configPath, result["error"])
+    else:
+        message = "Config file %s didn't respond within %s seconds!" % (configPath, timeout)
+    cached = configCache.get(configPath)
+    if cached is not None:
+        message += " Using the paths it had when it was last read."
+        return set(cached[1]), message
+    return set(), message
+
+
+# Merges the paths of the shared and local config files into [path, project name, "Both"/"Shared"/"Local"] lists.
+def mergeDirectoryLists(dirSetSh, dirSetLoc):
+    directoryList = []
+    for both in dirSetSh.intersection(dirSetLoc):
+        both = list(both)
+        both.append("Both")
+        directoryList.append(both)
+    
+    for shared in dirSetSh.difference(dirSetLoc):
+        shared = list(shared)
+        shared.append("Shared")
+        directoryList.append(shared)
+    
+    for local in dirSetLoc.difference(dirSetSh):
+        local = list(local)
+        local.append("Local")
+        directoryList.append(local)
+    return directoryList
+
+
+""" Profiling records how long the slow operations of the library take and how much file work they do, so a slow session can be measured
+instead of guessed. Functions marked with @profiled log one record per call while "profilingEnabled" is on: the seconds it took,
+the files opened, listings and stat calls made by the file helpers of the library, and the bytes and read and write calls of the operating system.
+Nothing of Python or Maya is replaced. The helpers count with countFileCalls() into the calls running on their own thread, and a call includes the ones it makes.
+The bytes and system calls are for the whole process, so records of calls that ran at the same time as another one are marked "overlapped".
+They come from /proc/self/io on Linux, where reading it adds about 100 bytes and two reads, and from GetProcessIoCounters() on Windows.
+They are missing elsewhere.
+Records are appended as json lines to "profileLogPath". Once it is bigger than "profileLogSize", it's renamed to "<log>.1" and a new one is started.
+"""
+
+profilingEnabled = False
+profileLogPath = os.path.join(os.path.dirname(docDirLok), "ISMLprofile.jsonl")
+profileLogSize = 5 * 1024 * 1024  # Bytes
+profileRecords = deque(maxlen=2000)  # Records of this session, for the summary
+profileCounterKinds = ("opens", "listings", "stats")
+profileThread = threading.local()  # "counts": counters of the profiled calls running on the thread, innermost last
+profileRunning = []  # (thread id, record) of the profiled calls running on any thread
+profileLock = threading.Lock()  # Guards the running calls
+profileLogLock = threading.Lock()
+
+
+def setProfiling(enabled):
+    global profilingEnabled
+    profilingEnabled = enabled
+
+
+# Counts file work of the library for the profiled call running on this thread.
+def countFileCalls(kind, count=1):
+    counts = getattr(profileThread, "counts", None)
+    if counts:
+        with profileLock:  # Helper threads count into the same call
+            counts[-1][kind] += count
+
+
+# Returns func for a helper thread, so its file work is counted for the profiled call running on this thread.
+def withProfileCounts(func):
+    counts = getattr(profileThread, "counts", None)
+    if not counts:
+        return func
+    callCounts = counts[-1]
+    
+    def run(*args, **kwargs):
+        profileThread.counts = [callCounts]
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profileThread.counts = None
+    return run
+
+
+# Returns the bytes and calls the operating system counted for this process, or {} if they aren't available.
+def getProcessIoCounters():
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/io", "r") as ioFile:
+                values = dict(line.split(":") for line in ioFile if ":" in line)
+            return {"bytesRead": int(values["rchar"]), "bytesWritten": int(values["wchar"]), "reads": int(values["syscr"]), "writes": int(values["syscw"])}
+        except (IOError, OSError, KeyError, ValueError):
+            return {}
+    if os.name == "nt":
+        import ctypes
+        
+        class IoCounters(ctypes.Structure):
+            _fields_ = [(name, ctypes.c_ulonglong) for name in ("reads", "writes", "others", "bytesRead", "bytesWritten", "bytesOther")]
+        
+        counters = IoCounters()
+        if ctypes.windll.kernel32.GetProcessIoCounters(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters)):
+            return {"bytesRead": counters.bytesRead, "bytesWritten": counters.bytesWritten, "reads": counters.reads, "writes": counters.writes, "others": counters.others}
+    return {}
+
+
+def writeProfileRecord(record):
+    profileRecords.append(record)
+    line = json.dumps(record, sort_keys=True) + "\n"
+    with profileLogLock:
+        try:
+            if os.path.exists(profileLogPath) and os.path.getsize(profileLogPath) + len(line) > profileLogSize:
+                replaceFile(profileLogPath, "%s.1" % profileLogPath)
+            with open(profileLogPath, "a") as logFile:
+                logFile.write(line)
+        except (IOError, OSError) as ex:
+            log.warning("The profile log %s could not be written! :%s" % (profileLogPath, ex))
+
+
+# Decorator that records a call of the function while profiling is enabled.
+def profiled(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not profilingEnabled:
+            return func(*args, **kwargs)
+        start = time.time()
+        record = {"name": func.__name__, "time": start, "thread": threading.current_thread().name, "overlapped": False}
+        counts = dict((kind, 0) for kind in profileCounterKinds)
+        if getattr(profileThread, "counts", None) is None:
+            profileThread.counts = []
+        profileThread.counts.append(counts)
+        threadId = threading.current_thread().ident
+        with profileLock:
+            for runningThreadId, running in profileRunning:
+                if runningThreadId != threadId:  # Calls it makes itself don't mix their numbers with it
+                    running["overlapped"] = record["overlapped"] = True
+            profileRunning.append((threadId, record))
+        ioCounters = getProcessIoCounters()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record["seconds"] = time.time() - start
+            profileThread.counts.pop()
+            if profileThread.counts:
+                for kind in profileCounterKinds:
+                    profileThread.counts[-1][kind] += counts[kind]
+            with profileLock:
+                profileRunning[:] = [running for running in profileRunning if running[1] is not record]
+            record.update(counts)
+            endIoCounters = getProcessIoCounters()
+            record.update((kind, endIoCounters[kind] - ioCounters[kind]) for kind in ioCounters if kind in endIoCounters)
+            writeProfileRecord(record)
+    return wrapper
+
+
+def readProfileLog(logPath=None):
+    records = []
+    for path in ("%s.1" % (logPath or profileLogPath), logPath or profileLogPath):
+        try:
+            with open(path, "r") as logFile:
+                records += [json.loads(line) for line in logFile if line.strip() != ""]
+        except (IOError, OSError, ValueError):
+            pass
+    return records
+
+
+# Returns {name: {"calls", "seconds", "maxSeconds", and the sums of the counters}} of profile records.
+def summarizeProfile(records):
+    summary = {}
+    for record in records:
+        entry = summary.setdefault(record["name"], {"calls": 0, "seconds": 0.0, "maxSeconds": 0.0})
+        entry["calls"] += 1
+        entry["maxSeconds"] = max(entry["maxSeconds"], record["seconds"])
+        for kind, value in record.items():
+            if kind not in ("name", "time", "thread", "calls", "maxSeconds") and isinstance(value, (int, float)):
+                entry[kind] = entry.get(kind, 0) + value
+    return summary
+
+
+def formatProfileSummary(summary):
+    lines = ["%-30s %6s %10s %10s %8s %8s %8s %10s %10s %8s %8s" % ("", "calls", "total s", "max s", "opens", "lists", "stats", "read", "written", "reads", "writes")]
+    for name in sorted(summary, key=lambda name: -summary[name]["seconds"]):
+        entry = summary[name]
+        lines.append("%-30s %6s %10.3f %10.3f %8s %8s %8s %10s %10s %8s %8s" % (name, entry["calls"], entry["seconds"], entry["maxSeconds"], entry.get("opens", 0), entry.get("listings", 0), entry.get("stats", 0),
+                     formatBytes(entry["bytesRead"]) if "bytesRead" in entry else "-", formatBytes(entry["bytesWritten"]) if "bytesWritten" in entry else "-",
+                     entry.get("reads", "-"), entry.get("writes", "-")))
+    return "\n".join(lines)
+
+
+""" The following functions are for copying textures to the material folder
+and renaming texture nodes inside the .ma file.
+"""
+
+
+""" Textures are copied on several threads. A texture isn't copied again if an identical file is already at the destination.
+Files with the same size and mtime are treated as identical, copies keep the mtime of the source. Otherwise the content hashes are compared.
+Optionally, textures are stored once per shader directory in a store named after their content hash, and the shader folders
+only get hardlinks to it. Changing a hardlinked texture in place changes it for all shaders using it.
+"""
+
+copyWorkers = 4  # Threads used for copying textures
+useTextureStore = False  # Hardlink copied textures to the content addressed store of the shader directory
+textureStoreDirName = "textureStore"
+fileHashCache = {}  # Path -> (mtime, size, sha1)
+
+
+# Returns the sha1 of a file. "useCache" trusts a hash of the same mtime and size, which misses a change within the mtime steps of the drive.
+def hashFile(path, useCache=True):
+    countFileCalls("stats")
+    fileStat = os.stat(path)
+    cached = fileHashCache.get(path)
+    if useCache and cached is not None and cached[0] == fileStat.st_mtime and cached[1] == fileStat.st_size:
+        return cached[2]
+    sha = hashlib.sha1()
+    countFileCalls("opens")
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1048576), b""):
+            sha.update(chunk)
+    fileHashCache[path] = (fileStat.st_mtime, fileStat.st_size, sha.hexdigest())
+    return sha.hexdigest()
+
+
+# Only files of the same size are hashed. Neither the mtime nor cached hashes are trusted, since a texture saved again within the
+# 2 second mtime steps of some network drives keeps its mtime.
+def isSameFileContent(src, dst, srcStat):
+    countFileCalls("stats")
+    try:
+        dstStat = os.stat(dst)
+    except OSError:
+        return False
+    if dstStat.st_size != srcStat.st_size:
+        return False
+    return hashFile(src, useCache=False) == hashFile(dst, useCache=False)
+
+
+# Copies under a temporary name first, so an interrupted copy never looks like a complete texture.
+def copyFileAtomic(src, dst):
+    tempPath = "%s.%s.%s.tmp" % (dst, os.getpid(), threading.current_thread().ident)
+    countFileCalls("opens", 2)
+    try:
+        copy2(src, tempPath)
+        replaceFile(tempPath, dst)
+    finally:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+
+
+def transferTexture(src, dst, textureStore=None):
+    """Copies a texture to dst, unless an identical file is already there. Returns "copied", "linked" or "skipped" and the size of the texture.
+    Doesn't call Maya, so it can run on any thread.
+    """
+    countFileCalls("stats")
+    srcStat = os.stat(src)
+    if os.path.normcase(os.path.abspath(src)) == os.path.normcase(os.path.abspath(dst)) or isSameFileContent(src, dst, srcStat):
+        return "skipped", srcStat.st_size
+    if textureStore is None:
+        copyFileAtomic(src, dst)
+        return "copied", srcStat.st_size
+    
+    digest = hashFile(src)
+    storePath = os.path.join(textureStore, digest[:2], digest + os.path.splitext(src)[1].lower())
+    action = "linked"
+    if not os.path.exists(storePath):
+        if not os.path.isdir(os.path.dirname(storePath)):
+            try:
+                os.makedirs(os.path.dirname(storePath))
+            except OSError:  # Made by another thread in the meantime
+                pass
+        copyFileAtomic(src, storePath)
+        action = "copied"
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(storePath, dst)
+    except (AttributeError, OSError):  # No hardlinks in python 2 on Windows or on this drive
+        copyFileAtomic(storePath, dst)
+    return action, srcStat.st_size
+
+
+def newTransferStats():
+    return {"copied": 0, "linked": 0, "skipped": 0, "bytesCopied": 0, "bytesLinked": 0, "bytesSkipped": 0, "failed": []}
+
+
+def transferTextures(pairs, stats, textureStore=None, workers=None):
+    """Transfers all (source, destination) pairs on "workers" threads and adds the results to the stats.
+    Returns a dictionary of the sources that are now at their destination.
+    """
+    if workers is None:
+        workers = copyWorkers
+    
+    def transfer(pair):
+        try:
+            return transferTexture(pair[0], pair[1], textureStore)
+        except (IOError, OSError) as ex:
+            return "failed", ex
+    
+    transferred = {}
+    for pair, result in zip(pairs, mapInThreads(transfer, pairs, workers)):
+        if result[0] == "failed":
+            stats["failed"].append((pair[0], result[1]))
+            continue
+        stats[result[0]] += 1
+        stats["bytes%s" % result[0].capitalize()] += result[1]
+        transferred[pair[0]] = pair[1]
+    return transferred
+
+
+def formatBytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            break
+        size /= 1024.0
+    return "%.1f %s" % (size, unit)
+
+
+# Returns the texture store of the shader directory a shader file is in, or None if it isn't used. The version store always uses it.
+def getTextureStore(maFile):
+    if not useTextureStore and not useVersionStore:
+        return None
+    return os.path.join(os.path.dirname(os.path.dirname(maFile)), libraryDataDirName, textureStoreDirName)
+
+
+""" A Maya ASCII file is a list of MEL statements ending with ";". parseMaFile() splits them into tokens line by line and keeps at most
+"maStatementTokenLimit" tokens of a statement, so the numbers of meshes and animation curves are skipped without filling the memory.
+It returns the nodes, their connections and every external file the scene uses, with the node type and the attribute pointing to it.
+Attributes known to hold files are listed in "fileAttributes". Any other string attribute whose value has a known file extension is reported as well,
+so nodes of renderers that aren't listed are still found. UDIM, UV tile and frame tokens are kept in the "pattern" of a reference and
+expandFileReference() lists the files matching it. Strings Maya splits over several lines with "+" are joined.
+"""
+
+maStatementTokenLimit = 24  # Enough for the flags and values of every statement that matters, also for paths split with "+"
+maTokenPattern = re.compile(r'"((?:[^"\\]|\\.)*)"?|(;)|([^\s";]+)')
+maEscapePattern = re.compile(r"\\(.)")
+fileAttributes = {  # Node type -> attributes holding a file, in the short and long form Maya can write them
+    "file": (".ftn", ".fileTextureName"),
+    "psdFileTex": (".ftn", ".fileTextureName"),
+    "aiImage": (".filename",),
+    "aiStandIn": (".dso",),
+    "aiPhotometricLight": (".aiFilename",),
+    "imagePlane": (".imn", ".imageName"),
+    "gpuCache": (".cfn", ".cacheFileName"),
+    "AlembicNode": (".fn", ".abc_File"),
+    "VRayMesh": (".fn", ".fileName"),
+    "VRayLightIESShape": (".iesFile",),
+    "RedshiftNormalMap": (".tex0",),
+    "RedshiftSprite": (".tex0",),
+    "RedshiftDomeLight": (".tex0",),
+}
+fileExtensions = set((".png", ".jpg", ".jpeg", ".tif", ".tiff", ".tga", ".exr", ".hdr", ".hdri", ".tx", ".tex", ".psd", ".bmp", ".iff", ".dds",
+                      ".ptx", ".ies", ".abc", ".vdb", ".ass", ".vrmesh", ".rs", ".rstexbin", ".ma", ".mb", ".fbx", ".obj", ".mov", ".mp4", ".gif", ".sgi"))
+filePatternTokens = re.compile(r"(<UDIM>|<UVTILE>|u<U>_v<V>|<f>|<frame>|#+)", re.IGNORECASE)
+parseProcesses = max(1, multiprocessing.cpu_count() - 1)  # Processes used for parsing many scenes
+
+
+def unescapeMaString(raw):
+    return maEscapePattern.sub(lambda match: {"n": "\n", "t": "\t"}.get(match.group(1), match.group(1)), raw)
+
+
+def escapeMaString(text):
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def iterMaStatements(mf):
+    """Yields the tokens of every statement of an open .ma file. A token is a ("string", unescaped text, line number, raw text) or ("word", text, line number, None) tuple.
+    Tokens after the first "maStatementTokenLimit" of a statement are dropped. Lines of a long statement without any quotes aren't tokenized at all.
+    Comment lines between statements, like the header and the "//MaterialTag:" line, are skipped.
+    """
+    tokens = []
+    for lineNumber, line in enumerate(mf, 1):
+        if tokens == [] and line.startswith("//"):
+            continue
+        position = 0
+        while True:
+            if len(tokens) >= maStatementTokenLimit and line.find('"', position) == -1:
+                end = line.find(";", position)
+                if end == -1:
+                    break
+                yield tokens
+                tokens = []
+                position = end + 1
+            match = maTokenPattern.search(line, position)
+            if match is None:
+                break
+            position = match.end()
+            if match.group(2) is not None:
+                yield tokens
+                tokens = []
+            elif len(tokens) >= maStatementTokenLimit:
+                continue
+            elif match.group(3) is not None:
+                tokens.append(("word", match.group(3), lineNumber, None))
+            else:
+                tokens.append(("string", unescapeMaString(match.group(1)), lineNumber, match.group(1)))
+    if tokens != []:
+        yield tokens
+
+
+# Returns the values of a statement as (text, line number, raw text, number of parts) tuples. Strings joined with "+" become one value.
+def getStatementValues(tokens):
+    values = []
+    joinNext = False
+    for kind, text, lineNumber, raw in tokens:
+        if kind == "word" and text in ("(", ")"):
+            continue
+        if kind == "word" and text == "+":
+            joinNext = True
+            continue
+        if joinNext and kind == "string" and values != [] and values[-1][2] is not None:
+            previous = values[-1]
+            values[-1] = (previous[0] + text, previous[1], previous[2] + raw, previous[3] + 1)
+        else:
+            values.append((text, lineNumber, raw, 1))
+        joinNext = False
+    return values
+
+
+def getFlagValue(values, flag):
+    for i in range(len(values) - 1):
+        if values[i][0] == flag and values[i][2] is None:
+            return values[i+1][0]
+    return None
+
+
+def isFileReferenceValue(nodeType, attribute, value):
+    if value == "":
+        return False
+    if attribute in fileAttributes.get(nodeType, ()):
+        return True
+    if '"' in value or "\n" in value or nodeType in ("script", "expression"):  # Code, not a path
+        return False
+    return os.path.splitext(value.split("?")[0])[1].lower() in fileExtensions and ("/" in value or "\\" in value or "." in value)
+
+
+def addFileReference(graph, node, attribute, value):
+    nodeType = graph["nodes"].get(node, {}).get("type")
+    if isFileReferenceValue(nodeType, attribute, value[0]):
+        graph["references"].append({"node": node, "type": nodeType, "attribute": attribute, "path": value[0], "line": value[1],
+                                    "raw": value[2], "parts": value[3], "pattern": value[0] if filePatternTokens.search(value[0]) else None})
+
+
+def parseMaStatement(graph, state, tokens):
+    command = tokens[0][1] if tokens[0][0] == "word" else None
+    if command not in ("createNode", "select", "setAttr", "connectAttr", "file", "requires"):
+        return
+    values = getStatementValues(tokens[1 :])
+    if command == "createNode" and values != []:
+        name = getFlagValue(values, "-n")
+        state["node"] = name
+        if name is not None:
+            graph["nodes"][name] = {"type": values[0][0], "parent": getFlagValue(values, "-p")}
+    elif command == "select":
+        state["node"] = getFlagValue(values, "-ne")
+    elif command == "connectAttr":
+        plugs = [value[0] for value in values if value[2] is not None]
+        if len(plugs) >= 2:
+            graph["connections"].append((plugs[0], plugs[1]))
+    elif command == "requires":  # requires [-nodeType "type"] [-dataType "type"] "plugin" "version"
+        i = 0
+        while i < len(values) and values[i][2] is None and values[i][0].startswith("-"):
+            i += 2  # A flag and its value
+        if i < len(values) and values[i][0] != "maya":
+            graph["requires"].append(values[i][0])
+    elif command == "file":
+        flags = set(value[0] for value in values if value[2] is None)
+        strings = [value for value in values if value[2] is not None]
+        if ("-r" in flags or "-rdi" in flags) and strings != []:
+            reference = strings[-1]
+            graph["references"].append({"node": getFlagValue(values, "-rfn"), "type": "reference", "attribute": None, "path": reference[0], "line": reference[1],
+                                        "raw": reference[2], "parts": reference[3], "pattern": None})
+    elif command == "setAttr":
+        strings = [i for i in range(len(values)) if values[i][2] is not None]
+        if strings == []:
+            return
+        attribute = values[strings[0]][0]
+        node = state.get("node")
+        if not attribute.startswith("."):
+            node, attribute = attribute.split(".", 1)[0], "." + attribute.split(".", 1)[-1]
+        attribute = re.sub(r"\[\d+\]$", "", attribute)
+        dataType = getFlagValue(values, "-type")
+        if state.get("attributes") and node in graph["nodes"]:
+            graph["nodes"][node].setdefault("attributes", []).append((attribute, tuple(value[0] for value in values[strings[0]+1 :])))
+        if dataType in ("string", "stringArray") and attribute != ".cfnp":  # ".cfnp" is the pattern Maya computes from ".ftn"
+            for i in strings[2 :]:  # After the attribute and the type
+                addFileReference(graph, node, attribute, values[i])
+        elif attribute in (".uvt", ".ufe") and node is not None and len(values) > strings[0] + 1:
+            state.setdefault("fileNodes", {}).setdefault(node, {})[attribute] = values[-1][0]
+        if attribute == ".cfnp" and node is not None and dataType == "string" and len(strings) > 2:
+            state.setdefault("fileNodes", {}).setdefault(node, {})[".cfnp"] = values[strings[2]][0]
+
+
+# Sets the pattern of file nodes that use UV tiles or image sequences. Maya writes a single tile or frame into ".ftn".
+def addFileNodePatterns(graph, fileNodes):
+    for reference in graph["references"]:
+        settings = fileNodes.get(reference["node"])
+        if settings is None or reference["attribute"] not in fileAttributes["file"] or reference["pattern"] is not None:
+            continue
+        directory, name = os.path.split(reference["path"])
+        if settings.get(".cfnp"):
+            reference["pattern"] = settings[".cfnp"]
+        elif settings.get(".uvt", "0") == "3":
+            reference["pattern"] = os.path.join(directory, re.sub(r"(?<!\d)1\d{3}(?!\d)(?!.*(?<!\d)1\d{3}(?!\d))", "<UDIM>", name)).replace("\\", "/")
+        elif settings.get(".uvt", "0") in ("1", "2"):
+            reference["pattern"] = os.path.join(directory, re.sub(r"u\d+_v\d+", "u<U>_v<V>", name)).replace("\\", "/")
+        elif settings.get(".ufe") in ("1", "yes", "on"):
+            reference["pattern"] = os.path.join(directory, re.sub(r"\d+(?!.*\d)", "<f>", name)).replace("\\", "/")
+
+
+def parseMaFile(maFile, attributes=False):
+    """Returns the graph of a .ma file: {"path", "nodes": {name: {"type", "parent"}}, "connections": [(source plug, destination plug)],
+    "references": [{"node", "type", "attribute", "path", "line", "raw", "parts", "pattern"}], "requires": [plugins]}.
+    Scene references have the type "reference". "raw" is the path as written in the file and "line" the line it starts on.
+    With "attributes", every node also gets the (attribute, values) pairs of its setAttr statements, up to the token limit.
+    """
+    graph = {"path": maFile, "nodes": {}, "connections": [], "references": [], "requires": []}
+    state = {"attributes": attributes}
+    countFileCalls("opens")
+    with open(maFile, "r") as mf:
+        for tokens in iterMaStatements(mf):
+            if tokens != []:
+                parseMaStatement(graph, state, tokens)
+    addFileNodePatterns(graph, state.get("fileNodes", {}))
+    return graph
+
+
+# Returns the files on disk a reference points to. References with a pattern can match many files, or none if they are all missing.
+# Listings can be a dictionary that keeps the file names of every folder listed, for expanding many references.
+def expandFileReference(reference, listings=None):
+    if reference["pattern"] is None:
+        return [reference["path"]] if os.path.isfile(reference["path"]) else []
+    directory, name = os.path.split(reference["pattern"])
+    parts = filePatternTokens.split(name)
+    regex = "".join((r"u\d+_v\d+" if part.lower() in ("<uvtile>", "u<u>_v<v>") else r"\d+") if i % 2 == 1 else re.escape(part) for i, part in enumerate(parts))
+    regex = re.compile("^%s$" % regex, re.IGNORECASE if os.name == "nt" else 0)
+    names = None if listings is None else listings.get(directory)
+    if names is None:
+        try:
+            names = [entry.name for entry in iterDirEntries(directory or ".")]
+        except OSError:
+            names = []
+        if listings is not None:
+            listings[directory] = names
+    return sorted(os.path.join(directory, fileName).replace("\\", "/") for fileName in names if regex.match(fileName))
+
+
+def parseMaFileSafely(maFile):
+    try:
+        return parseMaFile(maFile)
+    except (IOError, OSError, UnicodeDecodeError) as ex:
+        return {"path": maFile, "error": str(ex)}
+
+
+# Maya itself can't run multiprocessing workers, it would start new Maya sessions. mayapy and python can.
+def canParseInProcesses():
+    return os.path.basename(sys.executable).lower() not in ("maya", "maya.exe", "maya.bin")
+
+
+def parseMaFiles(maFiles, processes=None):
+    """Yields the graphs of many .ma files as they are parsed, in any order, on "processes" processes.
+    Only one graph per process is in memory at a time. Files that can't be read give {"path", "error"}.
+    """
+    if processes is None:
+        processes = parseProcesses
+    maFiles = list(maFiles)
+    if processes <= 1 or len(maFiles) < 2 or not canParseInProcesses():
+        for maFile in maFiles:
+            yield parseMaFileSafely(maFile)
+        return
+    pool = multiprocessing.Pool(min(processes, len(maFiles)))
+    try:
+        for graph in pool.imap_unordered(parseMaFileSafely, maFiles, chunksize=8):
+            yield graph
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def buildDependencyReport(graphs):
+    """Sums up parsed scenes: the files each is used by, the references that point to no file, the node types and the plugins.
+    Returns {"scenes", "errors", "files": {path: [scenes]}, "missing": [(scene, node, attribute, path)], "nodeTypes": {type: count}, "plugins": {plugin: count}}.
+    """
+    report = {"scenes": 0, "errors": [], "files": {}, "missing": [], "nodeTypes": {}, "plugins": {}}
+    listings = {}
+    for graph in graphs:
+        if "error" in graph:
+            report["errors"].append((graph["path"], graph["error"]))
+            continue
+        report["scenes"] += 1
+        for node in graph["nodes"].values():
+            report["nodeTypes"][node["type"]] = report["nodeTypes"].get(node["type"], 0) + 1
+        for plugin in set(graph["requires"]):
+            report["plugins"][plugin] = report["plugins"].get(plugin, 0) + 1
+        for reference in graph["references"]:
+            paths = expandFileReference(reference, listings)
+            if paths == []:
+                report["missing"].append((graph["path"], reference["node"], reference["attribute"], reference["path"]))
+            for path in paths:
+                users = report["files"].setdefault(path, [])
+                if graph["path"] not in users:
+                    users.append(graph["path"])
+    return report
+
+
+def formatDependencyReport(report):
+    lines = []
+    for scene, node, attribute, path in report["missing"]:
+        lines.append("Missing: %s %s%s -> %s" % (scene, node, attribute or "", path))
+    for path, ex in report["errors"]:
+        lines.append("Unreadable: %s :%s" % (path, ex))
+    shared = sorted((len(users), path) for path, users in report["files"].items() if len(users) > 1)
+    for count, path in reversed(shared[-20 :]):
+        lines.append("Used by %s scenes: %s" % (count, path))
+    lines.append("Node types: %s" % ", ".join("%s %s" % (count, nodeType) for count, nodeType in sorted(((count, str(nodeType)) for nodeType, count in report["nodeTypes"].items()), reverse=True)))
+    lines.append("Plugins: %s" % ", ".join("%s (%s)" % (plugin, count) for plugin, count in sorted(report["plugins"].items())))
+    lines.append("%s scenes, %s files, %s missing references, %s unreadable scenes" % (report["scenes"], len(report["files"]), len(report["missing"]), len(report["errors"])))
+    return "\n".join(lines)
+
+
+# Returns the texture paths of all file nodes and other nodes using files of a .ma file, without duplicates. All tiles and frames of a pattern are listed.
+def listTexturesInMaFile(maFile):
+    texturePaths = []
+    for reference in parseMaFile(maFile)["references"]:
+        if reference["type"] == "reference":
+            continue
+        paths = [reference["path"]]
+        if reference["pattern"] is not None:
+            paths += expandFileReference(reference)
+        for path in paths:
+            if path not in texturePaths and filePatternTokens.search(path) is None:
+                texturePaths.append(path)
+    return texturePaths
+
+
+# Returns relink(texturePath) for relinkTexturesInMaFile() from the transferred textures. A path with a pattern like "<UDIM>" is relinked
+# to the folder its files were transferred to, once all of them were.
+def getTransferredRelink(transferred):
+    def relink(texturePath):
+        if texturePath in transferred:
+            return transferred[texturePath]
+        if filePatternTokens.search(texturePath) is None:
+            return None
+        paths = expandFileReference({"path": texturePath, "pattern": texturePath})
+        if paths == [] or any(path not in transferred for path in paths):
+            return None
+        newDirs = set(os.path.dirname(transferred[path]) for path in paths)
+        if len(newDirs) != 1:
+            return None
+        return os.path.join(newDirs.pop(), os.path.basename(texturePath)).replace("\\", "/")
+    return relink
+
+
+def relinkTexturesInMaFile(maFile, relink):
+    """Calls relink(oldTexturePath) for every file a .ma file uses, except referenced scenes. If it returns a new path, the path is changed.
+    The file is parsed first, then copied line by line to a temporary file next to it with the changed lines, which replaces the original.
+    Only one line is kept in memory at a time. Paths Maya split over several lines are left as they are.
+    Returns the number of changed texture paths. The scene is locked while it is rewritten, so two relinks of the same scene don't overwrite each other.
+    """
+    tempPath = "%s.%s.tmp" % (maFile, os.getpid())
+    with lockedFile(maFile):
+        changes = {}  # Line number -> (old raw string, new raw string) pairs
+        for reference in parseMaFile(maFile)["references"]:
+            if reference["type"] == "reference" or reference["parts"] != 1:
+                continue
+            newTexturePath = relink(reference["path"])
+            if newTexturePath is not None and newTexturePath != reference["path"]:
+                changes.setdefault(reference["line"], []).append((reference["raw"], escapeMaString(newTexturePath)))
+        if changes == {}:
+            return 0
+        countFileCalls("opens", 2)
+        try:
+            with open(maFile, "r") as mf:
+                with open(tempPath, "w") as wmf:
+                    for lineNumber, line in enumerate(mf, 1):
+                        for oldRaw, newRaw in changes.get(lineNumber, ()):
+                            line = line.replace('"%s"' % oldRaw, '"%s"' % newRaw)
+                        wmf.write(line)
+            replaceFile(tempPath, maFile)
+        finally:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+        touchShaderDir(os.path.dirname(maFile))
+    return sum(len(lineChanges) for lineChanges in changes.values())
+
+
+# Copy all textures of a .ma file to a folder and link the file nodes to the copies.
+@profiled
+def copyAndLinkTexturesInMaFile(maFile, newTextureDirPath, stats=None, warnings=None):
+    if stats is None:
+        stats = newTransferStats()
+    pairs = []
+    for oldTexturePath in listTexturesInMaFile(maFile):
+        pairs.append((oldTexturePath, os.path.join(newTextureDirPath, os.path.basename(oldTexturePath)).replace("\\","/")))
+    transferred = transferTextures(pairs, stats, getTextureStore(maFile))
+    
+    if relinkTexturesInMaFile(maFile, getTransferredRelink(transferred)) == 0:
+        message = "No textures found in .ma scene. No changes will be written."
+        if warnings is None:
+            log.warning(message)
+        else:
+            warnings.append(message)
+    return stats
+
+
+""" Relinking the textures of the whole library runs as a job. All scenes are read first to plan which textures must be copied,
+so the total amount of files and bytes is known before anything is changed. The shaders are then processed on several threads.
+Every finished shader is written to a journal file. If the job is interrupted, running it again skips the shaders in the journal.
+None of the job functions use Maya.
+"""
+
+relinkJournalPath = os.path.join(os.path.dirname(docDirLok), "ISMLrelinkJournal.json")
+
+
+# Scenes that can't be read are left out of the job and listed in "unreadable" with their error.
+def planRelinkJob(shaderPaths):
+    job = {"shaders": [], "files": 0, "bytes": 0, "missing": [], "unreadable": []}
+    for shaderPath in shaderPaths:
+        if os.path.splitext(shaderPath)[1] != ".ma":
+            continue
+        textureDir = "%s/textures" % os.path.dirname(shaderPath)
+        textures = []
+        try:
+            texturePaths = listTexturesInMaFile(shaderPath)
+        except Exception as ex:  # Also broken or binary content the tokenizer can't decode
+            job["unreadable"].append((shaderPath, ex))
+            continue
+        for oldTexturePath in texturePaths:
+            try:
+                size = os.stat(oldTexturePath).st_size
+            except OSError:
+                job["missing"].append((shaderPath, oldTexturePath))
+                continue
+            textures.append((oldTexturePath, os.path.join(textureDir, os.path.basename(oldTexturePath)).replace("\\","/"), size))
+            job["files"] += 1
+            job["bytes"] += size
+        job["shaders"].append({"path": shaderPath, "textureDir": textureDir, "textureStore": getTextureStore(shaderPath), "textures": textures})
+    return job
+
+
+def formatRelinkReport(job):
+    lines = []
+    for shader in job["shaders"]:
+        lines.append("%s: %s textures, %s" % (shader["path"], len(shader["textures"]), formatBytes(sum(texture[2] for texture in shader["textures"]))))
+    for shaderPath, texturePath in job["missing"]:
+        lines.append("Missing texture in %s: %s" % (shaderPath, texturePath))
+    for shaderPath, ex in job["unreadable"]:
+        lines.append("Unreadable scene %s :%s" % (shaderPath, ex))
+    lines.append("%s shaders, %s textures, %s, %s missing textures, %s unreadable scenes" % (len(job["shaders"]), job["files"], formatBytes(job["bytes"]),
+                                                                                          len(job["missing"]), len(job["unreadable"])))
+    return "\n".join(lines)
+
+
+# Returns the shaders that are already done according to the journal, or None if there is no journal of this job. Nothing is written.
+def readRelinkJournal(journalPath, job):
+    shaderPaths = sorted(shader["path"] for shader in job["shaders"])
+    done = set()
+    try:
+        with open(journalPath, "r") as journal:
+            if json.loads(journal.readline()).get("shaders") == shaderPaths:
+                for line in journal:
+                    done.add(json.loads(line)["done"])
+                return done
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+
+# Replaces the journal with a new one that only has the header line. The folder of the default journals doesn't exist without Maya.
+def startJournal(journalPath, header):
+    journalDir = os.path.dirname(journalPath)
+    if journalDir != "" and not os.path.isdir(journalDir):
+        os.makedirs(journalDir)
+    with open(journalPath, "w") as journal:
+        journal.write("%s\n" % json.dumps(header))
+
+
+def addTransferStats(totals, stats):
+    for key in totals:
+        totals[key] += stats[key]
+
+
+def runRelinkJob(job, journalPath, progress=None, workers=None):
+    """Copies the textures and relinks the scenes of a planned job. Shaders already in the journal are skipped.
+    progress(doneFiles, totalFiles, doneBytes, totalBytes) is called on the calling thread after every shader. If it returns False, the job stops
+    after the shaders that are currently processed. The journal is removed once every shader was relinked without errors.
+    """
+    if workers is None:
+        workers = copyWorkers
+    done = readRelinkJournal(journalPath, job)
+    if done is None:
+        startJournal(journalPath, {"shaders": sorted(shader["path"] for shader in job["shaders"])})
+        done = set()
+    remaining = [shader for shader in job["shaders"] if shader["path"] not in done]
+    doneFiles = sum(len(shader["textures"]) for shader in job["shaders"] if shader["path"] in done)
+    doneBytes = sum(texture[2] for shader in job["shaders"] if shader["path"] in done for texture in shader["textures"])
+    
+    todo = Queue()
+    for shader in remaining:
+        todo.put(shader)
+    results = Queue()
+    stop = threading.Event()
+    
+    def worker():
+        while not stop.is_set():
+            try:
+                shader = todo.get_nowait()
+            except Empty:
+                return
+            stats = newTransferStats()
+            try:
+                if not os.path.isdir(shader["textureDir"]):
+                    os.mkdir(shader["textureDir"])
+                pairs = [(texture[0], texture[1]) for texture in shader["textures"]]
+                transferred = transferTextures(pairs, stats, shader["textureStore"], workers=1)
+                relinkTexturesInMaFile(shader["path"], getTransferredRelink(transferred))
+            except Exception as ex:  # Any error only fails this shader, the worker goes on with the next one
+                stats["failed"].append((shader["path"], ex))
+            results.put((shader, stats))
+    
+    threads = [threading.Thread(target=withProfileCounts(worker), name="ISMLRelink") for i in range(max(1, min(workers, len(remaining))))]
+    for thread in threads:
+        thread.start()
+    
+    totals = newTransferStats()
+    finished = 0
+    while finished < len(remaining):
+        try:
+            shader, stats = results.get(timeout=0.1)
+        except Empty:
+            if not any(thread.is_alive() for thread in threads) and results.empty():
+                break  # Stopped
+            continue
+        finished += 1
+        addTransferStats(totals, stats)
+        doneFiles += len(shader["textures"])
+        doneBytes += sum(texture[2] for texture in shader["textures"])
+        if stats["failed"] == []:
+            with open(journalPath, "a") as journal:
+                journal.write("%s\n" % json.dumps({"done": shader["path"]}))
+        if progress is not None and progress(doneFiles, job["files"], doneBytes, job["bytes"]) is False:
+            stop.set()
+    for thread in threads:
+        thread.join()
+    
+    if finished == len(remaining) and totals["failed"] == [] and os.path.exists(journalPath):
+        os.remove(journalPath)
+    return totals
+
+
+""" "Copy To" syncs a project folder to a destination instead of copying all of it. Every file is compared with the one at the destination,
+by size, by size and mtime, or by size and content, and only the files that differ are copied, on several threads.
+Copies keep the mtime of their source, so the next sync skips them. Files that are only at the destination can be deleted, so it mirrors the source.
+Every copied file is written to a journal. An interrupted sync that is started again skips them without comparing them again.
+The lock and temporary files of writers on the shared drive are never synced.
+"""
+
+syncCompare = "mtime"  # "size", "mtime" or "hash"
+syncJournalPath = os.path.join(os.path.dirname(docDirLok), "ISMLsyncJournal.json")
+syncIgnoredExts = (".lock", ".tmp")  # Files that are only there while someone writes
+
+
+# Returns the (relative path, stat) pairs of all files and the relative paths of all folders below root.
+def walkSyncTree(root):
+    files = []
+    dirs = []
+    pending = [""]
+    while pending != []:
+        relDir = pending.pop()
+        for entry in iterDirEntries(os.path.join(root, relDir)):
+            relPath = os.path.join(relDir, entry.name)
+            if entry.is_dir():
+                dirs.append(relPath)
+                pending.append(relPath)
+            elif not entry.name.endswith(syncIgnoredExts):
+                files.append((relPath, entry.stat()))
+    return files, dirs
+
+
+def isSyncedFile(src, dst, srcStat, dstStat, compare):
+    if dstStat.st_size != srcStat.st_size:
+        return False
+    if compare == "size":
+        return True
+    if compare == "mtime":
+        return abs(dstStat.st_mtime - srcStat.st_mtime) < 2  # Some network drives only keep the mtime in 2 second steps
+    return hashFile(src) == hashFile(dst)
+
+
+# Returns the relative paths of the files copied by an interrupted sync of the same folders, with the size and mtime their source had,
+# or None if there is no journal of these folders. Nothing is written.
+def readSyncJournal(journalPath, source, destination):
+    header = {"source": source, "destination": destination}
+    done = {}
+    try:
+        with open(journalPath, "r") as journal:
+            if json.loads(journal.readline()) == header:
+                for line in journal:
+                    entry = json.loads(line)
+                    done[entry["done"]] = (entry["size"], entry["mtime"])
+                return done
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+
+def planSync(source, destination, compare=None, mirror=False, journalPath=None, workers=None):
+    """Compares the source folder with the destination folder and returns the sync job. The destination doesn't have to exist.
+    The job lists the folders to make, the files to copy with their size, and if mirror is set, the files and folders to delete.
+    """
+    if compare is None:
+        compare = syncCompare
+    if workers is None:
+        workers = copyWorkers
+    done = {} if journalPath is None else readSyncJournal(journalPath, source, destination) or {}
+    srcFiles, srcDirs = walkSyncTree(source)
+    dstFiles, dstDirs = ({}, []) if not os.path.isdir(destination) else walkSyncTree(destination)
+    dstFiles = dict(dstFiles)
+    
+    job = {"source": source, "destination": destination, "mirror": mirror, "dirs": [], "copy": [], "delete": [], "deleteDirs": [],
+           "files": 0, "bytes": 0, "unchanged": 0, "bytesUnchanged": 0}
+    dstDirSet = set(dstDirs)
+    job["dirs"] = sorted(relDir for relDir in srcDirs if relDir not in dstDirSet)
+    
+    toCompare = []
+    for relPath, srcStat in srcFiles:
+        dstStat = dstFiles.get(relPath)
+        if dstStat is None:
+            job["copy"].append((relPath, srcStat.st_size, srcStat.st_mtime))
+        elif done.get(relPath) == (srcStat.st_size, srcStat.st_mtime) and dstStat.st_size == srcStat.st_size:
+            job["unchanged"] += 1
+            job["bytesUnchanged"] += srcStat.st_size
+        else:
+            toCompare.append((relPath, srcStat, dstStat))
+    
+    def compareFile(item):
+        try:
+            return isSyncedFile(os.path.join(source, item[0]), os.path.join(destination, item[0]), item[1], item[2], compare)
+        except (IOError, OSError):
+            return False
+    
+    for item, synced in zip(toCompare, mapInThreads(compareFile, toCompare, workers)):
+        if synced:
+            job["unchanged"] += 1
+            job["bytesUnchanged"] += item[1].st_size
+        else:
+            job["copy"].append((item[0], item[1].st_size, item[1].st_mtime))
+    job["copy"].sort()
+    job["files"] = len(job["copy"])
+    job["bytes"] = sum(size for relPath, size, mtime in job["copy"])
+    
+    if mirror:
+        srcFileSet = set(relPath for relPath, srcStat in srcFiles)
+        srcDirSet = set(srcDirs + [""])
+        job["deleteDirs"] = sorted(relDir for relDir in dstDirs if relDir not in srcDirSet and os.path.dirname(relDir) in srcDirSet)
+        deletedDirs = set(job["deleteDirs"])
+        for relPath in sorted(dstFiles):
+            if relPath in srcFileSet:
+                continue
+            parent = os.path.dirname(relPath)
+            while parent != "" and parent not in deletedDirs:
+                parent = os.path.dirname(parent)
+            if parent == "":  # Not inside a folder that is deleted as a whole
+                job["delete"].append(relPath)
+    return job
+
+
+def runSync(job, journalPath=None, progress=None, workers=None):
+    """Copies the files of a planned sync job on "workers" threads and deletes the files of a mirror job.
+    progress(doneFiles, totalFiles, doneBytes, totalBytes) is called on the calling thread after every file. If it returns False, the sync stops
+    after the files that are currently copied. Nothing is deleted if the sync was stopped or a file failed.
+    Returns the stats, including the seconds it took.
+    """
+    if workers is None:
+        workers = copyWorkers
+    startTime = time.time()
+    stats = {"copied": 0, "bytesCopied": 0, "unchanged": job["unchanged"], "bytesUnchanged": job["bytesUnchanged"], "deleted": 0, "failed": [], "seconds": 0.0}
+    
+    for relDir in [""] + job["dirs"]:
+        dirPath = os.path.join(job["destination"], relDir)
+        if not os.path.isdir(dirPath):
+            os.makedirs(dirPath)
+    
+    todo = Queue()
+    for item in job["copy"]:
+        todo.put(item)
+    results = Queue()
+    stop = threading.Event()
+    
+    def worker():
+        while not stop.is_set():
+            try:
+                item = todo.get_nowait()
+            except Empty:
+                return
+            try:
+                copyFileAtomic(os.path.join(job["source"], item[0]), os.path.join(job["destination"], item[0]))
+                results.put((item, None))
+            except (IOError, OSError) as ex:
+                results.put((item, ex))
+    
+    threads = [threading.Thread(target=withProfileCounts(worker), name="ISMLSync") for i in range(max(1, min(workers, len(job["copy"]))))]
+    for thread in threads:
+        thread.start()
+    
+    finished = 0
+    doneBytes = 0
+    if journalPath is not None and readSyncJournal(journalPath, job["source"], job["destination"]) is None:
+        startJournal(journalPath, {"source": job["source"], "destination": job["destination"]})
+    journal = None if journalPath is None else open(journalPath, "a")
+    try:
+        while finished < len(job["copy"]):
+            try:
+                item, ex = results.get(timeout=0.1)
+            except Empty:
+                if not any(thread.is_alive() for thread in threads) and results.empty():
+                    break  # Stopped
+                continue
+            finished += 1
+            doneBytes += item[1]
+            if ex is None:
+                stats["copied"] += 1
+                stats["bytesCopied"] += item[1]
+                if journal is not None:
+                    journal.write("%s\n" % json.dumps({"done": item[0], "size": item[1], "mtime": item[2]}))
+                    journal.flush()
+            else:
+                stats["failed"].append((os.path.join(job["source"], item[0]), ex))
+            if progress is not None and progress(finished, job["files"], doneBytes, job["bytes"]) is False:
+                stop.set()
+    finally:
+        stop.set()  # Also stops the threads if progress() raised
+        for thread in threads:
+            thread.join()
+        if journal is not None:
+            journal.close()
+    
+    if finished == len(job["copy"]) and stats["failed"] == []:
+        for relPath in job["delete"]:
+            try:
+                os.remove(os.path.join(job["destination"], relPath))
+                stats["deleted"] += 1
+            except OSError as ex:
+                stats["failed"].append((os.path.join(job["destination"], relPath), ex))
+        for relDir in job["deleteDirs"]:
+            try:
+                rmtree(os.path.join(job["destination"], relDir))
+                stats["deleted"] += 1
+            except OSError as ex:
+                stats["failed"].append((os.path.join(job["destination"], relDir), ex))
+        if journalPath is not None and os.path.exists(journalPath):
+            os.remove(journalPath)
+    stats["seconds"] = time.time() - startTime
+    return stats
+
+
+def formatSyncStats(stats):
+    return "%s files copied (%s) in %.1f s, %s/s. %s files unchanged (%s), %s deleted, %s failed." % (
+        stats["copied"], formatBytes(stats["bytesCopied"]), stats["seconds"], formatBytes(stats["bytesCopied"] / max(stats["seconds"], 0.001)),
+        stats["unchanged"], formatBytes(stats["bytesUnchanged"]), stats["deleted"], len(stats["failed"]))
+
+
+""" The shader catalog is a json file stored in a ".ISML" folder inside every shader directory. It remembers the content of each shader folder
+together with the folder's modification time, so a refresh only has to list the folders that have changed since the last scan.
+It also remembers the modification time of the shader directory. While that is unchanged, no shader folder was added or removed,
+and the folders of the catalog are stat'ed without listing the shader directory.
+Overwriting a file doesn't change the mtime of its folder, so the writers of the library that overwrite a scene or an icon call touchShaderDir().
+It is kept in its own folder, because writing it directly into the shader directory would change the mtime of the directory on every save.
+File names in the catalog are relative to their shader folder, so the catalog stays valid when a project is copied somewhere else.
+"""
+
+libraryDataDirName = ".ISML"
+catalogFileName = "catalog.json"
+catalogVersion = 2  # Catalogs written by other versions are rebuilt
+catalogCache = {}  # Root path -> (mtime of the catalog file, catalog)
+
+
+def emptyCatalog():
+    return {"version": catalogVersion, "dirs": {}}
+
+
+# Load the catalog of a shader directory. Uses the cached one if the file didn't change since it was last read.
+def loadCatalog(shaderDirDefaultPath):
+    catalogPath = getCatalogPath(shaderDirDefaultPath)
+    countFileCalls("stats")
+    try:
+        catalogMtime = os.stat(catalogPath).st_mtime
+    except OSError:
+        return emptyCatalog()
+    
+    cached = catalogCache.get(shaderDirDefaultPath)
+    if cached is not None and cached[0] == catalogMtime:
+        return cached[1]
+    
+    countFileCalls("opens")
+    try:
+        with open(catalogPath, "r") as catalogFile:
+            catalog = json.load(catalogFile)
+    except (IOError, OSError, ValueError):
+        return emptyCatalog()
+    if catalog.get("version") != catalogVersion:
+        return emptyCatalog()
+    catalogCache[shaderDirDefaultPath] = (catalogMtime, catalog)
+    return catalog
+
+
+def getCatalogPath(shaderDirDefaultPath):
+    return os.path.join(shaderDirDefaultPath, libraryDataDirName, catalogFileName)
+
+
+def saveCatalog(shaderDirDefaultPath, catalog, warnings=None, expectedMtime=False):
+    """Write the catalog next to the shader folders. If expectedMtime is given, the catalog is only written if the file still has that mtime,
+    or None for no file. Otherwise someone else saved it in the meantime, and their catalog is kept.
+    """
+    dataDir = os.path.join(shaderDirDefaultPath, libraryDataDirName)
+    catalogPath = getCatalogPath(shaderDirDefaultPath)
+    try:
+        if not os.path.isdir(dataDir):
+            os.mkdir(dataDir)
+        with lockedFile(catalogPath):
+            if expectedMtime is not False and (getFileVersion(catalogPath) or (None,))[0] != expectedMtime:
+                return
+            writeFileAtomic(catalogPath, json.dumps(catalog, separators=(",", ":")))
+            catalogCache[shaderDirDefaultPath] = (os.stat(catalogPath).st_mtime, catalog)
+    except (IOError, OSError) as ex:
+        message = "Shader catalog for %s could not be saved! :%s" % (shaderDirDefaultPath, ex)
+        if warnings is None:
+            log.warning(message)
+        else:
+            warnings.append(message)
+
+
+# os.replace doesn't exist in python 2 and os.rename fails on Windows if the destination exists.
+def replaceFile(src, dst):
+    try:
+        os.replace(src, dst)
+    except AttributeError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+""" The shared drive is written by many artists at the same time. A writer holds a "<file>.lock" file while it reads and rewrites a file,
+so a change made in between is never lost, and writes the new content under a temporary name first, so readers never see half of a file.
+While a lock is held, a heartbeat thread touches it every "lockHeartbeat" seconds, so long writes like relinking a large scene keep it.
+A lock that wasn't touched for "staleLockAge" seconds was left behind by a writer that crashed and is taken over.
+Writes that only refresh a cache, like the catalog after a scan, are skipped if someone else changed the file since it was read.
+"""
+
+lockTimeout = 10.0  # Seconds to wait for a lock held by someone else
+staleLockAge = 60.0  # Seconds after which a lock that wasn't touched is taken over. Must be longer than the clock difference between machines.
+lockHeartbeat = 15.0  # Seconds between touching the held locks
+lockExt = ".lock"
+
+heldLocks = {}  # Lock path -> owner written into the lock
+heldLocksLock = threading.Lock()
+lockHeartbeatThread = None
+
+
+# Touches the locks this process holds, so nobody takes them over as stale.
+def touchHeldLocks():
+    with heldLocksLock:
+        locks = list(heldLocks.items())
+    for lockPath, owner in locks:
+        if readLockOwner(lockPath) == owner:
+            try:
+                os.utime(lockPath, None)
+            except OSError:
+                pass
+
+
+def runLockHeartbeat():
+    while True:
+        time.sleep(lockHeartbeat)
+        touchHeldLocks()
+
+
+def startLockHeartbeat():
+    global lockHeartbeatThread
+    with heldLocksLock:
+        if lockHeartbeatThread is None:
+            lockHeartbeatThread = threading.Thread(target=runLockHeartbeat, name="ISMLLockHeartbeat")
+            lockHeartbeatThread.daemon = True
+            lockHeartbeatThread.start()
+
+
+# Puts a lock that was moved away back, unless someone created a new lock in the meantime.
+def restoreLock(stalePath, lockPath):
+    try:
+        if hasattr(os, "link"):
+            os.link(stalePath, lockPath)  # Fails if the lock exists, unlike os.rename on Linux
+            os.remove(stalePath)
+        else:
+            os.rename(stalePath, lockPath)
+    except OSError:
+        log.warning("The lock %s was taken over by two writers: %s" % (lockPath, readLockOwner(stalePath)))
+        try:
+            os.remove(stalePath)
+        except OSError:
+            pass
+
+
+# Moves a lock away if it wasn't touched for "staleLockAge" seconds. Moving it first makes sure only one waiting writer takes it over.
+# If the moved lock isn't the stale one, because it was released and locked again or touched in between, it is put back.
+def breakStaleLock(lockPath):
+    try:
+        lockStat = os.stat(lockPath)
+        if time.time() - lockStat.st_mtime < staleLockAge:
+            return
+        owner = readLockOwner(lockPath)
+        stalePath = "%s.%s.%s.stale" % (lockPath, os.getpid(), threading.current_thread().ident)
+        os.rename(lockPath, stalePath)
+    except OSError:
+        return  # Released or taken over by someone else in the meantime
+    try:
+        movedStat = os.stat(stalePath)
+    except OSError:
+        return
+    if readLockOwner(stalePath) != owner or movedStat.st_mtime != lockStat.st_mtime:
+        restoreLock(stalePath, lockPath)
+        return
+    log.warning("Took over the stale lock %s: %s" % (lockPath, owner))
+    os.remove(stalePath)
+
+
+def readLockOwner(lockPath):
+    try:
+        with open(lockPath, "r") as lockFile:
+            return lockFile.read()
+    except (IOError, OSError):
+        return "unknown"
+
+
+def acquireLock(path, timeout=None):
+    """Creates "<path>.lock" and returns its path. A lock held by someone else is waited for up to "timeout" seconds,
+    then IOError is raised. A timeout of 0 only tries once.
+    """
+    if timeout is None:
+        timeout = lockTimeout
+    lockPath = path + lockExt
+    owner = json.dumps({"host": socket.gethostname(), "pid": os.getpid(), "time": time.time(), "token": hashlib.sha1(os.urandom(16)).hexdigest()})
+    deadline = time.time() + timeout
+    delay = 0.01
+    while True:
+        try:
+            lockFd = os.open(lockPath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError as ex:
+            if ex.errno != errno.EEXIST:
+                raise
+        else:
+            os.write(lockFd, owner.encode("utf-8"))
+            os.close(lockFd)
+            with heldLocksLock:
+                heldLocks[lockPath] = owner
+            startLockHeartbeat()
+            return lockPath
+        breakStaleLock(lockPath)
+        if time.time() >= deadline:
+            raise IOError("%s is locked by %s" % (path, readLockOwner(lockPath)))
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+# Removes a lock, unless it was taken over by someone else since it was acquired.
+def releaseLock(lockPath):
+    with heldLocksLock:
+        owner = heldLocks.pop(lockPath, None)
+    if owner is not None and readLockOwner(lockPath) != owner:
+        log.warning("The lock %s was taken over by %s" % (lockPath, readLockOwner(lockPath)))
+        return
+    try:
+        os.remove(lockPath)
+    except OSError:
+        pass
+
+
+@contextmanager
+def lockedFile(path, timeout=None):
+    lockPath = acquireLock(path, timeout)
+    try:
+        yield
+    finally:
+        releaseLock(lockPath)
+
+
+# Returns the mtime and size of a file, or None if it doesn't exist. Writers compare it with the one they read to see if someone else wrote the file in between.
+def getFileVersion(path):
+    try:
+        fileStat = os.stat(path)
+    except OSError:
+        return None
+    return fileStat.st_mtime, fileStat.st_size
+
+
+def writeFileAtomic(path, text):
+    """Writes text to a temporary file next to path, flushes it to the disk and then replaces path with it.
+    Replacing is tried a few times, since Windows doesn't allow it while another program reads the file.
+    """
+    tempPath = "%s.%s.%s.tmp" % (path, os.getpid(), threading.current_thread().ident)
+    countFileCalls("opens")
+    try:
+        with open(tempPath, "w") as tempFile:
+            tempFile.write(text)
+            tempFile.flush()
+            os.fsync(tempFile.fileno())
+        for attempt in range(5):
+            try:
+                replaceFile(tempPath, path)
+                break
+            except OSError:
+                if attempt == 4:
+                    raise
+                time.sleep(0.1 * (attempt + 1))
+    finally:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+
+
+""" Tags and comments are stored in a small json file in the shader folder, so changing them doesn't rewrite the scene.
+They apply to all versions of the shader. Shaders exported by older versions of the tool have them on the second and third
+line of the .ma file instead. These are still read as long as the shader has no metadata file, and are moved to one
+the first time the tag or comment is changed, or for the whole library with "Move Tags And Comments To Metadata Files".
+"""
+
+metadataFileName = ".ISMLmeta.json"
+metadataCache = {}  # Shader path -> (mtime, size, tag, comment)
+iconMtimes = {}  # Icon path -> mtime from the catalog
+
+
+def getMetadataPath(shaderPath):
+    return os.path.join(os.path.dirname(shaderPath), metadataFileName)
+
+
+# Reads the tag and comment from the header lines of a .ma file.
+def readHeaderMetadata(shaderPath):
+    tag = ""
+    comment = ""
+    if os.path.splitext(shaderPath)[1] != ".ma":
+        return tag, comment
+    countFileCalls("opens")
+    try:
+        with open(shaderPath, "r") as mf:
+            header = [mf.readline() for i in range(3)]
+    except (IOError, OSError):
+        return tag, comment
+    if header[1][:14] == "//MaterialTag:":
+        tag = header[1][15:].strip("\n")
+    if header[2][:9] == "//ShComm:":
+        comment = header[2][10:].rstrip("\n").replace("__nwlne__", "\n")
+    return tag, comment
+
+
+# Returns the content of the metadata file of a shader folder, or None if it has none.
+def readMetadataFile(shaderPath):
+    countFileCalls("opens")
+    try:
+        with open(getMetadataPath(shaderPath), "r") as metadataFile:
+            return json.load(metadataFile)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+# Reads the tag and comment of a shader from its metadata file, or from the header of the scene if there is none.
+def readShaderMetadata(shaderPath):
+    metadata = readMetadataFile(shaderPath)
+    if metadata is None:
+        return readHeaderMetadata(shaderPath)
+    return metadata.get("tag", ""), metadata.get("comment", "")
+
+
+# Writes the metadata file under a temporary name first, so a crash never leaves half of it. The authors of the versions are kept, unless new ones are given.
+def writeShaderMetadataFile(shaderPath, tag, comment, authors=None):
+    if authors is None:
+        authors = (readMetadataFile(shaderPath) or {}).get("authors", {})
+    writeFileAtomic(getMetadataPath(shaderPath), json.dumps({"tag": tag, "comment": comment, "authors": authors}))
+
+
+# Stand-in for os.scandir entries, used if neither os.scandir nor the scandir module is available.
+class ListdirEntry(object):
+    def __init__(self, dirPath, name):
+        self.name = name
+        self.path = os.path.join(dirPath, name)
+        self._stat = None
+    
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+    
+    def is_dir(self):
+        try:
+            return S_ISDIR(self.stat().st_mode)
+        except OSError:
+            return False
+    
+    def is_file(self):
+        try:
+            return S_ISREG(self.stat().st_mode)
+        except OSError:
+            return False
+
+
+def iterDirEntries(dirPath):
+    """Yields the entries of a directory. os.scandir gets the type of every entry together with the listing,
+    and on Windows also its size and mtime, so is_dir(), is_file() and stat() mostly don't need another call to the file server.
+    """
+    countFileCalls("listings")
+    if scandir is None:
+        for name in os.listdir(dirPath):
+            yield ListdirEntry(dirPath, name)
+    else:
+        for entry in scandir(dirPath):
+            yield entry
+
+
+# Lists a single shader folder and returns its catalog entry. Only scene files are stat'ed, for their size and mtime.
+# The versions are ordered by their version number.
+def scanShaderDir(mtlDir, dirMtime):
+    entry = {"mtime": dirMtime, "versions": [], "icon": None, "tag": "", "comment": ""}
+    try:
+        mtlFiles = sorted(iterDirEntries(mtlDir), key=lambda fileEntry: fileEntry.name)  # Gets material and icon
+    except OSError:
+        return entry
+    
+    hasMetadataFile = False
+    manifestPaths = []
+    for fileEntry in mtlFiles:
+        if fileEntry.name == metadataFileName:
+            hasMetadataFile = True
+            continue
+        if fileEntry.name.endswith(versionManifestExt):
+            manifestPaths.append(fileEntry.path)
+            continue
+        ext = os.path.splitext(fileEntry.name)[1]
+        if ext != ".ma" and ext != ".mb" and ext != ".png":
+            continue
+        try:
+            if not fileEntry.is_file():
+                continue
+            countFileCalls("stats")
+            if ext == ".png":
+                entry["icon"] = fileEntry.name
+                entry["iconMtime"] = fileEntry.stat().st_mtime
+            else:
+                fileStat = fileEntry.stat()
+                entry["versions"].append({"file": fileEntry.name, "number": splitVersionName(fileEntry.name)[1], "mtime": fileStat.st_mtime, "size": fileStat.st_size, "author": ""})
+        except OSError:
+            continue
+    
+    # Packed versions. A manifest next to its scene file is left over from an interrupted packing and is ignored.
+    unpackedFiles = set(version["file"] for version in entry["versions"])
+    for manifestPath in manifestPaths:
+        manifest = readVersionManifest(manifestPath)
+        if manifest is not None and manifest["file"] not in unpackedFiles:
+            entry["versions"].append({"file": manifest["file"], "number": splitVersionName(manifest["file"])[1], "mtime": manifest["mtime"], "size": manifest["size"], "author": "", "packed": True})
+    
+    if entry["versions"] != []:
+        entry["versions"] = sortVersions(entry["versions"])
+        newestVersion = os.path.join(mtlDir, entry["versions"][-1]["file"])
+        metadata = readMetadataFile(newestVersion) if hasMetadataFile else None
+        if metadata is None:
+            entry["tag"], entry["comment"] = readHeaderMetadata(newestVersion)
+        else:
+            entry["tag"], entry["comment"] = metadata.get("tag", ""), metadata.get("comment", "")
+            for version in entry["versions"]:
+                version["author"] = metadata.get("authors", {}).get(version["file"], "")
+    return entry
+
+
+# Changing the tag or comment doesn't change the mtime of the shader folder, so the catalog entry is updated directly.
+def updateCatalogEntry(shaderPath, **values):
+    mtlDir = os.path.dirname(shaderPath)
+    shaderDirDefaultPath = os.path.dirname(mtlDir)
+    catalogMtime = (getFileVersion(getCatalogPath(shaderDirDefaultPath)) or (None,))[0]
+    catalog = loadCatalog(shaderDirDefaultPath)
+    entry = catalog["dirs"].get(os.path.basename(mtlDir))
+    if entry is None:
+        return
+    entry.update(values)
+    saveCatalog(shaderDirDefaultPath, catalog, expectedMtime=catalogMtime)  # If someone else saved it in between, the next scan updates the folder
+
+
+# Gives a shader folder a new mtime after one of its files was overwritten in place, so the next scan lists it again.
+def touchShaderDir(mtlDir):
+    try:
+        os.utime(mtlDir, None)
+    except OSError:
+        pass
+
+
+""" Shader directories are mostly on network drives, so scanning them is dominated by the latency of every call.
+Shader folders are therefore checked on several threads at once and all shader directories are scanned at the same time.
+A shader directory that doesn't respond within "scanTimeout" seconds is skipped, so it doesn't block the others.
+The scanning threads don't call Maya. Their warnings are collected and shown once they are done.
+"""
+
+scanWorkers = 8  # Threads used for the shader folders of each shader directory
+scanTimeout = 60.0  # Seconds after which a shader directory that didn't respond is skipped
+hangingScans = {}  # Shader directory -> scan thread that timed out. The directory isn't scanned again until that thread has ended.
+hangingScansLock = threading.Lock()
+
+
+# Calls func for every item on up to "workers" threads and returns the results in the order of the items.
+def mapInThreads(func, items, workers):
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    
+    results = [None] * len(items)
+    errors = []
+    itemQueue = Queue()
+    for i in range(len(items)):
+        itemQueue.put(i)
+    
+    def worker():
+        while True:
+            try:
+                i = itemQueue.get_nowait()
+            except Empty:
+                return
+            try:
+                results[i] = func(items[i])
+            except Exception as ex:
+                errors.append(ex)
+    
+    threads = [threading.Thread(target=withProfileCounts(worker)) for i in range(min(workers, len(items)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors != []:
+        raise errors[0]
+    return results
+
+
+# Yields (folder name, catalog entry) for every shader folder of a shader directory. Folders are checked in chunks on "workers" threads.
+# If the names of the shader folders are given, they are stat'ed instead of listing the shader directory.
+def iterShaderRecords(shaderDirDefaultPath, catalogDirs, workers, dirNames=None):
+    # Returns the up to date catalog entry of a shader folder. Its mtime comes with the listing on Windows.
+    def getEntry(dirEntry):
+        countFileCalls("stats")
+        try:
+            dirMtime = dirEntry.stat().st_mtime
+        except OSError:
+            return None
+        entry = catalogDirs.get(dirEntry.name)
+        if entry is None or entry["mtime"] != dirMtime:
+            entry = scanShaderDir(dirEntry.path, dirMtime)
+        return entry
+    
+    if dirNames is None:
+        dirEntries = iterDirEntries(shaderDirDefaultPath)
+    else:
+        dirEntries = (ListdirEntry(shaderDirDefaultPath, dirName) for dirName in dirNames)
+    chunk = []
+    for dirEntry in dirEntries:
+        if dirEntry.name == libraryDataDirName or not dirEntry.is_dir():
+            continue
+        chunk.append(dirEntry)
+        if len(chunk) >= workers * 16:
+            for dirEntry, entry in zip(chunk, mapInThreads(getEntry, chunk, workers)):
+                if entry is not None:
+                    yield dirEntry.name, entry
+            chunk = []
+    for dirEntry, entry in zip(chunk, mapInThreads(getEntry, chunk, workers)):
+        if entry is not None:
+            yield dirEntry.name, entry
+
+
+""" Given a path the following function, goes trough all of the paths folders and ignores files. Then goes trough all found folders
+and if they contain a maya scene file, saves it in a list. Additionaly, if a png image is found, then it is also stored in a list to be used as an icon.
+Only folders whose modification time differs from the one in the catalog are listed again.
+"""
+
+def scanShaderDirectory(shaderDirDefaultPath, warnings, workers=None):
+    mtlPathList = []
+    mtlIconPathList = []
+    if workers is None:
+        workers = scanWorkers
+    
+    catalogMtime = (getFileVersion(getCatalogPath(shaderDirDefaultPath)) or (None,))[0]
+    catalog = loadCatalog(shaderDirDefaultPath)
+    catalogDirs = catalog["dirs"]
+    newCatalogDirs = {}
+    changed = False
+    try:
+        countFileCalls("stats")
+        rootMtime = os.stat(shaderDirDefaultPath).st_mtime  # Before the listing, so a folder added during the scan changes it again
+        dirNames = sorted(catalogDirs) if catalog.get("mtime") == rootMtime else None
+        for dirName, entry in iterShaderRecords(shaderDirDefaultPath, catalogDirs, workers, dirNames):
+            if entry is not catalogDirs.get(dirName):
+                changed = True
+            newCatalogDirs[dirName] = entry
+    except Exception as ex:
+        warnings.append("Path %s was not found! :%s" % (shaderDirDefaultPath, ex))
+        return [mtlPathList, mtlIconPathList]
+    
+    for dirName in sorted(newCatalogDirs):
+        entry = newCatalogDirs[dirName]
+        if entry["versions"] != []:
+            mtlDir = os.path.join(shaderDirDefaultPath,dirName)
+            versionIndex[mtlDir] = entry["versions"]
+            mtlPathList.append([os.path.join(mtlDir, version["file"]) for version in entry["versions"]])
+            newestVersion = entry["versions"][-1]
+            metadataCache[mtlPathList[-1][-1]] = (newestVersion["mtime"], newestVersion["size"], entry["tag"], entry["comment"])
+            if entry["icon"] is None:
+                mtlIconPathList.append("blinn.svg")
+            else:
+                mtlIconPathList.append(os.path.join(mtlDir, entry["icon"]))
+                iconMtimes[mtlIconPathList[-1]] = entry.get("iconMtime")
+    
+    if changed or len(newCatalogDirs) != len(catalogDirs) or catalog.get("mtime") != rootMtime:
+        catalog["dirs"] = newCatalogDirs
+        catalog["mtime"] = rootMtime
+        saveCatalog(shaderDirDefaultPath, catalog, warnings, catalogMtime)
+    return [mtlPathList, mtlIconPathList]
+
+
+# Scans all shader directories at the same time. Directories that didn't finish within the timeout are missing from the result.
+def scanShaderDirectories(shaderDirs, warnings, timeout=None, workers=None):
+    if timeout is None:
+        timeout = scanTimeout
+    results = {}
+    
+    def scanRoot(shaderDirDefaultPath):
+        rootWarnings = []
+        try:
+            pLists = scanShaderDirectory(shaderDirDefaultPath, rootWarnings, workers)
+        except Exception as ex:
+            rootWarnings.append("Path %s could not be scanned! :%s" % (shaderDirDefaultPath, ex))
+            pLists = [[], []]
+        results[shaderDirDefaultPath] = (pLists, rootWarnings)
+    
+    threads = []
+    for shaderDirDefaultPath in set(shaderDirs):
+        with hangingScansLock:
+            hangingThread = hangingScans.get(shaderDirDefaultPath)
+            if hangingThread is not None and hangingThread.is_alive():
+                warnings.append("Path %s still didn't respond to the previous scan and was skipped!" % shaderDirDefaultPath)
+                continue
+            hangingScans.pop(shaderDirDefaultPath, None)
+        thread = threading.Thread(target=withProfileCounts(scanRoot), args=(shaderDirDefaultPath,), name="ISMLScan")
+        thread.daemon = True  # A hanging network drive must not keep Maya from closing
+        thread.start()
+        threads.append((shaderDirDefaultPath, thread))
+    
+    deadline = time.time() + timeout
+    pathLists = {}
+    for shaderDirDefaultPath, thread in threads:
+        thread.join(max(0, deadline - time.time()))
+        if shaderDirDefaultPath not in results:
+            with hangingScansLock:
+                hangingScans[shaderDirDefaultPath] = thread
+            warnings.append("Path %s didn't respond within %s seconds and was skipped!" % (shaderDirDefaultPath, timeout))
+            continue
+        pLists, rootWarnings = results[shaderDirDefaultPath]
+        warnings.extend(rootWarnings)
+        pathLists[shaderDirDefaultPath] = pLists
+    return pathLists
+
+
+# Changes the tag and/or comment of a shader. The scene itself isn't touched. Returns False if nothing changed.
+def writeShaderMetadata(shaderPath, **values):
+    with lockedFile(getMetadataPath(shaderPath)):  # The value that isn't changed is read again under the lock, so a change by someone else is kept
+        tag, comment = readShaderMetadata(shaderPath)
+        newTag = values.get("tag", tag)
+        newComment = values.get("comment", comment)
+        if (newTag, newComment) == (tag, comment) and os.path.exists(getMetadataPath(shaderPath)):
+            return False
+        writeShaderMetadataFile(shaderPath, newTag, newComment)
+    invalidateShaderMetadata(shaderPath)
+    updateCatalogEntry(shaderPath, tag=newTag, comment=newComment)
+    return True
+
+
+# Writes metadata files for all shaders of the given shader directories that still have their tag and comment in the scene header.
+def migrateHeaderMetadata(shaderDirs, warnings):
+    migrated = 0
+    for shaderDirDefaultPath in shaderDirs:
+        for shaderVersions in scanShaderDirectory(shaderDirDefaultPath, warnings)[0]:
+            newestVersion = shaderVersions[-1]
+            if os.path.exists(getMetadataPath(newestVersion)):
+                continue
+            tag, comment = readHeaderMetadata(newestVersion)
+            if tag != "" or comment != "":
+                writeShaderMetadata(newestVersion, tag=tag, comment=comment)
+                migrated += 1
+    return migrated
+
+
+""" Every shader folder has a version index: its scene files ordered by version number, each with its number, mtime, size and author.
+The index is stored in the catalog, and "versionIndex" holds the one of every scanned shader folder, so finding the newest version is a single lookup.
+A new version gets the number after the highest one on disk, not after the number of versions, so deleted versions don't cause collisions.
+Version numbers are written with at least four digits and a leading zero ("_0001", "_01000"), so a name like "wall_2020.ma" isn't read as a version.
+A hidden ".<scene file>.tmp" file is created exclusively before the export, which reserves the number even if two users export at the same time.
+The export is written into it and then renamed to the scene file, so nobody sees an empty or half written version.
+"""
+
+versionIndex = {}  # Shader folder -> version entries, oldest first
+versionNamePattern = re.compile(r"^(.*?)(?:_(0\d{3,}))?(\.m[ab])$")
+versionReservationExt = ".tmp"
+
+
+# Splits a scene file name into the shader name, the version number and the extension. A name without number is the first version.
+def splitVersionName(fileName):
+    match = versionNamePattern.match(fileName)
+    if match is None:
+        name, ext = os.path.splitext(fileName)
+        return name, 1, ext
+    return match.group(1), int(match.group(2) or 1), match.group(3)
+
+
+def formatVersionName(shaderName, number, ext):
+    return "%s_0%s%s" % (shaderName, str(number).zfill(3), ext)
+
+
+def sortVersions(versions):
+    return sorted(versions, key=lambda version: (version["number"], version["file"]))
+
+
+# Returns the version entries of a shader folder. Folders that weren't scanned yet are listed once.
+def getShaderVersions(mtlDir):
+    versions = versionIndex.get(mtlDir)
+    if versions is None:
+        versions = scanShaderDir(mtlDir, None)["versions"]
+        versionIndex[mtlDir] = versions
+    return versions
+
+
+def getVersionPaths(mtlDir):
+    return [os.path.join(mtlDir, version["file"]) for version in getShaderVersions(mtlDir)]
+
+
+def getLatestVersionPath(mtlDir):
+    versions = getShaderVersions(mtlDir)
+    if versions == []:
+        return None
+    return os.path.join(mtlDir, versions[-1]["file"])
+
+
+def getVersionReservationPath(versionPath):
+    mtlDir, fileName = os.path.split(versionPath)
+    return os.path.join(mtlDir, "." + fileName + versionReservationExt)
+
+
+# Reserves the next version of a shader by creating its hidden reservation file and returns the path of the version.
+# The export is then moved into place with publishReservedVersion(), or the number is given back with releaseVersionPath().
+def reserveVersionPath(shaderPath):
+    mtlDir, fileName = os.path.split(shaderPath)
+    shaderName, number, ext = splitVersionName(fileName)
+    for name in os.listdir(mtlDir):
+        if name.endswith(versionManifestExt):  # Packed versions keep their number
+            name = name[: -len(versionManifestExt)]
+        elif name.startswith(".") and name.endswith(versionReservationExt):  # Reserved by someone else
+            name = name[1: -len(versionReservationExt)]
+        otherName, otherNumber, otherExt = splitVersionName(name)
+        if otherName == shaderName and otherExt in (".ma", ".mb"):
+            number = max(number, otherNumber)
+    
+    while True:
+        number += 1
+        versionPath = os.path.join(mtlDir, formatVersionName(shaderName, number, ext))
+        reservationPath = getVersionReservationPath(versionPath)
+        try:
+            os.close(os.open(reservationPath, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except OSError as ex:
+            if ex.errno != errno.EEXIST:
+                raise
+            continue
+        if not os.path.exists(versionPath) and not os.path.exists(versionPath + versionManifestExt):
+            return versionPath
+        os.remove(reservationPath)
+
+
+# Writes a file into the reservation of a version and renames it to the version, so the version appears complete at once.
+def publishReservedVersion(src, versionPath):
+    reservationPath = getVersionReservationPath(versionPath)
+    countFileCalls("opens", 2)
+    copy2(src, reservationPath)
+    replaceFile(reservationPath, versionPath)
+
+
+def releaseVersionPath(versionPath):
+    try:
+        os.remove(getVersionReservationPath(versionPath))
+    except OSError:
+        pass
+
+
+# Adds an exported version to the version index and the catalog, and stores its author in the metadata file.
+def addShaderVersion(shaderPath, author):
+    mtlDir, fileName = os.path.split(shaderPath)
+    fileStat = os.stat(shaderPath)
+    versions = [version for version in getShaderVersions(mtlDir) if version["file"] != fileName]
+    versions.append({"file": fileName, "number": splitVersionName(fileName)[1], "mtime": fileStat.st_mtime, "size": fileStat.st_size, "author": author})
+    versions = sortVersions(versions)
+    versionIndex[mtlDir] = versions
+    
+    with lockedFile(getMetadataPath(shaderPath)):
+        metadata = readMetadataFile(shaderPath) or {}
+        authors = metadata.get("authors", {})
+        authors[fileName] = author
+        tag, comment = readShaderMetadata(shaderPath)
+        writeShaderMetadataFile(shaderPath, tag, comment, authors)
+    invalidateShaderMetadata(shaderPath)
+    updateCatalogEntry(shaderPath, versions=versions)
+    return versions
+
+
+""" Old versions of a shader can be packed into a version store, which keeps every distinct piece of a scene only once.
+A .ma file is split into chunks at its "createNode" lines, so versions that differ in a few attributes share all other chunks.
+Other files are split into pieces of "versionChunkSize" bytes. The chunks are compressed and stored under their sha1 in the ".ISML/versionStore"
+folder of the shader directory, and the packed scene is replaced by a "<scene file>.ismlv" manifest listing its chunks.
+The newest version is never packed. An older one is rebuilt into a temporary file when it is imported, which is removed after the import.
+Rebuilt files a crashed session left behind are removed once they are older than "rebuiltVersionAge".
+Chunks of deleted shaders stay in the store until pruneVersionStore() removes them.
+"""
+
+useVersionStore = False  # Pack the previous version when a new version is exported
+versionStoreDirName = "versionStore"
+versionManifestExt = ".ismlv"
+versionChunkSize = 1024 * 1024  # Bytes, for files that aren't split at nodes and for very large nodes
+versionChunkMinSize = 16 * 1024  # Bytes, small nodes are kept together so the manifest stays short
+rebuiltVersionDir = os.path.join(tempfile.gettempdir(), "ISMLversions")
+rebuiltVersionAge = 24 * 3600.0  # Seconds
+
+
+def getVersionStore(shaderPath):
+    return os.path.join(os.path.dirname(os.path.dirname(shaderPath)), libraryDataDirName, versionStoreDirName)
+
+
+def iterVersionChunks(shaderPath):
+    with open(shaderPath, "rb") as sceneFile:
+        if os.path.splitext(shaderPath)[1] != ".ma":
+            while True:
+                data = sceneFile.read(versionChunkSize)
+                if not data:
+                    return
+                yield data
+        
+        chunk = []
+        chunkSize = 0
+        for line in sceneFile:
+            if (line.startswith(b"createNode ") and chunkSize >= versionChunkMinSize) or chunkSize >= versionChunkSize:
+                yield b"".join(chunk)
+                chunk = []
+                chunkSize = 0
+            chunk.append(line)
+            chunkSize += len(line)
+        if chunk != []:
+            yield b"".join(chunk)
+
+
+# Stores a chunk unless the store has it already. Returns its hash and the number of bytes written.
+def writeVersionChunk(store, data):
+    chunkHash = hashlib.sha1(data).hexdigest()
+    chunkPath = os.path.join(store, chunkHash[:2], chunkHash)
+    if os.path.exists(chunkPath):
+        return chunkHash, 0
+    if not os.path.isdir(os.path.dirname(chunkPath)):
+        os.makedirs(os.path.dirname(chunkPath))
+    
+    compressed = zlib.compress(data)
+    tempPath = "%s.%s.%s.tmp" % (chunkPath, os.getpid(), threading.current_thread().ident)
+    with open(tempPath, "wb") as chunkFile:
+        chunkFile.write(compressed)
+    replaceFile(tempPath, chunkPath)
+    return chunkHash, len(compressed)
+
+
+def readVersionChunk(store, chunkHash):
+    with open(os.path.join(store, chunkHash[:2], chunkHash), "rb") as chunkFile:
+        return zlib.decompress(chunkFile.read())
+
+
+def readVersionManifest(manifestPath):
+    try:
+        with open(manifestPath, "r") as manifestFile:
+            return json.load(manifestFile)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+# Yields the content of a packed version chunk by chunk. Raises ValueError if the rebuilt file doesn't match the packed one.
+def iterPackedVersion(shaderPath, manifest):
+    store = getVersionStore(shaderPath)
+    fileHash = hashlib.sha1()
+    for chunkHash in manifest["chunks"]:
+        data = readVersionChunk(store, chunkHash)
+        fileHash.update(data)
+        yield data
+    if fileHash.hexdigest() != manifest["sha1"]:
+        raise ValueError("Packed version %s is damaged" % shaderPath)
+
+
+def packVersion(shaderPath):
+    """Moves a scene file into the version store and replaces it with a manifest. The scene is only removed after the manifest was written
+    and the version could be rebuilt from the store. Returns the number of bytes the shader folder and store shrank by.
+    """
+    store = getVersionStore(shaderPath)
+    fileStat = os.stat(shaderPath)
+    fileHash = hashlib.sha1()
+    chunks = []
+    storedBytes = 0
+    for data in iterVersionChunks(shaderPath):
+        fileHash.update(data)
+        chunkHash, written = writeVersionChunk(store, data)
+        chunks.append(chunkHash)
+        storedBytes += written
+    
+    manifest = {"file": os.path.basename(shaderPath), "mtime": fileStat.st_mtime, "size": fileStat.st_size, "sha1": fileHash.hexdigest(), "chunks": chunks}
+    for data in iterPackedVersion(shaderPath, manifest):
+        pass
+    manifestPath = shaderPath + versionManifestExt
+    writeFileAtomic(manifestPath, json.dumps(manifest))
+    os.remove(shaderPath)
+    
+    mtlDir = os.path.dirname(shaderPath)
+    versions = [dict(version, packed=True) if version["file"] == manifest["file"] else version for version in getShaderVersions(mtlDir)]
+    versionIndex[mtlDir] = versions
+    updateCatalogEntry(shaderPath, versions=versions)
+    return fileStat.st_size - storedBytes - os.path.getsize(manifestPath)
+
+
+# Returns a path Maya can open for any version. Packed versions are rebuilt into the temp folder. Pass the path to releaseVersion() once it was imported.
+def materializeVersion(shaderPath):
+    if os.path.exists(shaderPath):
+        return shaderPath
+    manifest = readVersionManifest(shaderPath + versionManifestExt)
+    if manifest is None:
+        raise IOError("Version %s was not found" % shaderPath)
+    pruneRebuiltVersions()
+    
+    rebuiltPath = os.path.join(rebuiltVersionDir, "%s.%s.%s" % (manifest["sha1"], os.getpid(), threading.current_thread().ident), manifest["file"])
+    if not os.path.isdir(os.path.dirname(rebuiltPath)):
+        os.makedirs(os.path.dirname(rebuiltPath))
+    try:
+        with open(rebuiltPath, "wb") as rebuiltFile:
+            for data in iterPackedVersion(shaderPath, manifest):
+                rebuiltFile.write(data)
+    except Exception:
+        rmtree(os.path.dirname(rebuiltPath), ignore_errors=True)
+        raise
+    return rebuiltPath
+
+
+# Removes the file materializeVersion() rebuilt. Versions that weren't packed are left alone.
+def releaseVersion(versionPath):
+    rebuiltDir = os.path.dirname(versionPath)
+    if os.path.dirname(rebuiltDir) == rebuiltVersionDir:
+        rmtree(rebuiltDir, ignore_errors=True)
+
+
+# Removes rebuilt versions older than "rebuiltVersionAge", which sessions that crashed during an import left behind.
+def pruneRebuiltVersions():
+    try:
+        names = os.listdir(rebuiltVersionDir)
+    except OSError:
+        return
+    for name in names:
+        rebuiltDir = os.path.join(rebuiltVersionDir, name)
+        try:
+            if time.time() - os.stat(rebuiltDir).st_mtime > rebuiltVersionAge:
+                rmtree(rebuiltDir, ignore_errors=True)
+        except OSError:
+            pass
+
+
+# Packs all versions but the newest of every shader. Returns the number of packed versions and the bytes saved.
+def packOldVersions(shaderDirs, warnings):
+    packed = 0
+    savedBytes = 0
+    for shaderDirDefaultPath in shaderDirs:
+        for shaderVersions in scanShaderDirectory(shaderDirDefaultPath, warnings)[0]:
+            for shaderPath in shaderVersions[:-1]:
+                if not os.path.exists(shaderPath):
+                    continue
+                try:
+                    savedBytes += packVersion(shaderPath)
+                    packed += 1
+                except (IOError, OSError, ValueError) as ex:
+                    warnings.append("%s could not be packed! :%s" % (shaderPath, ex))
+    return packed, savedBytes
+
+
+# Removes the chunks no manifest of the shader directory refers to. Must not run while versions are being packed.
+def pruneVersionStore(shaderDirDefaultPath):
+    referenced = set()
+    for dirEntry in iterDirEntries(shaderDirDefaultPath):
+        if dirEntry.name == libraryDataDirName or not dirEntry.is_dir():
+            continue
+        for fileEntry in iterDirEntries(dirEntry.path):
+            if fileEntry.name.endswith(versionManifestExt):
+                manifest = readVersionManifest(fileEntry.path)
+                if manifest is None:
+                    return 0, 0  # Can't tell which chunks it needs
+                referenced.update(manifest["chunks"])
+    
+    removed = 0
+    removedBytes = 0
+    store = os.path.join(shaderDirDefaultPath, libraryDataDirName, versionStoreDirName)
+    if not os.path.isdir(store):
+        return removed, removedBytes
+    for prefixEntry in iterDirEntries(store):
+        for chunkEntry in iterDirEntries(prefixEntry.path):
+            if chunkEntry.name not in referenced and not chunkEntry.name.endswith(".tmp"):
+                removedBytes += chunkEntry.stat().st_size
+                os.remove(chunkEntry.path)
+                removed += 1
+    return removed, removedBytes
+
+
+""" Shader folders can be exported into a single zip archive, which moves much faster between sites than thousands of small files.
+The archive has a manifest with the size, mtime and crc of every file. Packed versions are stored as plain scene files, so the archive doesn't need a version store.
+A "<archive>.sha1" file next to it is used to check the archive after it was copied. copyArchive() continues an interrupted copy,
+and importArchive() skips files that were already extracted, so both can simply be started again.
+"""
+
+archiveManifestName = "ISMLmanifest.json"
+archiveVersion = 1
+archiveBlockSize = 1024 * 1024  # Bytes read and written at once when copying and extracting archives
+
+
+# Returns True if a path from an archive stays inside the folder it is extracted to.
+def isSafeArchivePath(path):
+    parts = path.replace("\\", "/").split("/")
+    return path != "" and not os.path.isabs(path) and ":" not in parts[0] and ".." not in parts
+
+
+# Writes a packed version into the archive chunk by chunk, so a large scene is never in memory at once.
+# zipfile of Python 2 can't write an entry in pieces, so there the version is rebuilt into a temporary file first.
+def writePackedVersionToArchive(archive, fileInfo, shaderPath, versionManifest):
+    if sys.version_info >= (3, 6):
+        with archive.open(fileInfo, "w", force_zip64=versionManifest["size"] > 0x7fffffff) as entryFile:
+            for data in iterPackedVersion(shaderPath, versionManifest):
+                entryFile.write(data)
+        return
+    rebuiltPath = materializeVersion(shaderPath)
+    try:
+        os.utime(rebuiltPath, (versionManifest["mtime"], versionManifest["mtime"]))
+        archive.write(rebuiltPath, fileInfo.filename)
+    finally:
+        releaseVersion(rebuiltPath)
+
+
+def exportArchive(shaderDirDefaultPath, archivePath, warnings, dirNames=None, progress=None):
+    """Writes the given shader folders of a shader directory, or all of them, into a zip archive and its checksum file.
+    progress(doneFiles, totalFiles, doneBytes, totalBytes) is called after every file. If it returns False, the export stops and no archive is written.
+    Returns the number of files and their size, or None if it was stopped.
+    """
+    if dirNames is None:
+        dirNames = sorted(entry.name for entry in iterDirEntries(shaderDirDefaultPath) if entry.is_dir() and entry.name != libraryDataDirName)
+    
+    files = []  # (path in the archive, path on disk, size, mtime, version manifest of packed versions)
+    for dirName in dirNames:
+        mtlDir = os.path.join(shaderDirDefaultPath, dirName)
+        for relPath, fileStat in sorted(walkSyncTree(mtlDir)[0]):
+            archiveName = "/".join([dirName] + relPath.replace("\\", "/").split("/"))
+            if relPath.endswith(versionManifestExt) and os.path.dirname(relPath) == "":
+                manifest = readVersionManifest(os.path.join(mtlDir, relPath))
+                if manifest is None:
+                    warnings.append("%s cannot be read, the version is not in the archive" % os.path.join(mtlDir, relPath))
+                else:
+                    files.append((archiveName[: -len(versionManifestExt)], os.path.join(mtlDir, manifest["file"]), manifest["size"], manifest["mtime"], manifest))
+                continue
+            files.append((archiveName, os.path.join(mtlDir, relPath), fileStat.st_size, fileStat.st_mtime, None))
+            if os.path.splitext(relPath)[1] == ".ma":
+                for texturePath in listTexturesInMaFile(os.path.join(mtlDir, relPath)):
+                    if not os.path.normcase(os.path.abspath(texturePath)).startswith(os.path.normcase(os.path.abspath(mtlDir)) + os.sep):
+                        warnings.append("%s uses a texture outside of its shader folder, it is not in the archive: %s" % (archiveName, texturePath))
+    totalBytes = sum(size for archiveName, path, size, mtime, versionManifest in files)
+    
+    partPath = "%s.part" % archivePath
+    manifest = {"version": archiveVersion, "project": os.path.basename(shaderDirDefaultPath.rstrip("/\\")), "root": shaderDirDefaultPath.replace("\\", "/").rstrip("/"),
+                "shaders": list(dirNames), "files": []}
+    doneBytes = 0
+    try:
+        with zipfile.ZipFile(partPath, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            for archiveName, path, size, mtime, versionManifest in files:
+                fileInfo = zipfile.ZipInfo(archiveName, time.localtime(max(mtime, 315532800))[: 6])  # Zip dates start in 1980
+                fileInfo.compress_type = zipfile.ZIP_DEFLATED
+                if versionManifest is not None:
+                    writePackedVersionToArchive(archive, fileInfo, path, versionManifest)
+                else:
+                    archive.write(path, archiveName)
+                manifest["files"].append({"path": archiveName, "size": size, "mtime": mtime, "crc": archive.getinfo(archiveName).CRC})
+                doneBytes += size
+                if progress is not None and progress(len(manifest["files"]), len(files), doneBytes, totalBytes) is False:
+                    return None
+            archive.writestr(archiveManifestName, json.dumps(manifest, indent=1))
+        with open("%s.sha1" % archivePath, "w") as checksumFile:
+            checksumFile.write("%s  %s\n" % (hashFile(partPath), os.path.basename(archivePath)))
+        replaceFile(partPath, archivePath)
+    finally:
+        if os.path.exists(partPath):
+            os.remove(partPath)
+    return len(files), totalBytes
+
+
+def readArchiveManifest(archive):
+    manifest = json.loads(archive.read(archiveManifestName).decode("utf-8"))
+    if manifest.get("version") != archiveVersion:
+        raise ValueError("Unknown archive version %s" % manifest.get("version"))
+    return manifest
+
+
+# Returns True if the archive matches its checksum file, False if it doesn't and None if there is no checksum file.
+def verifyArchive(archivePath):
+    try:
+        with open("%s.sha1" % archivePath, "r") as checksumFile:
+            checksum = checksumFile.read().split()[0]
+    except (IOError, OSError, IndexError):
+        return None
+    return hashFile(archivePath) == checksum
+
+
+def copyArchive(src, dst, progress=None):
+    """Copies an archive and its checksum file block by block. An interrupted copy leaves "<dst>.part", which the next copy continues.
+    The copy is checked against the checksum file before it is renamed to dst. Raises IOError if it doesn't match.
+    """
+    partPath = "%s.part" % dst
+    totalBytes = os.stat(src).st_size
+    doneBytes = os.path.getsize(partPath) if os.path.exists(partPath) else 0
+    if doneBytes > totalBytes:
+        doneBytes = 0
+    with open(src, "rb") as srcFile:
+        with open(partPath, "ab" if doneBytes > 0 else "wb") as dstFile:
+            srcFile.seek(doneBytes)
+            while True:
+                data = srcFile.read(archiveBlockSize)
+                if not data:
+                    break
+                dstFile.write(data)
+                doneBytes += len(data)
+                if progress is not None and progress(0, 1, doneBytes, totalBytes) is False:
+                    return False
+    
+    if os.path.exists("%s.sha1" % src):
+        copy2("%s.sha1" % src, "%s.sha1" % partPath)
+        matches = verifyArchive(partPath)
+        os.remove("%s.sha1" % partPath)
+        if not matches:
+            os.remove(partPath)
+            raise IOError("%s doesn't match its checksum, the copy was removed" % dst)
+        copy2("%s.sha1" % src, "%s.sha1" % dst)
+    replaceFile(partPath, dst)
+    return True
+
+
+def importArchive(archivePath, shaderDirDefaultPath, warnings, overwrite=False, progress=None):
+    """Extracts an archive into a shader directory and adds its shaders to the catalog. Files that are already there are skipped.
+    Shader folders that already exist with different files are skipped with a warning, unless overwrite is set.
+    Textures inside the exported shader folders are relinked to the shader directory. Scenes keep the mtime from the archive, so the .ma files are compared by it alone.
+    progress(doneFiles, totalFiles, doneBytes, totalBytes) is called after every file. If it returns False, the import stops.
+    Returns the number of extracted files, or None if it was stopped.
+    """
+    if verifyArchive(archivePath) is False:
+        raise IOError("%s doesn't match its checksum" % archivePath)
+    extracted = 0
+    with zipfile.ZipFile(archivePath, "r") as archive:
+        manifest = readArchiveManifest(archive)
+        files = []
+        conflicts = set()
+        for fileEntry in manifest["files"]:
+            if not isSafeArchivePath(fileEntry["path"]):
+                warnings.append("%s is outside of the shader directory and was skipped" % fileEntry["path"])
+                continue
+            path = os.path.join(shaderDirDefaultPath, *fileEntry["path"].split("/"))
+            try:
+                fileStat = os.stat(path)
+            except OSError:
+                files.append((fileEntry, path))
+                continue
+            if (fileStat.st_size != fileEntry["size"] and not path.endswith(".ma")) or abs(fileStat.st_mtime - fileEntry["mtime"]) >= 2:
+                conflicts.add(fileEntry["path"].split("/")[0])
+                files.append((fileEntry, path))
+        if not overwrite:
+            for dirName in sorted(conflicts):
+                warnings.append("%s already exists with other files and was skipped" % os.path.join(shaderDirDefaultPath, dirName))
+            files = [(fileEntry, path) for fileEntry, path in files if fileEntry["path"].split("/")[0] not in conflicts]
+        
+        totalBytes = sum(fileEntry["size"] for fileEntry, path in files)
+        doneBytes = 0
+        oldRoot = "%s/" % manifest["root"]
+        newRoot = "%s/" % shaderDirDefaultPath.replace("\\", "/").rstrip("/")
+        
+        def relink(oldTexturePath):
+            if oldTexturePath.replace("\\", "/").startswith(oldRoot):
+                return newRoot + oldTexturePath.replace("\\", "/")[len(oldRoot) :]
+            return None
+        
+        for fileEntry, path in files:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            tempPath = "%s.%s.tmp" % (path, os.getpid())
+            try:
+                with archive.open(fileEntry["path"]) as srcFile:  # Raises BadZipfile if the crc doesn't match
+                    with open(tempPath, "wb") as dstFile:
+                        while True:
+                            data = srcFile.read(archiveBlockSize)
+                            if not data:
+                                break
+                            dstFile.write(data)
+                if path.endswith(".ma"):
+                    relinkTexturesInMaFile(tempPath, relink)
+                os.utime(tempPath, (fileEntry["mtime"], fileEntry["mtime"]))
+                replaceFile(tempPath, path)
+            except (IOError, OSError, zipfile.BadZipfile) as ex:
+                warnings.append("%s could not be extracted! :%s" % (fileEntry["path"], ex))
+                continue
+            finally:
+                if os.path.exists(tempPath):
+                    os.remove(tempPath)
+            extracted += 1
+            doneBytes += fileEntry["size"]
+            if progress is not None and progress(extracted, len(files), doneBytes, totalBytes) is False:
+                return None
+    
+    for dirName in manifest["shaders"]:
+        versionIndex.pop(os.path.join(shaderDirDefaultPath, dirName), None)
+    scanShaderDirectory(shaderDirDefaultPath, warnings)
+    return extracted
+
+
+""" The texture audit lists the shaders whose newest version uses files that don't exist. It keeps a "textureAudit.json" cache in the ".ISML" folder
+of every shader directory with the file references of each scene, stored with the scene's mtime and size, and the file names of every texture folder
+with the folder's mtime. Adding, removing or renaming a file changes the mtime of its folder, so an audit of an unchanged library
+only stats the scenes and the texture folders, on several threads, and doesn't read or list anything.
+"""
+
+auditCacheFileName = "textureAudit.json"
+auditCacheVersion = 1
+textureAudit = {}  # Newest shader version -> missing (node, attribute, path) references, from the last audit
+
+
+def loadAuditCache(shaderDirDefaultPath):
+    try:
+        with open(os.path.join(shaderDirDefaultPath, libraryDataDirName, auditCacheFileName), "r") as cacheFile:
+            cache = json.load(cacheFile)
+        if cache.get("version") == auditCacheVersion:
+            return cache
+    except (IOError, OSError, ValueError):
+        pass
+    return {"version": auditCacheVersion, "scenes": {}, "dirs": {}}
+
+
+# The cache is only written if nobody else writes it at the moment. Their audit is just as new.
+def saveAuditCache(shaderDirDefaultPath, cache, warnings):
+    cachePath = os.path.join(shaderDirDefaultPath, libraryDataDirName, auditCacheFileName)
+    try:
+        if not os.path.isdir(os.path.dirname(cachePath)):
+            os.mkdir(os.path.dirname(cachePath))
+        with lockedFile(cachePath, 0):
+            writeFileAtomic(cachePath, json.dumps(cache, separators=(",", ":")))
+    except (IOError, OSError) as ex:
+        warnings.append("Texture audit of %s could not be saved! :%s" % (shaderDirDefaultPath, ex))
+
+
+def auditShaderDirectory(shaderDirDefaultPath, shaderPaths, warnings, workers=None):
+    """Returns the missing (node, attribute, path) references of every scene in shaderPaths, which are all in one shader directory.
+    Scenes that can't be read are reported as a single missing reference to themselves.
+    """
+    if workers is None:
+        workers = scanWorkers
+    cache = loadAuditCache(shaderDirDefaultPath)
+    scenes = {}
+    
+    def readScene(shaderPath):
+        relPath = os.path.relpath(shaderPath, shaderDirDefaultPath).replace("\\", "/")
+        fileVersion = getFileVersion(shaderPath)
+        cached = cache["scenes"].get(relPath)
+        if cached is not None and fileVersion is not None and tuple(cached[:2]) == fileVersion:
+            return relPath, cached
+        try:
+            graph = parseMaFile(shaderPath)
+        except (IOError, OSError, UnicodeDecodeError) as ex:
+            return relPath, None if fileVersion is None else [fileVersion[0], fileVersion[1], None, str(ex)]
+        references = [[reference["node"], reference["attribute"], reference["path"], reference["pattern"]] for reference in graph["references"]]
+        return relPath, [fileVersion[0], fileVersion[1], references]
+    
+    for relPath, scene in mapInThreads(readScene, [shaderPath for shaderPath in shaderPaths if shaderPath.endswith(".ma")], workers):
+        if scene is not None:
+            scenes[relPath] = scene
+    
+    directories = sorted(set(os.path.dirname(reference[3] or reference[2]) for scene in scenes.values() if scene[2] is not None for reference in scene[2]))
+    
+    def listDirectory(directory):
+        try:
+            mtime = os.stat(directory).st_mtime
+        except OSError:
+            return directory, None
+        cached = cache["dirs"].get(directory)
+        if cached is not None and cached[0] == mtime:
+            return directory, cached
+        try:
+            return directory, [mtime, sorted(entry.name for entry in iterDirEntries(directory))]
+        except OSError:
+            return directory, None
+    
+    dirs = dict((directory, listing) for directory, listing in mapInThreads(listDirectory, directories, workers) if listing is not None)
+    listings = dict((directory, listing[1]) for directory, listing in dirs.items())
+    nameSets = dict((directory, set(os.path.normcase(name) for name in names)) for directory, names in listings.items())
+    
+    results = {}
+    for relPath, scene in scenes.items():
+        shaderPath = os.path.join(shaderDirDefaultPath, *relPath.split("/"))
+        if scene[2] is None:
+            results[shaderPath] = [(None, None, "%s :%s" % (shaderPath, scene[3]))]
+            continue
+        missing = []
+        for node, attribute, path, pattern in scene[2]:
+            if pattern is not None:
+                found = expandFileReference({"path": path, "pattern": pattern}, listings) != []
+            else:
+                found = os.path.normcase(os.path.basename(path)) in nameSets.get(os.path.dirname(path), ())
+            if not found:
+                missing.append((node, attribute, path))
+        results[shaderPath] = missing
+    
+    if scenes != cache["scenes"] or dirs != cache["dirs"]:
+        cache["scenes"] = scenes
+        cache["dirs"] = dirs
+        saveAuditCache(shaderDirDefaultPath, cache, warnings)
+    return results
+
+
+def auditTextures(shaderDirs, warnings, timeout=None, workers=None):
+    """Audits the newest version of every shader of the given shader directories and keeps the result in textureAudit.
+    Returns the shaders with missing textures and their missing references.
+    """
+    pathLists = scanShaderDirectories(shaderDirs, warnings, timeout, workers)
+    broken = {}
+    for shaderDirDefaultPath, pLists in pathLists.items():
+        results = auditShaderDirectory(shaderDirDefaultPath, [shaderVersions[-1] for shaderVersions in pLists[0]], warnings, workers)
+        textureAudit.update(results)
+        broken.update((shaderPath, missing) for shaderPath, missing in results.items() if missing != [])
+    return broken
+
+
+def formatAuditReport(broken):
+    lines = []
+    for shaderPath in sorted(broken):
+        lines.append(shaderPath)
+        for node, attribute, path in broken[shaderPath]:
+            lines.append("    %s%s: %s" % (node or "", attribute or "", path))
+    lines.append("%s shaders with %s missing textures" % (len(broken), sum(len(missing) for missing in broken.values())))
+    return "\n".join(lines)
+
+
+""" Duplicate detection fingerprints the newest version of every shader. The node network of a .ma file is hashed without the node names:
+every node gets a label from its type and attribute values, which is then mixed with the labels of the nodes it's connected to and the plugs
+of the connections. Texture paths are replaced by the sha1 of the texture, so copies of a shader that use copies of its textures are still found,
+and the header lines with tags and comments are comments that the parser skips. Scenes with the same labels are exact duplicates.
+Near duplicates share most node labels and connections. They are found with MinHash signatures split into bands, only scenes that share a band are compared,
+so the time grows with the size of the library instead of with its square. The fingerprints and texture hashes are cached in a "fingerprints.json"
+file in the ".ISML" folder of every shader directory, with the mtime and size of the scene and of the files it uses.
+"""
+
+fingerprintCacheFileName = "fingerprints.json"
+fingerprintCacheVersion = 1
+fingerprintRounds = 2  # Times the label of a node is mixed with the labels of its neighbours
+fingerprintIgnoredTypes = set(("lightLinker", "shapeEditorManager", "poseInterpolatorManager", "displayLayerManager", "displayLayer",  # Every scene has these
+                               "renderLayerManager", "renderLayer", "script", "nodeGraphEditorInfo", "sequenceManager", "hyperGraphInfo", "hyperView", "hyperLayout"))
+minHashCount = 32  # Values of a MinHash signature
+minHashBands = 8  # Bands of minHashCount / minHashBands values. Scenes with an equal band are compared.
+nearDuplicateThreshold = 0.8  # Share of equal signature values above which two shaders are near duplicates
+minHashPrime = (1 << 61) - 1
+minHashParameters = [(int(hashlib.sha1(("a%s" % i).encode("ascii")).hexdigest()[:15], 16) | 1, int(hashlib.sha1(("b%s" % i).encode("ascii")).hexdigest()[:15], 16))
+                     for i in range(minHashCount)]
+
+
+def hashText(text):
+    if not isinstance(text, bytes):
+        text = text.encode("utf-8")
+    return hashlib.sha1(text).hexdigest()
+
+
+# Returns the node name and the attribute of a plug. Array indices are dropped, they depend on the order nodes were connected in.
+def splitPlug(plug):
+    node, attribute = plug.split(".", 1) if "." in plug else (plug, "")
+    return node.split("|")[-1], re.sub(r"\[\d+\]", "[]", "." + attribute)
+
+
+def fingerprintGraph(graph, textureKeys):
+    """Returns the exact fingerprint and the MinHash signature of a graph parsed with attributes. The signature is made of the labels
+    of the nodes without their neighbours and of the connections, so adding a node to a network only changes a few of them.
+    textureKeys maps (node, attribute) of file references to a key that stands for the content of the files.
+    """
+    labels = {}
+    for name, node in graph["nodes"].items():
+        if node["type"] in fingerprintIgnoredTypes:
+            continue
+        items = []
+        for attribute, values in node.get("attributes", ()):
+            if attribute != ".cfnp":  # Maya computes it from ".ftn"
+                items.append("%s=%s" % (attribute, textureKeys.get((name, attribute)) or " ".join(values)))
+        labels[name] = hashText("%s|%s" % (node["type"], "|".join(sorted(items))))
+    features = set(labels.values())
+    
+    edges = dict((name, []) for name in labels)
+    for source, destination in graph["connections"]:
+        sourceNode, sourceAttribute = splitPlug(source)
+        destinationNode, destinationAttribute = splitPlug(destination)
+        for name in (sourceNode, destinationNode):
+            if name not in labels and graph["nodes"].get(name, {}).get("type") not in fingerprintIgnoredTypes:
+                labels[name] = hashText("default|%s" % name.lstrip(":"))  # Nodes every scene has, like defaultShaderList1
+                edges[name] = []
+        if sourceNode in edges and destinationNode in edges:
+            edges[sourceNode].append((">%s%s" % (sourceAttribute, destinationAttribute), destinationNode))
+            edges[destinationNode].append(("<%s%s" % (destinationAttribute, sourceAttribute), sourceNode))
+            features.add(hashText("%s%s%s%s" % (labels[sourceNode], sourceAttribute, destinationAttribute, labels[destinationNode])))
+    
+    for i in range(fingerprintRounds):
+        labels = dict((name, hashText(label + "".join(sorted(plugs + labels[neighbour] for plugs, neighbour in edges[name])))) for name, label in labels.items())
+    return hashText("\n".join(sorted(labels.values()))), computeMinHash(features)
+
+
+def computeMinHash(features):
+    values = [int(feature[:15], 16) for feature in features]
+    if values == []:
+        return None
+    return [min((a * value + b) % minHashPrime for value in values) for a, b in minHashParameters]
+
+
+def getMinHashSimilarity(signature, otherSignature):
+    return sum(1 for value, otherValue in zip(signature, otherSignature) if value == otherValue) / float(minHashCount)
+
+
+def loadFingerprintCache(shaderDirDefaultPath):
+    try:
+        with open(os.path.join(shaderDirDefaultPath, libraryDataDirName, fingerprintCacheFileName), "r") as cacheFile:
+            cache = json.load(cacheFile)
+        if cache.get("version") == fingerprintCacheVersion:
+            return cache
+    except (IOError, OSError, ValueError):
+        pass
+    return {"version": fingerprintCacheVersion, "scenes": {}, "textures": {}}
+
+
+def saveFingerprintCache(shaderDirDefaultPath, cache, warnings):
+    cachePath = os.path.join(shaderDirDefaultPath, libraryDataDirName, fingerprintCacheFileName)
+    try:
+        if not os.path.isdir(os.path.dirname(cachePath)):
+            os.mkdir(os.path.dirname(cachePath))
+        with lockedFile(cachePath, 0):
+            writeFileAtomic(cachePath, json.dumps(cache, separators=(",", ":")))
+    except (IOError, OSError) as ex:
+        warnings.append("Fingerprints of %s could not be saved! :%s" % (shaderDirDefaultPath, ex))
+
+
+def fingerprintShaderDirectory(shaderDirDefaultPath, shaderPaths, warnings, workers=None):
+    """Returns {shader path: [mtime, size, fingerprint, signature, files]} for the scenes in shaderPaths, which are all in one shader directory,
+    and {texture path: [mtime, size, sha1]} for the textures they use. "files" are the [path, mtime, size] of the textures and tile folders
+    the fingerprint depends on. A cached fingerprint is used while none of them changed. .mb files only get the hash of the file as fingerprint.
+    """
+    if workers is None:
+        workers = scanWorkers
+    cache = loadFingerprintCache(shaderDirDefaultPath)
+    textures = cache["textures"]
+    
+    def hashTexture(path):
+        fileVersion = getFileVersion(path)
+        cached = textures.get(path)
+        if cached is not None and fileVersion is not None and tuple(cached[:2]) == fileVersion:
+            return cached[2]
+        sha = hashFile(path)
+        textures[path] = [fileVersion[0], fileVersion[1], sha]
+        return sha
+    
+    def readScene(shaderPath):
+        relPath = os.path.relpath(shaderPath, shaderDirDefaultPath).replace("\\", "/")
+        fileVersion = getFileVersion(shaderPath)
+        cached = cache["scenes"].get(relPath)
+        if cached is not None and fileVersion is not None and tuple(cached[:2]) == fileVersion:
+            if all((getFileVersion(path) or (None, None)) == (mtime, size) for path, mtime, size in cached[4]):
+                return relPath, cached
+        try:
+            if not shaderPath.endswith(".ma"):
+                return relPath, [fileVersion[0], fileVersion[1], "file:%s" % hashFile(shaderPath), None, []]
+            graph = parseMaFile(shaderPath, True)
+            textureKeys = {}
+            files = []
+            for reference in graph["references"]:
+                if reference["type"] == "reference":
+                    continue
+                paths = [reference["path"]] if reference["pattern"] is None else expandFileReference(reference)
+                if reference["pattern"] is not None:
+                    files.append([os.path.dirname(reference["pattern"])] + list(getFileVersion(os.path.dirname(reference["pattern"])) or (None, None)))
+                hashes = []
+                for path in paths:
+                    try:
+                        hashes.append(hashTexture(path))
+                        files.append([path] + textures[path][:2])
+                    except (IOError, OSError):
+                        hashes.append("missing:%s" % os.path.basename(path).lower())
+                        files.append([path, None, None])
+                textureKeys[(reference["node"], reference["attribute"])] = "file:%s" % hashText(" ".join(hashes)) if hashes != [] else "missing"
+            fingerprint, signature = fingerprintGraph(graph, textureKeys)
+        except (IOError, OSError, TypeError, UnicodeDecodeError) as ex:
+            warnings.append("%s cannot be fingerprinted! :%s" % (shaderPath, ex))
+            return relPath, None
+        return relPath, [fileVersion[0], fileVersion[1], fingerprint, signature, files]
+    
+    scenes = dict((relPath, scene) for relPath, scene in mapInThreads(readScene, shaderPaths, workers) if scene is not None)
+    usedTextures = dict((path, textures[path]) for scene in scenes.values() for path, mtime, size in scene[4] if path in textures)
+    if scenes != cache["scenes"] or usedTextures != cache["textures"]:
+        cache["scenes"] = scenes
+        cache["textures"] = usedTextures
+        saveFingerprintCache(shaderDirDefaultPath, cache, warnings)
+    return dict((os.path.join(shaderDirDefaultPath, *relPath.split("/")), scene) for relPath, scene in scenes.items()), usedTextures
+
+
+def getFolderSize(folder):
+    try:
+        return sum(fileStat.st_size for relPath, fileStat in walkSyncTree(folder)[0])
+    except OSError:
+        return 0
+
+
+def findDuplicates(shaderDirs, warnings, timeout=None, workers=None, threshold=None):
+    """Compares the newest versions of all shaders of the given shader directories. Returns {"exact": [[shader paths]],
+    "near": [[(shader path, similarity)]], "textures": [[texture paths]], "exactBytes", "textureBytes", "reclaimableBytes", "shaders"}.
+    The first shader of an exact group is the oldest one, which is kept. The others can be deleted with their shader folders, which is counted
+    in "exactBytes". Near duplicates are only listed. "textureBytes" counts every copy of a texture but one, except copies inside
+    the folders counted in "exactBytes" and hardlinks of the same file.
+    """
+    if threshold is None:
+        threshold = nearDuplicateThreshold
+    pathLists = scanShaderDirectories(shaderDirs, warnings, timeout, workers)
+    scenes = {}
+    textures = {}
+    for shaderDirDefaultPath, pLists in pathLists.items():
+        dirScenes, dirTextures = fingerprintShaderDirectory(shaderDirDefaultPath, [shaderVersions[-1] for shaderVersions in pLists[0]], warnings, workers)
+        scenes.update(dirScenes)
+        textures.update(dirTextures)
+    
+    byFingerprint = {}
+    for shaderPath in sorted(scenes, key=lambda shaderPath: (scenes[shaderPath][0], shaderPath)):
+        byFingerprint.setdefault(scenes[shaderPath][2], []).append(shaderPath)
+    exactGroups = sorted(group for group in byFingerprint.values() if len(group) > 1)
+    removedFolders = [os.path.dirname(shaderPath) for group in exactGroups for shaderPath in group[1 :]]
+    exactBytes = sum(getFolderSize(folder) for folder in removedFolders)
+    
+    # Every exact group is one shader for the near duplicates. Shaders sharing a band are joined with the first shader of the band.
+    parents = {}
+    
+    def findRoot(shaderPath):
+        while parents.get(shaderPath, shaderPath) != shaderPath:
+            shaderPath = parents[shaderPath]
+        return shaderPath
+    
+    buckets = {}
+    rows = minHashCount // minHashBands
+    for group in byFingerprint.values():
+        signature = scenes[group[0]][3]
+        if signature is not None:
+            for band in range(minHashBands):
+                buckets.setdefault((band, tuple(signature[band * rows : (band + 1) * rows])), []).append(group[0])
+    for bucket in buckets.values():
+        for shaderPath in bucket[1 :]:
+            if findRoot(shaderPath) != findRoot(bucket[0]) and getMinHashSimilarity(scenes[bucket[0]][3], scenes[shaderPath][3]) >= threshold:
+                parents[findRoot(shaderPath)] = findRoot(bucket[0])
+    nearGroups = {}
+    for shaderPath in parents:
+        nearGroups.setdefault(findRoot(shaderPath), set([findRoot(shaderPath)])).add(shaderPath)
+    nearGroups = sorted([(shaderPath, getMinHashSimilarity(scenes[group[0]][3], scenes[shaderPath][3])) for shaderPath in group]
+                        for group in [sorted(group, key=lambda shaderPath: (scenes[shaderPath][0], shaderPath)) for group in nearGroups.values()])
+    
+    byHash = {}
+    for path, texture in textures.items():
+        byHash.setdefault(texture[2], []).append(path)
+    textureGroups = []
+    textureBytes = 0
+    removedPrefixes = tuple(os.path.join(folder, "").replace("\\", "/") for folder in removedFolders)
+    for paths in byHash.values():
+        if len(paths) < 2:
+            continue
+        textureGroups.append(sorted(paths))
+        copies = set()
+        for path in paths:
+            try:
+                fileStat = os.stat(path)
+            except OSError:
+                continue
+            if not path.replace("\\", "/").startswith(removedPrefixes):
+                copies.add((fileStat.st_dev, fileStat.st_ino) if fileStat.st_ino else path)
+        textureBytes += textures[paths[0]][1] * max(len(copies) - 1, 0)
+    
+    return {"exact": exactGroups, "near": nearGroups, "textures": sorted(textureGroups), "exactBytes": exactBytes, "textureBytes": textureBytes,
+            "reclaimableBytes": exactBytes + textureBytes, "shaders": len(scenes)}
+
+
+def formatDuplicateReport(report):
+    lines = []
+    for group in report["exact"]:
+        lines.append("Same shader:")
+        lines.extend("    %s%s" % (shaderPath, " (kept)" if i == 0 else "") for i, shaderPath in enumerate(group))
+    for group in report["near"]:
+        lines.append("Similar shaders:")
+        lines.extend("    %s %d%%" % (shaderPath, similarity * 100) for shaderPath, similarity in group)
+    for group in report["textures"]:
+        lines.append("Same texture:")
+        lines.extend("    %s" % path for path in group)
+    lines.append("%s shaders: %s duplicate groups, %s similar groups, %s duplicate textures" % (report["shaders"], len(report["exact"]), len(report["near"]), len(report["textures"])))
+    lines.append("Reclaimable: %s (shader folders %s, textures %s)" % (formatBytes(report["reclaimableBytes"]), formatBytes(report["exactBytes"]), formatBytes(report["textureBytes"])))
+    return "\n".join(lines)
+
+
+""" Background tasks run blocking file work, like scans, metadata writes, texture copies and deletes, on a worker thread, so a slow share
+doesn't freeze Maya. Everything a task hands back, its result, its error and its progress, goes through "dispatch", which has to run it on the main thread.
+In Maya that is maya.utils.executeDeferred. Without Maya any function that runs the calls later will do, e.g. one that collects them in a list.
+Tasks are dicts: {"id", "name", "state", "progress", "result", "error"}. The state is "queued", "running", "done", "failed" or "cancelled".
+Tasks run in the order they were submitted, so a tag written after an export is only written once the scene is there.
+A queued task that is cancelled doesn't start. A running one is told to stop the next time it reports progress, and its onDone still gets what it returned.
+"""
+
+taskWorkers = 1  # More than one lets tasks overtake each other
+taskProgressInterval = 0.2  # Seconds between progress updates of a task on the main thread
+
+
+def startTaskExecutor(dispatch, listener=None, workers=None):
+    """Starts the worker threads and returns the executor. listener(task) is dispatched every time a task changes its state or progress."""
+    executor = {"dispatch": dispatch, "listener": listener, "queue": Queue(), "tasks": [], "threads": [], "lock": threading.Lock(), "nextId": 1}
+    for i in range(workers or taskWorkers):
+        thread = threading.Thread(target=taskWorker, args=(executor,), name="ISMLTaskWorker%s" % i)
+        thread.daemon = True
+        thread.start()
+        executor["threads"].append(thread)
+    return executor
+
+
+def submitTask(executor, name, func, onDone=None, onError=None, withProgress=False):
+    """Queues func() and returns its task. With "withProgress" it's called as func(progress=progress) with a progress callback of ISMLcore,
+    which returns False once the task is cancelled. onDone(result) and onError(exception) are dispatched to the main thread.
+    """
+    with executor["lock"]:
+        task = {"id": executor["nextId"], "name": name, "state": "queued", "progress": None, "result": None, "error": None,
+                "func": func, "onDone": onDone, "onError": onError, "withProgress": withProgress, "cancel": threading.Event(), "notified": 0}
+        executor["nextId"] += 1
+        executor["tasks"].append(task)
+    notifyTask(executor, task)
+    executor["queue"].put(task)
+    return task
+
+
+def notifyTask(executor, task, callback=None, *args):
+    if callback is not None:
+        executor["dispatch"](partial(callback, *args))
+    if executor["listener"] is not None:
+        executor["dispatch"](partial(executor["listener"], task))
+
+
+# A queued task is cancelled right away. The state is changed under the lock, so a worker can't start it in between.
+def cancelTask(executor, task):
+    with executor["lock"]:
+        task["cancel"].set()
+        wasQueued = task["state"] == "queued"
+        if wasQueued:
+            task["state"] = "cancelled"
+            executor["tasks"].remove(task)
+    if wasQueued:
+        notifyTask(executor, task)
+
+
+def getActiveTasks(executor):
+    with executor["lock"]:
+        return [task for task in executor["tasks"] if task["state"] in ("queued", "running")]
+
+
+# Cancels all tasks and lets the worker threads end once the running task stopped.
+def stopTaskExecutor(executor):
+    for task in getActiveTasks(executor):
+        cancelTask(executor, task)
+    for thread in executor["threads"]:
+        executor["queue"].put(None)
+
+
+def finishTask(executor, task, state):
+    with executor["lock"]:
+        task["state"] = state
+        executor["tasks"].remove(task)
+
+
+def taskWorker(executor):
+    while True:
+        task = executor["queue"].get()
+        if task is None:
+            return
+        with executor["lock"]:
+            cancelled = task["state"] == "cancelled"  # While it was queued
+            if not cancelled:
+                task["state"] = "running"
+        if cancelled:
+            continue
+        notifyTask(executor, task)
+        
+        def progress(doneFiles, totalFiles, doneBytes, totalBytes):
+            task["progress"] = (doneFiles, totalFiles, doneBytes, totalBytes)
+            if time.time() - task["notified"] >= taskProgressInterval:
+                task["notified"] = time.time()
+                notifyTask(executor, task)
+            return not task["cancel"].is_set()
+        
+        try:
+            result = task["func"](progress=progress) if task["withProgress"] else task["func"]()
+        except Exception as ex:
+            task["error"] = ex
+            finishTask(executor, task, "failed")
+            if task["onError"] is None:
+                log.error("%s failed! :%s" % (task["name"], ex))
+            notifyTask(executor, task, task["onError"], ex)
+            continue
+        task["result"] = result
+        finishTask(executor, task, "cancelled" if task["cancel"].is_set() else "done")
+        notifyTask(executor, task, task["onDone"], result)
+
+
+# Read Tags
+def getShaderMetadata(shaderPath, validate=False):
+    """Returns the tag and comment of a shader file. Both are parsed once and then cached together with the mtime and size of the file they are read from.
+    Without "validate" a cached value is returned without touching the disk. With it, the file is checked with a single stat call
+    and only parsed again if it changed.
+    """
+    cached = metadataCache.get(shaderPath)
+    if cached is not None and not validate:
+        return cached[2], cached[3]
+    try:
+        fileStat = os.stat(getMetadataPath(shaderPath))
+    except OSError:
+        try:
+            fileStat = os.stat(shaderPath)  # Tag and comment are still in the header
+        except OSError:
+            return "", ""
+    if cached is not None and cached[0] == fileStat.st_mtime and cached[1] == fileStat.st_size:
+        return cached[2], cached[3]
+    
+    tag, comment = readShaderMetadata(shaderPath)
+    metadataCache[shaderPath] = (fileStat.st_mtime, fileStat.st_size, tag, comment)
+    return tag, comment
+
+
+# Forget the cached tag and comment after the file was written.
+def invalidateShaderMetadata(shaderPath):
+    metadataCache.pop(shaderPath, None)
+
+
+""" The search index finds shaders by name, tag, project and comment. Every term of a search is looked up in the index and
+only shaders matching all terms are returned. Terms with three or more characters are matched anywhere in the text by
+intersecting the shaders containing each of the term's trigrams. Shorter terms match the beginning of words.
+The index is a plain dictionary and doesn't use Maya, so it can be used and tested outside of it.
+"""
+
+def newSearchIndex():
+    return {"docs": {}, "trigrams": {}, "tokens": {}, "sortedTokens": None}  # The sorted tokens are rebuilt on the next search after a change
+
+
+def getSearchTokens(text):
+    return set(re.findall(r"[^\W_]+", text, re.UNICODE))
+
+
+def getTrigrams(text):
+    return set(text[i:i+3] for i in range(len(text)-2))
+
+
+def addToSearchIndex(index, docId, name="", tag="", project="", comment=""):
+    removeFromSearchIndex(index, docId)
+    fields = {"name": name, "tag": tag, "project": project, "comment": comment}
+    text = "\n".join((name, tag, project, comment)).lower()
+    tokens = getSearchTokens(text)
+    trigrams = getTrigrams(text)
+    
+    index["docs"][docId] = (fields, text, tokens, trigrams)
+    for trigram in trigrams:
+        index["trigrams"].setdefault(trigram, set()).add(docId)
+    for token in tokens:
+        if token not in index["tokens"]:
+            index["tokens"][token] = set()
+            index["sortedTokens"] = None
+        index["tokens"][token].add(docId)
+
+
+def removeFromSearchIndex(index, docId):
+    doc = index["docs"].pop(docId, None)
+    if doc is None:
+        return
+    for trigram in doc[3]:
+        index["trigrams"][trigram].discard(docId)
+        if not index["trigrams"][trigram]:
+            del index["trigrams"][trigram]
+    for token in doc[2]:
+        index["tokens"][token].discard(docId)
+        if not index["tokens"][token]:
+            del index["tokens"][token]
+            index["sortedTokens"] = None
+
+
+# Returns the fields a document was indexed with or None.
+def getSearchIndexFields(index, docId):
+    doc = index["docs"].get(docId)
+    if doc is None:
+        return None
+    return doc[0]
+
+
+def matchSearchTerm(index, term):
+    if len(term) >= 3:
+        postings = []
+        for trigram in getTrigrams(term):
+            if trigram not in index["trigrams"]:
+                return set()
+            postings.append(index["trigrams"][trigram])
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        return set(docId for docId in candidates if term in index["docs"][docId][1])
+    
+    matches = set()
+    if index["sortedTokens"] is None:
+        index["sortedTokens"] = sorted(index["tokens"])
+    sortedTokens = index["sortedTokens"]
+    i = bisect_left(sortedTokens, term)
+    while i < len(sortedTokens) and sortedTokens[i].startswith(term):
+        matches.update(index["tokens"][sortedTokens[i]])
+        i += 1
+    return matches
+
+
+# Returns the ids of all documents matching every whitespace separated term of the search string.
+def searchIndex(index, searchStr):
+    terms = searchStr.lower().split()
+    if terms == []:
+        return set(index["docs"])
+    
+    result = None
+    for term in sorted(terms, key=len, reverse=True):  # Long terms are the most selective
+        matches = matchSearchTerm(index, term)
+        result = matches if result is None else result & matches
+        if not result:
+            break
+    return result
+
+
+""" Icons are rendered by a render queue of json job files in "renderQueueDir". Worker processes claim jobs by renaming them and
+render "<name>_icon.png" into the shader folder. Jobs that fail are kept with a ".failed" extension and the error inside,
+until the failure was reported or the shader is queued again.
+The renderer of a job is looked up in "renderBackends". ISML adds the V-Ray renderer, the "stub" backend writes a placeholder without Maya.
+"""
+
+renderQueueDir = os.path.join(os.path.dirname(docDirLok), "ISMLrenderQueue")
+
+
+# The icon path of a shader, next to the shader file.
+def getIconRenderPath(shaderPath):
+    return os.path.join(os.path.dirname(shaderPath), "%s_icon.png" % os.path.splitext(os.path.basename(shaderPath))[0])
+
+
+# Writes a grey 1x1 png instead of rendering. Doesn't need Maya.
+def renderIconStub(shaderPath, iconPath, templateScene):
+    def pngChunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+    
+    png = b"\x89PNG\r\n\x1a\n" + pngChunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0)) + pngChunk(b"IDAT", zlib.compress(b"\x00\x80")) + pngChunk(b"IEND", b"")
+    with open(iconPath, "wb") as iconFile:
+        iconFile.write(png)
+
+
+renderBackends = {"stub": renderIconStub}  # Name -> function(shaderPath, iconPath, templateScene)
+
+
+# Writes a render job for every shader. A shader that is already queued isn't queued twice.
+def queueIconRenders(shaderPaths, backend, templateScene, queueDir=None):
+    queueDir = queueDir or renderQueueDir
+    if not os.path.isdir(queueDir):
+        os.makedirs(queueDir)
+    
+    for shaderPath in shaderPaths:
+        key = os.path.normcase(shaderPath)
+        if not isinstance(key, bytes):
+            key = key.encode("utf-8")
+        jobName = hashlib.sha1(key).hexdigest() + ".json"
+        job = {"shader": shaderPath, "icon": getIconRenderPath(shaderPath), "backend": backend, "template": templateScene}
+        tempPath = os.path.join(queueDir, jobName + ".tmp")
+        with open(tempPath, "w") as jobFile:
+            json.dump(job, jobFile)
+        replaceFile(tempPath, os.path.join(queueDir, jobName))
+        try:
+            os.remove(os.path.join(queueDir, jobName + ".failed"))  # Tried again
+        except OSError:
+            pass
+    return len(shaderPaths)
+
+
+# Claims the next job by renaming it. Only one worker can succeed in renaming a job. Returns the path of the claimed job or None.
+def claimRenderJob(queueDir):
+    for name in sorted(os.listdir(queueDir)):
+        if not name.endswith(".json"):
+            continue
+        claimedPath = os.path.join(queueDir, "%s.%s.running" % (name, os.getpid()))
+        try:
+            os.rename(os.path.join(queueDir, name), claimedPath)
+        except OSError:
+            continue
+        return claimedPath
+    return None
+
+
+# Puts back the jobs of workers that didn't finish them.
+def recoverRenderJobs(queueDir):
+    for name in os.listdir(queueDir):
+        if name.endswith(".running"):
+            try:
+                os.rename(os.path.join(queueDir, name), os.path.join(queueDir, name[: name.index(".json")+5]))
+            except OSError:
+                pass
+
+
+# Renders jobs until the queue is empty. Returns the number of rendered and failed icons.
+def runRenderWorker(queueDir):
+    rendered = 0
+    failed = 0
+    while True:
+        jobPath = claimRenderJob(queueDir)
+        if jobPath is None:
+            return rendered, failed
+        job = {}
+        try:
+            with open(jobPath, "r") as jobFile:
+                job = json.load(jobFile)
+            renderBackends[job["backend"]](job["shader"], job["icon"], job["template"])
+            touchShaderDir(os.path.dirname(job["icon"]))  # A new render overwrites the old icon
+            os.remove(jobPath)
+            rendered += 1
+        except Exception as ex:
+            failedPath = jobPath[: jobPath.index(".json")+5] + ".failed"
+            try:
+                with open(failedPath, "w") as failedFile:
+                    json.dump({"job": jobPath, "shader": job.get("shader"), "error": str(ex)}, failedFile)
+                os.remove(jobPath)
+            except (IOError, OSError):
+                pass
+            failed += 1
+
+
+# Returns [(shader path, error)] of the failed jobs and removes their ".failed" files. Called once the failures are reported.
+def collectFailedRenders(queueDir):
+    failures = []
+    try:
+        names = sorted(os.listdir(queueDir))
+    except OSError:
+        return failures
+    for name in names:
+        if not name.endswith(".failed"):
+            continue
+        failedPath = os.path.join(queueDir, name)
+        try:
+            with open(failedPath, "r") as failedFile:
+                failure = json.load(failedFile)
+        except (IOError, OSError, ValueError):
+            failure = {}
+        failures.append((failure.get("shader") or name, failure.get("error", "")))
+        try:
+            os.remove(failedPath)
+        except OSError:
+            pass
+    return failures
+
+
+""" Benchmarks of the scanner. They build a shader directory in a temporary folder and count the file system calls of each scan.
+"latency" adds a delay to every counted call, which simulates a shader directory on a network drive. The first stat() of a scandir entry
+is counted as a stat call too. On Windows it comes with the listing, so there the counts are an upper bound.
+"""
+
+# Entry of scandir whose stat() is counted by countFileSystemCalls. Like os.DirEntry, it only stats once.
+class CountedDirEntry(object):
+    def __init__(self, entry, statFunc):
+        self.name = entry.name
+        self.path = entry.path
+        self._entry = entry
+        self._statFunc = statFunc
+        self._stat = None
+    
+    def stat(self):
+        if self._stat is None:
+            self._stat = self._statFunc()
+        return self._stat
+    
+    def is_dir(self):
+        return self._entry.is_dir()
+    
+    def is_file(self):
+        return self._entry.is_file()
+
+
+# Creates "folders" shader folders with "versions" scene files, an icon and a metadata file each.
+def createBenchmarkLibrary(shaderDirDefaultPath, folders, versions):
+    for i in range(folders):
+        mtlDir = os.path.join(shaderDirDefaultPath, "shader%06d" % i)
+        os.makedirs(mtlDir)
+        for version in range(1, versions+1):
+            with open(os.path.join(mtlDir, "shader%06d_%04d.ma" % (i, version)), "w") as mf:
+                mf.write("//Maya ASCII 2020 scene\n")
+        with open(os.path.join(mtlDir, "shader%06d_icon.png" % i), "wb") as iconFile:
+            iconFile.write(b"\x89PNG\r\n\x1a\n")
+        writeShaderMetadataFile(os.path.join(mtlDir, "shader%06d_0001.ma" % i), "Undefined", "")
+
+
+# The scan of older versions of the library: every folder is listed and every entry is stat'ed.
+def listdirScan(shaderDirDefaultPath):
+    mtlPathList = []
+    mtlIconPathList = []
+    for dirName in sorted(os.listdir(shaderDirDefaultPath)):
+        mtlDir = os.path.join(shaderDirDefaultPath, dirName)
+        if dirName == libraryDataDirName or not os.path.isdir(mtlDir):
+            continue
+        mtlFiles = [name for name in sorted(os.listdir(mtlDir)) if os.path.isfile(os.path.join(mtlDir, name))]
+        shaderVersions = [os.path.join(mtlDir, name) for name in mtlFiles if os.path.splitext(name)[1] in (".ma", ".mb")]
+        if shaderVersions != []:
+            mtlPathList.append(shaderVersions)
+            icons = [os.path.join(mtlDir, name) for name in mtlFiles if name.endswith(".png")]
+            mtlIconPathList.append(icons[-1] if icons != [] else "blinn.svg")
+    return [mtlPathList, mtlIconPathList]
+
+
+# Runs func and returns the seconds it took and the number of listings and stat calls.
+def countFileSystemCalls(func, latency):
+    counts = {"list": 0, "stat": 0}
+    lock = threading.Lock()
+    osStat = os.stat
+    osListdir = os.listdir
+    coreScandir = globals()["scandir"]
+    
+    def counted(kind, call):
+        def wrapper(*args, **kwargs):
+            with lock:
+                counts[kind] += 1
+            if latency > 0:
+                time.sleep(latency)
+            return call(*args, **kwargs)
+        return wrapper
+    
+    def countedScandir(dirPath):
+        return [CountedDirEntry(entry, counted("stat", entry.stat)) for entry in counted("list", coreScandir)(dirPath)]
+    
+    os.stat = counted("stat", osStat)
+    os.listdir = counted("list", osListdir)
+    if coreScandir is not None:
+        globals()["scandir"] = countedScandir
+    try:
+        start = time.time()
+        func()
+        seconds = time.time() - start
+    finally:
+        os.stat = osStat
+        os.listdir = osListdir
+        globals()["scandir"] = coreScandir
+    return seconds, counts["list"], counts["stat"]
+
+
+# Returns [(name, seconds, listings, stat calls)] for the old scan and for cold, warm and partly changed scans of a generated library.
+def benchmarkScan(folders, versions=3, latency=0.0, workers=None):
+    if workers is None:
+        workers = scanWorkers
+    tempDir = tempfile.mkdtemp(prefix="ISMLbenchmark")
+    try:
+        createBenchmarkLibrary(tempDir, folders, versions)
+        warnings = []
+        
+        def coldScan(scanWorkerCount):
+            catalogCache.clear()
+            rmtree(os.path.join(tempDir, libraryDataDirName), ignore_errors=True)
+            scanShaderDirectory(tempDir, warnings, scanWorkerCount)
+        
+        def changeFolders():
+            for i in range(0, folders, 100):  # 1% of the folders got a new version
+                with open(os.path.join(tempDir, "shader%06d" % i, "shader%06d_%04d.ma" % (i, versions+1)), "w") as mf:
+                    mf.write("//Maya ASCII 2020 scene\n")
+        
+        results = []
+        results.append(("listdir scan",) + countFileSystemCalls(lambda: listdirScan(tempDir), latency))
+        results.append(("cold scan, 1 thread",) + countFileSystemCalls(lambda: coldScan(1), latency))
+        results.append(("cold scan, %s threads" % workers,) + countFileSystemCalls(lambda: coldScan(workers), latency))
+        results.append(("unchanged scan",) + countFileSystemCalls(lambda: scanShaderDirectory(tempDir, warnings, workers), latency))
+        changeFolders()
+        results.append(("1% changed scan",) + countFileSystemCalls(lambda: scanShaderDirectory(tempDir, warnings, workers), latency))
+        return results
+    finally:
+        rmtree(tempDir, ignore_errors=True)
+        catalogCache.pop(tempDir, None)
+        metadataCache.clear()
+        iconMtimes.clear()
+
+
+""" Command line interface, for batch processes and servers without Maya:
+python ISMLcore.py scan [shader directories]
+python ISMLcore.py index [shader directories] --search "metal rough"
+python ISMLcore.py relink [shader directories] [--report]
+python ISMLcore.py pack [shader directories] [--prune]
+python ISMLcore.py deps [shader directories] [--processes 8] [--json]
+python ISMLcore.py audit [shader directories]
+python ISMLcore.py sync [project folder] [destination] [--compare size|mtime|hash] [--mirror]
+python ISMLcore.py export-archive [shader directory] [archive.zip] [--shaders name,name]
+python ISMLcore.py copy-archive [archive.zip] [destination.zip]
+python ISMLcore.py import-archive [archive.zip] [shader directory]
+python ISMLcore.py render-worker [--queue folder]
+python ISMLcore.py profile [--log ISMLprofile.jsonl]
+python ISMLcore.py benchmark --folders 1000,10000 --latency 0.002
+Without shader directories, the ones in the config files are used.
+"""
+
+# Returns [(path, project name)] of the given shader directories, or of the ones in the config files.
+def getCommandLineDirectories(paths):
+    if paths:
+        return [(os.path.abspath(path), os.path.basename(os.path.abspath(path))) for path in paths]
+    dirSets = []
+    for configPath in (docDirShared, docDirLok):
+        dirs, warning = loadConfigFile(configPath)
+        if warning is not None:
+            log.warning(warning)
+        dirSets.append(dirs)
+    return [(dir[0], dir[1]) for dir in mergeDirectoryLists(dirSets[0], dirSets[1])]
+
+
+def scanCommand(args):
+    warnings = []
+    start = time.time()
+    pathLists = scanShaderDirectories([dir[0] for dir in args.directories], warnings, args.timeout, args.workers)
+    for warning in warnings:
+        log.warning(warning)
+    for shaderDirDefaultPath, name in args.directories:
+        if shaderDirDefaultPath in pathLists:
+            print("%s: %s shaders (%s)" % (name, len(pathLists[shaderDirDefaultPath][0]), shaderDirDefaultPath))
+    print("Scanned in %.2f s" % (time.time() - start))
+    return 1 if warnings != [] else 0
+
+
+def indexCommand(args):
+    warnings = []
+    pathLists = scanShaderDirectories([dir[0] for dir in args.directories], warnings, args.timeout, args.workers)
+    for warning in warnings:
+        log.warning(warning)
+    
+    index = newSearchIndex()
+    for shaderDirDefaultPath, name in args.directories:
+        for shaderVersions in pathLists.get(shaderDirDefaultPath, [[]])[0]:
+            tag, comment = getShaderMetadata(shaderVersions[-1])
+            shaderName = os.path.splitext(os.path.basename(shaderVersions[-1]))[0]
+            addToSearchIndex(index, shaderVersions[-1], name=shaderName, tag=tag, project=name, comment=comment)
+    
+    if args.search is None:
+        print("Indexed %s shaders" % len(index["docs"]))
+        return 0
+    matches = searchIndex(index, args.search)
+    for shaderPath in sorted(index["docs"] if matches is None else matches):
+        print(shaderPath)
+    return 0
+
+
+def relinkCommand(args):
+    warnings = []
+    pathLists = scanShaderDirectories([dir[0] for dir in args.directories], warnings, args.timeout, args.workers)
+    for warning in warnings:
+        log.warning(warning)
+    shaderPaths = sorted(set(shaderVersions[-1] for pLists in pathLists.values() for shaderVersions in pLists[0]))
+    
+    job = planRelinkJob(shaderPaths)
+    for shaderPath, ex in job["unreadable"]:
+        log.warning("%s cannot be read! :%s" % (shaderPath, ex))
+    if args.report:
+        print(formatRelinkReport(job))
+        return 0
+    stats = runRelinkJob(job, args.journal)
+    for src, ex in stats["failed"]:
+        log.warning("%s cannot be copied! :%s" % (src, ex))
+    print("Textures: %s copied (%s), %s linked (%s), %s already at the shader location (%s)" % (stats["copied"], formatBytes(stats["bytesCopied"]), stats["linked"], formatBytes(stats["bytesLinked"]), stats["skipped"], formatBytes(stats["bytesSkipped"])))
+    return 1 if stats["failed"] != [] else 0
+
+
+def packCommand(args):
+    warnings = []
+    packed, savedBytes = packOldVersions([dir[0] for dir in args.directories], warnings)
+    for warning in warnings:
+        log.warning(warning)
+    print("Packed %s versions, %s saved" % (packed, formatBytes(savedBytes)))
+    if args.prune:
+        for shaderDirDefaultPath, name in args.directories:
+            removed, removedBytes = pruneVersionStore(shaderDirDefaultPath)
+            print("%s: removed %s unused chunks (%s)" % (name, removed, formatBytes(removedBytes)))
+    return 1 if warnings != [] else 0
+
+
+def syncCommand(args):
+    job = planSync(args.source, args.destination, args.compare, args.mirror, args.journal, args.workers)
+    print("%s files to copy (%s), %s unchanged, %s to delete" % (job["files"], formatBytes(job["bytes"]), job["unchanged"], len(job["delete"]) + len(job["deleteDirs"])))
+    if args.report:
+        return 0
+    stats = runSync(job, args.journal, workers=args.workers)
+    for path, ex in stats["failed"]:
+        log.warning("%s cannot be synced! :%s" % (path, ex))
+    print(formatSyncStats(stats))
+    return 1 if stats["failed"] != [] else 0
+
+
+def dependenciesCommand(args):
+    warnings = []
+    pathLists = scanShaderDirectories([dir[0] for dir in args.directories], warnings, args.timeout, args.workers)
+    for warning in warnings:
+        log.warning(warning)
+    maFiles = sorted(set(shaderVersions[-1] for pLists in pathLists.values() for shaderVersions in pLists[0] if shaderVersions[-1].endswith(".ma")))
+    startTime = time.time()
+    report = buildDependencyReport(parseMaFiles(maFiles, args.processes))
+    if args.json:
+        print(json.dumps(report, indent=1, sort_keys=True))
+    else:
+        print(formatDependencyReport(report))
+        print("Parsed in %.2f s" % (time.time() - startTime))
+    return 1 if report["missing"] != [] or report["errors"] != [] else 0
+
+
+def auditCommand(args):
+    warnings = []
+    startTime = time.time()
+    broken = auditTextures([dir[0] for dir in args.directories], warnings, args.timeout, args.workers)
+    for warning in warnings:
+        log.warning(warning)
+    print(formatAuditReport(broken))
+    print("Audited %s shaders in %.2f s" % (len(textureAudit), time.time() - startTime))
+    return 1 if broken != {} else 0
+
+
+def duplicatesCommand(args):
+    warnings = []
+    startTime = time.time()
+    report = findDuplicates([dir[0] for dir in args.directories], warnings, args.timeout, args.workers, args.threshold)
+    for warning in warnings:
+        log.warning(warning)
+    if args.json:
+        print(json.dumps(report, indent=1, sort_keys=True))
+    else:
+        print(formatDuplicateReport(report))
+        print("Compared in %.2f s" % (time.time() - startTime))
+    return 0
+
+
+def exportArchiveCommand(args):
+    warnings = []
+    result = exportArchive(args.directory, args.archive, warnings, args.shaders.split(",") if args.shaders else None)
+    for warning in warnings:
+        log.warning(warning)
+    print("%s files (%s) exported to %s, %s" % (result[0], formatBytes(result[1]), args.archive, formatBytes(os.path.getsize(args.archive))))
+    return 0
+
+
+def importArchiveCommand(args):
+    warnings = []
+    extracted = importArchive(args.archive, args.directory, warnings, args.overwrite)
+    for warning in warnings:
+        log.warning(warning)
+    print("%s files extracted to %s" % (extracted, args.directory))
+    return 1 if warnings != [] else 0
+
+
+def copyArchiveCommand(args):
+    copyArchive(args.archive, args.destination)
+    print("%s copied and checked" % args.destination)
+    return 0
+
+
+def renderWorkerCommand(args):
+    rendered, failed = runRenderWorker(args.queue)
+    for shaderPath, error in collectFailedRenders(args.queue):
+        log.warning("Icon of %s couldn't be rendered! :%s" % (shaderPath, error))
+    print("Rendered %s icons, %s failed." % (rendered, failed))
+    return 1 if failed else 0
+
+
+def profileCommand(args):
+    records = readProfileLog(args.log)
+    print(formatProfileSummary(summarizeProfile(records)))
+    print("%s records in %s" % (len(records), args.log))
+    return 0
+
+
+def benchmarkCommand(args):
+    allResults = {}
+    for folders in [int(folders) for folders in args.folders.split(",")]:
+        results = benchmarkScan(folders, args.versions, args.latency, args.workers)
+        allResults[folders] = [{"scan": name, "seconds": seconds, "listings": listings, "stats": stats} for name, seconds, listings, stats in results]
+        if not args.json:
+            print("%s shader folders, %s versions each, %s ms latency" % (folders, args.versions, args.latency * 1000))
+            for name, seconds, listings, stats in results:
+                print("  %-22s %9.3f s %9s listings %9s stats" % (name, seconds, listings, stats))
+    if args.json:
+        print(json.dumps(allResults, indent=2, sort_keys=True))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="ISMLcore", description="Shader library tools that run without Maya.")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    for name, func, helpText in (("scan", scanCommand, "update the catalogs of shader directories"),
+                                 ("index", indexCommand, "index shaders and search them"),
+                                 ("relink", relinkCommand, "copy the textures of all shaders to their shader folders"),
+                                 ("pack", packCommand, "move all versions but the newest into the version store"),
+                                 ("deps", dependenciesCommand, "parse the newest version of all shaders and report the files they use"),
+                                 ("audit", auditCommand, "list the shaders whose textures are missing"),
+                                 ("duplicates", duplicatesCommand, "find shaders and textures that exist more than once")):
+        subparser = subparsers.add_parser(name, help=helpText)
+        subparser.add_argument("directories", nargs="*", help="shader directories, by default the ones in the config files")
+        subparser.add_argument("--workers", type=int, default=scanWorkers, help="threads per shader directory")
+        subparser.add_argument("--timeout", type=float, default=scanTimeout, help="seconds after which a shader directory is skipped")
+        subparser.set_defaults(func=func)
+        if name == "index":
+            subparser.add_argument("--search", help="print the shaders matching this search")
+        if name == "relink":
+            subparser.add_argument("--report", action="store_true", help="only print what would be copied")
+            subparser.add_argument("--journal", default=relinkJournalPath, help="journal file for resuming an interrupted job")
+        if name == "deps":
+            subparser.add_argument("--processes", type=int, default=parseProcesses, help="processes parsing scenes")
+            subparser.add_argument("--json", action="store_true", help="print the report as json")
+        if name == "duplicates":
+            subparser.add_argument("--threshold", type=float, default=nearDuplicateThreshold, help="similarity from 0 to 1 above which shaders are listed as similar")
+            subparser.add_argument("--json", action="store_true", help="print the report as json")
+        if name == "pack":
+            subparser.add_argument("--prune", action="store_true", help="remove chunks of deleted versions, only when nobody exports")
+    
+    subparser = subparsers.add_parser("sync", help="copy the files of a project folder that changed since the last sync")
+    subparser.add_argument("source", help="project folder")
+    subparser.add_argument("destination", help="copy of the project folder, made if it doesn't exist")
+    subparser.add_argument("--compare", choices=("size", "mtime", "hash"), default=syncCompare, help="how files are compared")
+    subparser.add_argument("--mirror", action="store_true", help="delete files that aren't in the project folder anymore")
+    subparser.add_argument("--report", action="store_true", help="only print what would be copied")
+    subparser.add_argument("--workers", type=int, default=copyWorkers, help="copying threads")
+    subparser.add_argument("--journal", default=syncJournalPath, help="journal file for resuming an interrupted sync")
+    subparser.set_defaults(func=syncCommand)
+    
+    subparser = subparsers.add_parser("export-archive", help="write shader folders into a zip archive")
+    subparser.add_argument("directory", help="shader directory")
+    subparser.add_argument("archive", help="zip file to write")
+    subparser.add_argument("--shaders", help="comma separated shader folders, by default all of them")
+    subparser.set_defaults(func=exportArchiveCommand)
+    
+    subparser = subparsers.add_parser("import-archive", help="extract a zip archive into a shader directory")
+    subparser.add_argument("archive", help="zip file written by export-archive")
+    subparser.add_argument("directory", help="shader directory")
+    subparser.add_argument("--overwrite", action="store_true", help="replace shader folders that already exist with other files")
+    subparser.set_defaults(func=importArchiveCommand)
+    
+    subparser = subparsers.add_parser("copy-archive", help="copy an archive, continuing an interrupted copy, and check it")
+    subparser.add_argument("archive", help="zip file written by export-archive")
+    subparser.add_argument("destination", help="path of the copy")
+    subparser.set_defaults(func=copyArchiveCommand)
+    
+    subparser = subparsers.add_parser("render-worker", help="render queued icons with the backends that don't need Maya")
+    subparser.add_argument("--queue", default=renderQueueDir, help="render queue folder")
+    subparser.set_defaults(func=renderWorkerCommand)
+    
+    subparser = subparsers.add_parser("profile", help="summarize the timings recorded by the library")
+    subparser.add_argument("--log", default=profileLogPath, help="profile log written while profiling was enabled")
+    subparser.set_defaults(func=profileCommand)
+    
+    subparser = subparsers.add_parser("benchmark", help="time scans of generated shader directories")
+    subparser.add_argument("--folders", default="1000", help="comma separated numbers of shader folders, e.g. 1000,10000,100000")
+    subparser.add_argument("--versions", type=int, default=3, help="scene files per shader folder")
+    subparser.add_argument("--latency", type=float, default=0.0, help="seconds added to every file system call")
+    subparser.add_argument("--workers", type=int, default=scanWorkers, help="threads of the threaded scans")
+    subparser.add_argument("--json", action="store_true", help="print the results as json")
+    subparser.set_defaults(func=benchmarkCommand)
+    
+    args = parser.parse_args(argv)
+    if getattr(args, "func", None) is None:
+        parser.print_help()
+        return 2
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+    if hasattr(args, "directories"):
+        args.directories = getCommandLineDirectories(args.directories)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
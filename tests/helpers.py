@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+try:
+    from unittest import mock
+except ImportError:
+    mock = None  # Python 2 without the mock package
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ISMLcore
+
+
+# A temporary folder that is removed after the test.
+def makeTempDir(testCase):
+    tempDir = tempfile.mkdtemp(prefix="ISMLtest")
+    testCase.addCleanup(shutil.rmtree, tempDir, True)
+    return tempDir
+
+
+def writeFile(path, text, mtime=None):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, "w") as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def readFile(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+# A shader folder with a first version and a metadata file.
+def createShader(shaderDir, name, tag="", comment=""):
+    shaderPath = os.path.join(shaderDir, name, "%s_0001.ma" % name)
+    writeFile(shaderPath, "//Maya ASCII 2020 scene\n")
+    ISMLcore.writeShaderMetadataFile(shaderPath, tag, comment)
+    return shaderPath
+
+
+# A shader scene with a file node for each texture path.
+def writeShaderScene(shaderPath, texturePaths):
+    lines = ["//Maya ASCII 2020 scene\n", 'requires maya "2020";\n']
+    for i, texturePath in enumerate(texturePaths):
+        lines.append('createNode file -n "file%s";\n' % (i+1))
+        lines.append('\tsetAttr ".ftn" -type "string" "%s";\n' % texturePath)
+    writeFile(shaderPath, "".join(lines))
+
+
+# Runs the calls dispatched to the main thread until every task submitted so far has finished.
+def runDispatched(executor, dispatched, timeout=10.0):
+    finished = []
+    ISMLcore.submitTask(executor, "Last task", lambda: None, onDone=finished.append)
+    deadline = time.time() + timeout
+    while finished == [] and time.time() < deadline:
+        if dispatched != []:
+            dispatched.pop(0)()
+        else:
+            time.sleep(0.01)
+    if finished == []:
+        raise AssertionError("The tasks didn't finish within %s seconds" % timeout)
+
+
+# Answers the queries of the layouts, like an open library window 330 pixels wide.
+def shelfLayout(*args, **kwargs):
+    if kwargs.get("w"):
+        return 330
+    if kwargs.get("h"):
+        return 260
+    if kwargs.get("bgc"):
+        return [0.17, 0.17, 0.17]
+    if kwargs.get("ca"):
+        return []
+    return True
+
+
+# Icon buttons know their name, like the PyNodes pymel returns.
+def iconTextButton(*args, **kwargs):
+    button = mock.MagicMock()
+    button.shortName.return_value = args[0] if args else ""
+    return button
+
+
+def openLibraryWindow(testCase, shaderDirs):
+    """Replaces pymel in ISML with a mock answering like an open library window and starts the task executor of the UI.
+    Returns the list the calls for the main thread are dispatched to. Everything is reset after the test.
+    """
+    import ISML
+    dispatched = []
+    ISML.pm = mock.MagicMock()
+    ISML.pm.shelfLayout.side_effect = shelfLayout
+    ISML.pm.iconTextButton.side_effect = iconTextButton
+    ISML.taskExecutor = ISMLcore.startTaskExecutor(dispatched.append)
+    ISML.globalDirectoryList = [[shaderDir, "Shader"] for shaderDir in shaderDirs]
+
+    def closeLibraryWindow():
+        ISMLcore.stopTaskExecutor(ISML.taskExecutor)
+        ISML.taskExecutor = None
+        ISML.pm = None
+        ISML.globalDirectoryList = []
+        ISML.layoutIcons.clear()
+        ISML.forgetIconSlots()
+        ISML.indexedShaderPaths.clear()
+        ISML.shaderSearchIndex.update(ISMLcore.newSearchIndex())
+        ISML.iconFilter = None
+        ISMLcore.catalogCache.clear()
+        ISMLcore.metadataCache.clear()
+    testCase.addCleanup(closeLibraryWindow)
+    return dispatched
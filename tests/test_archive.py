@@ -0,0 +1,75 @@
+import os
+import unittest
+
+from helpers import makeTempDir, writeFile, readFile
+import ISMLcore
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = makeTempDir(self)
+        self.shaderDir = os.path.join(self.tempDir, "projectA")
+        self.mtlDir = os.path.join(self.shaderDir, "metal")
+        self.texturePath = os.path.join(self.mtlDir, "textures", "rust.png").replace("\\", "/")
+        writeFile(self.texturePath, "rust")
+        self.versionTexts = []
+        for i in range(1, 3):
+            text = '//Maya ASCII 2020 scene\ncreateNode file -n "file1";\n\tsetAttr ".ftn" -type "string" "%s";\n// Version %s\n' % (self.texturePath, i)
+            writeFile(os.path.join(self.mtlDir, "metal_%04d.ma" % i), text)
+            self.versionTexts.append(text)
+        ISMLcore.packVersion(os.path.join(self.mtlDir, "metal_0001.ma"))
+        self.archivePath = os.path.join(self.tempDir, "projectA.zip")
+        self.importDir = os.path.join(self.tempDir, "projectB")
+
+    def tearDown(self):
+        ISMLcore.versionIndex.clear()
+        ISMLcore.catalogCache.clear()
+
+    def testExportAndImport(self):
+        warnings = []
+        self.assertEqual(ISMLcore.exportArchive(self.shaderDir, self.archivePath, warnings), (3, sum(len(text) for text in self.versionTexts) + 4))
+        self.assertEqual(warnings, [])
+        self.assertTrue(ISMLcore.verifyArchive(self.archivePath))
+
+        self.assertEqual(ISMLcore.importArchive(self.archivePath, self.importDir, warnings), 3)
+        self.assertEqual(warnings, [])
+        newTexturePath = os.path.join(self.importDir, "metal", "textures", "rust.png").replace("\\", "/")
+        for i, text in enumerate(self.versionTexts, 1):
+            self.assertEqual(readFile(os.path.join(self.importDir, "metal", "metal_%04d.ma" % i)), text.replace(self.texturePath, newTexturePath))
+        self.assertEqual(ISMLcore.importArchive(self.archivePath, self.importDir, warnings), 0)  # Everything is there already
+
+    def testChangedShaderFolderIsOnlyOverwrittenOnRequest(self):
+        ISMLcore.exportArchive(self.shaderDir, self.archivePath, [])
+        changedPath = os.path.join(self.importDir, "metal", "metal_0002.ma")
+        writeFile(changedPath, "//Maya ASCII 2020 scene\n// Changed here\n", 1000000000)
+        warnings = []
+        self.assertEqual(ISMLcore.importArchive(self.archivePath, self.importDir, warnings), 0)
+        self.assertEqual(len(warnings), 1)
+        self.assertEqual(readFile(changedPath), "//Maya ASCII 2020 scene\n// Changed here\n")
+        self.assertEqual(ISMLcore.importArchive(self.archivePath, self.importDir, [], overwrite=True), 3)
+        self.assertIn("// Version 2", readFile(changedPath))
+
+    def testInterruptedCopyIsContinued(self):
+        ISMLcore.exportArchive(self.shaderDir, self.archivePath, [])
+        copyPath = os.path.join(self.tempDir, "copy", "projectA.zip")
+        os.mkdir(os.path.dirname(copyPath))
+        with open(self.archivePath, "rb") as archiveFile:
+            data = archiveFile.read()
+        with open(copyPath + ".part", "wb") as partFile:
+            partFile.write(data[: len(data) // 2])
+        copied = []
+        self.assertTrue(ISMLcore.copyArchive(self.archivePath, copyPath, lambda doneFiles, totalFiles, doneBytes, totalBytes: copied.append(doneBytes)))
+        self.assertEqual(copied[0], len(data))  # The rest fits into one block
+        self.assertTrue(ISMLcore.verifyArchive(copyPath))
+
+    def testDamagedCopyIsRemoved(self):
+        ISMLcore.exportArchive(self.shaderDir, self.archivePath, [])
+        copyPath = os.path.join(self.tempDir, "projectA_copy.zip")
+        with open(copyPath + ".part", "wb") as partFile:
+            partFile.write(b"damaged")
+        self.assertRaises(IOError, ISMLcore.copyArchive, self.archivePath, copyPath)
+        self.assertFalse(os.path.exists(copyPath + ".part"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import unittest
+
+from helpers import makeTempDir, writeFile, writeShaderScene
+import ISMLcore
+
+
+class AuditTest(unittest.TestCase):
+    def setUp(self):
+        self.shaderDir = makeTempDir(self)
+        self.textureDir = os.path.join(self.shaderDir, "sourceimages").replace("\\", "/")
+        writeFile(os.path.join(self.textureDir, "rust.png"), "rust")
+        writeFile(os.path.join(self.textureDir, "scratch.1001.png"), "scratch")
+        self.metalPath = os.path.join(self.shaderDir, "metal", "metal_0001.ma")
+        writeShaderScene(self.metalPath, [self.textureDir + "/rust.png", self.textureDir + "/scratch.<UDIM>.png"])
+        self.woodPath = os.path.join(self.shaderDir, "wood", "wood_0001.ma")
+        writeShaderScene(self.woodPath, [self.textureDir + "/oak.png"])
+        self.parsed = []
+        self.parseMaFile = ISMLcore.parseMaFile
+        ISMLcore.parseMaFile = self.countParse
+
+    def tearDown(self):
+        ISMLcore.parseMaFile = self.parseMaFile
+        ISMLcore.textureAudit.clear()
+        ISMLcore.catalogCache.clear()
+        ISMLcore.versionIndex.clear()
+
+    def countParse(self, maFile, attributes=False):
+        self.parsed.append(os.path.basename(maFile))
+        return self.parseMaFile(maFile, attributes)
+
+    def audit(self):
+        warnings = []
+        broken = ISMLcore.auditTextures([self.shaderDir], warnings, workers=2)
+        self.assertEqual(warnings, [])
+        return broken
+
+    def testMissingTextureIsReported(self):
+        self.assertEqual(self.audit(), {self.woodPath: [("file1", ".ftn", self.textureDir + "/oak.png")]})
+        self.assertEqual(ISMLcore.textureAudit[self.metalPath], [])
+        self.assertIn("1 shaders with 1 missing textures", ISMLcore.formatAuditReport(self.audit()))
+
+    def testUnchangedScenesArentParsedAgain(self):
+        self.audit()
+        self.assertEqual(sorted(self.parsed), ["metal_0001.ma", "wood_0001.ma"])
+        self.assertTrue(os.path.isfile(os.path.join(self.shaderDir, ISMLcore.libraryDataDirName, ISMLcore.auditCacheFileName)))
+        del self.parsed[:]
+        self.assertEqual(len(self.audit()), 1)
+        self.assertEqual(self.parsed, [])
+
+        writeFile(os.path.join(self.textureDir, "oak.png"), "oak")  # Changes the mtime of the folder
+        self.assertEqual(self.audit(), {})
+        self.assertEqual(self.parsed, [])
+
+        writeShaderScene(self.metalPath, [self.textureDir + "/dust.png"])
+        self.assertEqual(self.audit(), {self.metalPath: [("file1", ".ftn", self.textureDir + "/dust.png")]})
+        self.assertEqual(self.parsed, ["metal_0001.ma"])
+
+
+if __name__ == "__main__":
+    unittest.main()
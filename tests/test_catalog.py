@@ -0,0 +1,130 @@
+import os
+import time
+import threading
+import unittest
+
+from helpers import makeTempDir, writeFile
+import ISMLcore
+
+
+# Sets the mtime of a file and of its folder, like a file server with a coarse clock would.
+def touch(path, mtime):
+    os.utime(path, (mtime, mtime))
+    os.utime(os.path.dirname(path), (mtime, mtime))
+
+
+class CatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.shaderDir = makeTempDir(self)
+        self.mtlDir = os.path.join(self.shaderDir, "metal")
+        os.mkdir(self.mtlDir)
+        self.shaderPath = os.path.join(self.mtlDir, "metal_0001.ma")
+        self.iconPath = os.path.join(self.mtlDir, "metal_icon.png")
+        writeFile(self.shaderPath, "//Maya ASCII 2020 scene\n")
+        writeFile(self.iconPath, "png")
+        self.mtime = int(time.time()) - 100  # Python 2 rounds float mtimes
+        touch(self.shaderPath, self.mtime)
+        touch(self.iconPath, self.mtime)
+
+    def tearDown(self):
+        ISMLcore.catalogCache.pop(self.shaderDir, None)
+        ISMLcore.metadataCache.clear()
+        ISMLcore.iconMtimes.clear()
+
+    def scan(self):
+        warnings = []
+        pathLists = ISMLcore.scanShaderDirectory(self.shaderDir, warnings, 1)
+        self.assertEqual(warnings, [])
+        return pathLists
+
+    def testScanUsesCatalog(self):
+        self.assertEqual(self.scan(), [[[self.shaderPath]], [self.iconPath]])
+        self.assertTrue(os.path.isfile(ISMLcore.getCatalogPath(self.shaderDir)))
+        self.assertEqual(self.scan(), [[[self.shaderPath]], [self.iconPath]])
+
+    def testFolderMtimeIsTrusted(self):
+        self.scan()
+        writeFile(self.shaderPath, "//Maya ASCII 2020 scene\n//MaterialTag: Metal\n")
+        touch(self.shaderPath, self.mtime + 10)
+        os.utime(self.mtlDir, (self.mtime, self.mtime))  # Someone else overwrote it, the folder mtime stays the same
+        self.scan()
+        self.assertEqual(ISMLcore.metadataCache[self.shaderPath][0], self.mtime)  # The scene file isn't stat'ed again
+
+    def testRenderedIconIsRescanned(self):
+        self.scan()
+
+        # Overwrites the icon in place, which doesn't change the mtime of the folder
+        def renderIconInPlace(shaderPath, iconPath, templateScene):
+            writeFile(iconPath, "new png")
+            os.utime(iconPath, (self.mtime + 20, self.mtime + 20))
+            os.utime(self.mtlDir, (self.mtime, self.mtime))
+        ISMLcore.renderBackends["inPlace"] = renderIconInPlace
+        queueDir = os.path.join(self.shaderDir, ISMLcore.libraryDataDirName, "renderQueue")
+        try:
+            os.rename(self.iconPath, ISMLcore.getIconRenderPath(self.shaderPath))
+            self.iconPath = ISMLcore.getIconRenderPath(self.shaderPath)
+            self.scan()
+            ISMLcore.queueIconRenders([self.shaderPath], "inPlace", None, queueDir)
+            self.assertEqual(ISMLcore.runRenderWorker(queueDir), (1, 0))
+        finally:
+            ISMLcore.renderBackends.pop("inPlace")
+        self.scan()
+        self.assertEqual(ISMLcore.iconMtimes[self.iconPath], self.mtime + 20)
+
+    def testUnchangedRootIsNotListed(self):
+        scan = ISMLcore.profiled(self.scan)
+        profileLogPath = ISMLcore.profileLogPath
+        ISMLcore.profileLogPath = os.path.join(self.shaderDir, ISMLcore.libraryDataDirName, "ISMLprofile.jsonl")
+        ISMLcore.setProfiling(True)
+        try:
+            self.scan()
+            os.utime(self.shaderDir, (self.mtime, self.mtime))
+            scan()
+            self.assertEqual(ISMLcore.profileRecords[-1]["listings"], 1)  # Only the root, the shader folder didn't change
+            self.assertEqual(scan(), [[[self.shaderPath]], [self.iconPath]])
+            self.assertEqual(ISMLcore.profileRecords[-1]["listings"], 0)
+
+            woodPath = os.path.join(self.shaderDir, "wood", "wood_0001.ma")
+            os.mkdir(os.path.dirname(woodPath))
+            writeFile(woodPath, "//Maya ASCII 2020 scene\n")
+            os.utime(self.shaderDir, (self.mtime + 10, self.mtime + 10))
+            self.assertEqual(scan()[0], [[self.shaderPath], [woodPath]])
+        finally:
+            ISMLcore.setProfiling(False)
+            ISMLcore.profileLogPath = profileLogPath
+
+
+class ScanTimeoutTest(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.scanned = []
+        self.scanShaderDirectory = ISMLcore.scanShaderDirectory
+        ISMLcore.scanShaderDirectory = self.hangingScan
+
+    def tearDown(self):
+        self.release.set()
+        ISMLcore.scanShaderDirectory = self.scanShaderDirectory
+        ISMLcore.hangingScans.clear()
+
+    # Stands in for a shader directory on a share that doesn't answer until "release" is set.
+    def hangingScan(self, shaderDirDefaultPath, warnings, workers=None):
+        self.scanned.append(shaderDirDefaultPath)
+        self.release.wait(10)
+        return [[], []]
+
+    def testHangingDirectoryIsNotScannedTwice(self):
+        warnings = []
+        self.assertEqual(ISMLcore.scanShaderDirectories(["O:/hanging"], warnings, timeout=0.1), {})
+        self.assertEqual(len(warnings), 1)
+        self.assertEqual(ISMLcore.scanShaderDirectories(["O:/hanging"], warnings, timeout=0.1), {})
+        self.assertEqual(len(warnings), 2)
+        self.assertEqual(self.scanned, ["O:/hanging"])
+
+        self.release.set()
+        ISMLcore.hangingScans["O:/hanging"].join(10)
+        self.assertEqual(ISMLcore.scanShaderDirectories(["O:/hanging"], warnings, timeout=5), {"O:/hanging": [[], []]})
+        self.assertEqual(self.scanned, ["O:/hanging", "O:/hanging"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import unittest
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from helpers import makeTempDir, createShader, writeShaderScene
+import ISMLcore
+
+
+class ScanDirectoriesTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = makeTempDir(self)
+        self.shaderDirs = [os.path.join(self.tempDir, "project%s" % i) for i in range(3)]
+        for i, shaderDir in enumerate(self.shaderDirs):
+            for j in range(i + 1):
+                createShader(shaderDir, "shader%s" % j)
+
+    def tearDown(self):
+        ISMLcore.catalogCache.clear()
+        ISMLcore.versionIndex.clear()
+
+    def testDirectoriesAreScannedTogether(self):
+        warnings = []
+        missingDir = os.path.join(self.tempDir, "missing")
+        pathLists = ISMLcore.scanShaderDirectories(self.shaderDirs + [missingDir], warnings, workers=2)
+        self.assertEqual(dict((shaderDir, len(pathLists[shaderDir][0])) for shaderDir in self.shaderDirs),
+                         dict((shaderDir, i + 1) for i, shaderDir in enumerate(self.shaderDirs)))
+        self.assertEqual(pathLists.get(missingDir, [[]])[0], [])
+        self.assertEqual(len(warnings), 1)
+        self.assertIn(missingDir, warnings[0])
+
+    def testBenchmarkScanSkipsUnchangedFolders(self):
+        results = dict((name, (listings, stats)) for name, seconds, listings, stats in ISMLcore.benchmarkScan(20, versions=2, workers=2))
+        self.assertEqual(results["listdir scan"][0], 21)  # The root and every folder
+        self.assertTrue(results["cold scan, 2 threads"][0] >= 21)
+        self.assertEqual(results["unchanged scan"][0], 1)  # Only the root
+        self.assertTrue(results["1% changed scan"][0] < 21)
+
+
+class CommandLineTest(unittest.TestCase):
+    def setUp(self):
+        self.shaderDir = makeTempDir(self)
+        self.metalPath = createShader(self.shaderDir, "metal", tag="Metal", comment="Brushed steel")
+        self.woodPath = os.path.join(self.shaderDir, "wood", "wood_0001.ma")
+        writeShaderScene(self.woodPath, [os.path.join(self.shaderDir, "wood", "oak.png").replace("\\", "/")])
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        ISMLcore.catalogCache.clear()
+        ISMLcore.versionIndex.clear()
+        ISMLcore.metadataCache.clear()
+        ISMLcore.textureAudit.clear()
+
+    def runMain(self, argv):
+        sys.stdout.seek(0)
+        sys.stdout.truncate()
+        result = ISMLcore.main(argv)
+        return result, sys.stdout.getvalue()
+
+    def testScan(self):
+        result, output = self.runMain(["scan", self.shaderDir, "--workers", "2"])
+        self.assertEqual(result, 0)
+        self.assertIn("%s: 2 shaders" % os.path.basename(self.shaderDir), output)
+        self.assertTrue(os.path.isfile(ISMLcore.getCatalogPath(self.shaderDir)))
+
+    def testIndexSearch(self):
+        self.assertEqual(self.runMain(["index", self.shaderDir, "--search", "steel"]), (0, "%s\n" % self.metalPath))
+        self.assertEqual(self.runMain(["index", self.shaderDir]), (0, "Indexed 2 shaders\n"))
+
+    def testAuditFailsWithMissingTextures(self):
+        result, output = self.runMain(["audit", self.shaderDir])
+        self.assertEqual(result, 1)
+        self.assertIn("oak.png", output)
+
+    def testBenchmarkJson(self):
+        result, output = self.runMain(["benchmark", "--folders", "10", "--versions", "2", "--json"])
+        self.assertEqual(result, 0)
+        self.assertEqual([row["scan"] for row in json.loads(output)["10"]][-2 :], ["unchanged scan", "1% changed scan"])
+
+
+if __name__ == "__main__":
+    unittest.main()
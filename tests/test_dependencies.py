@@ -0,0 +1,26 @@
+import os
+import unittest
+
+from helpers import makeTempDir
+import ISMLcore
+
+
+class RequiresTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = makeTempDir(self)
+        self.maFile = os.path.join(self.tempDir, "metal_0001.ma")
+
+    def parseRequires(self, lines):
+        with open(self.maFile, "w") as mf:
+            mf.write("//Maya ASCII 2020 scene\n" + "".join(lines))
+        return ISMLcore.parseMaFile(self.maFile)["requires"]
+
+    def testPluginNames(self):
+        self.assertEqual(self.parseRequires(['requires maya "2020";\n',
+                                             'requires -nodeType "VRaySettingsNode" -dataType "vrayFloatVectorData" "vrayformaya" "5";\n',
+                                             'requires -nodeType "aiStandardSurface" "mtoa" "4.0.0";\n',
+                                             'requires "stereoCamera" "10.0";\n']), ["vrayformaya", "mtoa", "stereoCamera"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import unittest
+
+from helpers import makeTempDir, writeFile
+import ISMLcore
+
+
+# A chain of blinn nodes with a file node at its start. The prefix changes the node names only.
+def writeNetworkScene(shaderPath, texturePath, prefix="", header="", extra=""):
+    lines = ["//Maya ASCII 2020 scene\n", header]
+    for i in range(12):
+        lines.append('createNode blinn -n "%sblinn%s";\n\tsetAttr ".c" -type "float3" %s 0.5 0.5;\n' % (prefix, i, i))
+        if i > 0:
+            lines.append('connectAttr "%sblinn%s.oc" "%sblinn%s.c";\n' % (prefix, i-1, prefix, i))
+    lines.append('createNode file -n "%sfile1";\n\tsetAttr ".ftn" -type "string" "%s";\n' % (prefix, texturePath))
+    lines.append('connectAttr "%sfile1.oc" "%sblinn0.c";\n' % (prefix, prefix))
+    writeFile(shaderPath, "".join(lines) + extra, 1000000000 if prefix == "" else 1000000100)
+
+
+class DuplicatesTest(unittest.TestCase):
+    def setUp(self):
+        self.shaderDir = makeTempDir(self)
+        self.metalPath = os.path.join(self.shaderDir, "metal", "metal_0001.ma")
+        self.steelPath = os.path.join(self.shaderDir, "steel", "steel_0001.ma")
+        self.ironPath = os.path.join(self.shaderDir, "iron", "iron_0001.ma")
+        self.rustPath = os.path.join(self.shaderDir, "metal", "textures", "rust.png").replace("\\", "/")
+        self.rustCopyPath = os.path.join(self.shaderDir, "steel", "textures", "rust.png").replace("\\", "/")
+        writeFile(self.rustPath, "rust")
+        writeFile(self.rustCopyPath, "rust")
+        writeNetworkScene(self.metalPath, self.rustPath)
+        writeNetworkScene(self.steelPath, self.rustCopyPath, prefix="steel_", header="//MaterialTag: Steel\n")  # Renamed copy
+        writeNetworkScene(self.ironPath, self.rustPath, prefix="iron_", extra='createNode place2dTexture -n "uv";\nconnectAttr "uv.o" "iron_file1.uv";\n')
+        writeFile(os.path.join(self.shaderDir, "wood", "wood_0001.ma"), '//Maya ASCII 2020 scene\ncreateNode lambert -n "wood";\n')
+
+    def tearDown(self):
+        ISMLcore.catalogCache.clear()
+        ISMLcore.versionIndex.clear()
+        ISMLcore.fileHashCache.clear()
+
+    def findDuplicates(self, threshold=None):
+        warnings = []
+        report = ISMLcore.findDuplicates([self.shaderDir], warnings, workers=2, threshold=threshold)
+        self.assertEqual(warnings, [])
+        return report
+
+    def testCopiesAreFoundDespiteNamesAndTags(self):
+        report = self.findDuplicates()
+        self.assertEqual(report["shaders"], 4)
+        self.assertEqual(report["exact"], [[self.metalPath, self.steelPath]])  # The oldest is kept
+        self.assertEqual(report["textures"], [[self.rustPath, self.rustCopyPath]])
+        self.assertEqual(report["exactBytes"], ISMLcore.getFolderSize(os.path.dirname(self.steelPath)))
+        self.assertEqual(report["textureBytes"], 0)  # The copy goes with the steel folder
+
+    def testSimilarShadersAreNearDuplicates(self):
+        near = self.findDuplicates()["near"]
+        self.assertEqual([[shaderPath for shaderPath, similarity in group] for group in near], [[self.metalPath, self.ironPath]])
+        self.assertTrue(ISMLcore.nearDuplicateThreshold <= near[0][1][1] < 1.0)
+        self.assertEqual(self.findDuplicates(threshold=1.0)["near"], [])
+
+    def testTextureCopiesOutsideDuplicatesAreCounted(self):
+        writeFile(os.path.join(self.shaderDir, "wood", "textures", "rust.png"), "rust")
+        report = self.findDuplicates()
+        self.assertEqual(report["textures"], [[self.rustPath, self.rustCopyPath]])  # Only textures the newest versions use are compared
+        writeNetworkScene(os.path.join(self.shaderDir, "wood", "wood_0002.ma"), os.path.join(self.shaderDir, "wood", "textures", "rust.png").replace("\\", "/"), prefix="wood_",
+                          extra='setAttr "wood_blinn3.c" -type "float3" 1 1 1;\n')
+        report = self.findDuplicates()
+        self.assertEqual(len(report["textures"][0]), 3)
+        self.assertEqual(report["textureBytes"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import time
+import unittest
+
+from helpers import makeTempDir, writeFile, readFile
+import ISMLcore
+
+
+# Makes a lock look like it wasn't touched for two minutes.
+def makeStale(lockPath):
+    staleTime = time.time() - 120
+    os.utime(lockPath, (staleTime, staleTime))
+
+
+class LockTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = makeTempDir(self)
+        self.path = os.path.join(self.tempDir, "metal_0001.ma")
+        self.lockPath = self.path + ISMLcore.lockExt
+        self.readLockOwner = ISMLcore.readLockOwner
+
+    def tearDown(self):
+        ISMLcore.readLockOwner = self.readLockOwner
+        ISMLcore.heldLocks.clear()
+
+    def testStaleLockIsTakenOver(self):
+        writeFile(self.lockPath, "crashed writer")
+        makeStale(self.lockPath)
+        with ISMLcore.lockedFile(self.path, 1):
+            self.assertNotEqual(readFile(self.lockPath), "crashed writer")
+        self.assertFalse(os.path.exists(self.lockPath))
+
+    def testHeldLockIsKeptFresh(self):
+        self.assertEqual(ISMLcore.acquireLock(self.path, 0), self.lockPath)
+        makeStale(self.lockPath)  # A long write
+        ISMLcore.touchHeldLocks()
+        self.assertRaises(IOError, ISMLcore.acquireLock, self.path, 0)
+        ISMLcore.releaseLock(self.lockPath)
+        self.assertFalse(os.path.exists(self.lockPath))
+
+    def testLockReplacedBeforeTheRenameIsPutBack(self):
+        writeFile(self.lockPath, "crashed writer")
+        makeStale(self.lockPath)
+
+        # Between the stat and the rename, another writer takes the stale lock over and locks the file again.
+        def readLockOwner(lockPath):
+            owner = self.readLockOwner(lockPath)
+            ISMLcore.readLockOwner = self.readLockOwner
+            os.remove(lockPath)
+            writeFile(lockPath, "new writer")
+            return owner
+        ISMLcore.readLockOwner = readLockOwner
+        ISMLcore.breakStaleLock(self.lockPath)
+        self.assertEqual(readFile(self.lockPath), "new writer")
+        self.assertEqual(os.listdir(self.tempDir), [os.path.basename(self.lockPath)])
+
+    def testLockTakenOverIsNotReleased(self):
+        ISMLcore.acquireLock(self.path, 0)
+        writeFile(self.lockPath, "new writer")
+        ISMLcore.releaseLock(self.lockPath)
+        self.assertEqual(readFile(self.lockPath), "new writer")
+
+
+if __name__ == "__main__":
+    unittest.main()
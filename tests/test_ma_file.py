@@ -0,0 +1,76 @@
+import os
+import unittest
+
+from helpers import makeTempDir, writeFile, readFile
+import ISMLcore
+
+
+class StatementTest(unittest.TestCase):
+    def testHeaderAndCommentLinesAreSkipped(self):
+        lines = ["//Maya ASCII 2020 scene\n", "//MaterialTag: Metal\n", 'createNode blinn -n "metal";\n', "// Between statements\n", 'connectAttr "metal.oc" "metalSG.ss";\n']
+        self.assertEqual([[token[1] for token in tokens] for tokens in ISMLcore.iterMaStatements(lines)],
+                         [["createNode", "blinn", "-n", "metal"], ["connectAttr", "metal.oc", "metalSG.ss"]])
+
+    def testStringsAreUnescaped(self):
+        tokens = list(ISMLcore.iterMaStatements(['setAttr ".ftn" -type "string" "C:/tex/a\\"b.png"; select -ne "file1";\n']))
+        self.assertEqual(len(tokens), 2)
+        self.assertEqual(tokens[0][-1], ("string", 'C:/tex/a"b.png', 1, 'C:/tex/a\\"b.png'))
+
+    def testLongStatementsAreCut(self):
+        lines = ['setAttr -s 1000 ".wl[0:999]"\n'] + ["\t%s %s %s %s\n" % (i, i, i, i) for i in range(250)] + ["\t;\n", 'createNode file -n "file1";\n']
+        statements = list(ISMLcore.iterMaStatements(lines))
+        self.assertEqual(len(statements[0]), ISMLcore.maStatementTokenLimit)
+        self.assertEqual([token[1] for token in statements[1]], ["createNode", "file", "-n", "file1"])
+        self.assertEqual(statements[1][0][2], 253)
+
+    def testJoinedStringsAreOneValue(self):
+        tokens = list(ISMLcore.iterMaStatements(['setAttr ".ftn" -type "string" "C:/tex/"\n', '\t+ "rust.png";\n']))[0]
+        self.assertEqual(ISMLcore.getStatementValues(tokens[1 :])[-1], ("C:/tex/rust.png", 1, "C:/tex/rust.png", 2))
+
+
+class ParseMaFileTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = makeTempDir(self)
+        self.maFile = os.path.join(self.tempDir, "metal", "metal_0001.ma")
+        writeFile(self.maFile, "".join(['//Maya ASCII 2020 scene\n',
+                                        'file -rdi 1 -ns "floor" -rfn "floorRN" "C:/scenes/floor.ma";\n',
+                                        'requires -nodeType "aiStandardSurface" "mtoa" "4.0.0";\n',
+                                        'createNode aiStandardSurface -n "metal";\n',
+                                        '\tsetAttr ".base" 0.8;\n',
+                                        'createNode file -n "file1";\n',
+                                        '\tsetAttr ".ftn" -type "string" "C:/tex/rust.png";\n',
+                                        'createNode file -n "file2";\n',
+                                        '\tsetAttr ".ftn" -type "string" "C:/tex/"\n',
+                                        '\t\t+ "dust.png";\n',
+                                        'createNode file -n "file3";\n',
+                                        '\tsetAttr ".ftn" -type "string" "C:/tex/scratch.1001.png";\n',
+                                        '\tsetAttr ".uvt" 3;\n',
+                                        'connectAttr "file1.oc" "metal.base_color";\n']))
+
+    def testGraph(self):
+        graph = ISMLcore.parseMaFile(self.maFile, attributes=True)
+        self.assertEqual(graph["nodes"]["metal"]["type"], "aiStandardSurface")
+        self.assertEqual(graph["nodes"]["metal"]["attributes"], [(".base", ("0.8",))])
+        self.assertEqual(graph["connections"], [("file1.oc", "metal.base_color")])
+        self.assertEqual(graph["requires"], ["mtoa"])
+        self.assertEqual([(reference["node"], reference["type"], reference["path"], reference["line"], reference["parts"], reference["pattern"]) for reference in graph["references"]],
+                         [("floorRN", "reference", "C:/scenes/floor.ma", 2, 1, None),
+                          ("file1", "file", "C:/tex/rust.png", 7, 1, None),
+                          ("file2", "file", "C:/tex/dust.png", 9, 2, None),
+                          ("file3", "file", "C:/tex/scratch.1001.png", 12, 1, "C:/tex/scratch.<UDIM>.png")])
+
+    def testRelinkOnlyRewritesTheChangedLines(self):
+        text = readFile(self.maFile)
+        relinked = []
+
+        def relink(texturePath):
+            relinked.append(texturePath)
+            return texturePath.replace("C:/tex/", "D:/library/metal/")
+        self.assertEqual(ISMLcore.relinkTexturesInMaFile(self.maFile, relink), 2)
+        self.assertEqual(relinked, ["C:/tex/rust.png", "C:/tex/scratch.1001.png"])  # Neither the scene reference nor the split path
+        self.assertEqual(readFile(self.maFile), text.replace('"C:/tex/rust.png"', '"D:/library/metal/rust.png"').replace('"C:/tex/scratch', '"D:/library/metal/scratch'))
+        self.assertEqual(os.listdir(os.path.dirname(self.maFile)), ["metal_0001.ma"])
+
+
+if __name__ == "__main__":
+    unittest.main()
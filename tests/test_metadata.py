@@ -0,0 +1,65 @@
+import os
+import unittest
+
+from helpers import makeTempDir, writeFile, readFile, createShader
+import ISMLcore
+
+
+class ShaderMetadataTest(unittest.TestCase):
+    def setUp(self):
+        self.shaderDir = makeTempDir(self)
+        self.shaderPath = createShader(self.shaderDir, "metal", tag="Metal", comment="Brushed")
+
+    def tearDown(self):
+        ISMLcore.metadataCache.clear()
+        ISMLcore.catalogCache.clear()
+        ISMLcore.versionIndex.clear()
+
+    def testCachedUntilValidated(self):
+        self.assertEqual(ISMLcore.getShaderMetadata(self.shaderPath), ("Metal", "Brushed"))
+        ISMLcore.writeShaderMetadataFile(self.shaderPath, "Steel", "Brushed and polished")  # By someone else
+        self.assertEqual(ISMLcore.getShaderMetadata(self.shaderPath), ("Metal", "Brushed"))
+        self.assertEqual(ISMLcore.getShaderMetadata(self.shaderPath, validate=True), ("Steel", "Brushed and polished"))
+
+    def testWritingKeepsTheOtherValue(self):
+        ISMLcore.getShaderMetadata(self.shaderPath)
+        self.assertTrue(ISMLcore.writeShaderMetadata(self.shaderPath, tag="Steel"))
+        self.assertEqual(ISMLcore.getShaderMetadata(self.shaderPath), ("Steel", "Brushed"))
+        self.assertFalse(ISMLcore.writeShaderMetadata(self.shaderPath, comment="Brushed"))
+        self.assertEqual(readFile(self.shaderPath), "//Maya ASCII 2020 scene\n")  # The scene isn't rewritten
+
+    def testAuthorsAreKept(self):
+        ISMLcore.addShaderVersion(self.shaderPath, "anna")
+        ISMLcore.writeShaderMetadata(self.shaderPath, comment="Scratched")
+        self.assertEqual(ISMLcore.readMetadataFile(self.shaderPath)["authors"], {"metal_0001.ma": "anna"})
+
+
+class HeaderMetadataTest(unittest.TestCase):
+    def setUp(self):
+        self.shaderDir = makeTempDir(self)
+        self.shaderPath = os.path.join(self.shaderDir, "wood", "wood_0002.ma")
+        self.text = "//Maya ASCII 2020 scene\n//MaterialTag: Wood\n//ShComm: Oak__nwlne__oiled\ncreateNode blinn -n \"wood\";\n"
+        writeFile(os.path.join(self.shaderDir, "wood", "wood_0001.ma"), "//Maya ASCII 2020 scene\n//MaterialTag: Old\n")
+        writeFile(self.shaderPath, self.text)
+
+    def tearDown(self):
+        ISMLcore.metadataCache.clear()
+        ISMLcore.catalogCache.clear()
+        ISMLcore.versionIndex.clear()
+
+    def testHeaderIsReadWithoutMetadataFile(self):
+        self.assertEqual(ISMLcore.readHeaderMetadata(self.shaderPath), ("Wood", "Oak\noiled"))
+        self.assertEqual(ISMLcore.getShaderMetadata(self.shaderPath), ("Wood", "Oak\noiled"))
+
+    def testNewestHeaderIsMigrated(self):
+        warnings = []
+        self.assertEqual(ISMLcore.migrateHeaderMetadata([self.shaderDir], warnings), 1)
+        self.assertEqual(warnings, [])
+        self.assertEqual(ISMLcore.readMetadataFile(self.shaderPath)["tag"], "Wood")
+        self.assertEqual(ISMLcore.readMetadataFile(self.shaderPath)["comment"], "Oak\noiled")
+        self.assertEqual(readFile(self.shaderPath), self.text)
+        self.assertEqual(ISMLcore.migrateHeaderMetadata([self.shaderDir], warnings), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import threading
+import unittest
+
+from helpers import makeTempDir
+import ISMLcore
+
+
+class ProfilingTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = makeTempDir(self)
+        self.paths = []
+        for i in range(4):
+            path = os.path.join(self.tempDir, "rust%s.png" % i)
+            with open(path, "w") as f:
+                f.write("rust%s" % i)
+            self.paths.append(path)
+        self.profileLogPath = ISMLcore.profileLogPath
+        ISMLcore.profileLogPath = os.path.join(self.tempDir, "ISMLprofile.jsonl")
+        ISMLcore.setProfiling(True)
+
+    def tearDown(self):
+        ISMLcore.setProfiling(False)
+        ISMLcore.profileLogPath = self.profileLogPath
+
+    def hashFile(self, path):
+        return ISMLcore.hashFile(path, useCache=False)
+
+    def testNothingIsReplaced(self):
+        originals = (open, os.stat, os.listdir)
+        ISMLcore.profiled(self.hashFile)(self.paths[0])
+        self.assertEqual((open, os.stat, os.listdir), originals)
+
+    def testHelpersCountTheirFileCalls(self):
+        ISMLcore.profiled(self.hashFile)(self.paths[0])
+        record = ISMLcore.profileRecords[-1]
+        self.assertEqual((record["name"], record["opens"], record["stats"], record["listings"]), ("hashFile", 1, 1, 0))
+        self.assertFalse(record["overlapped"])
+        self.assertEqual(ISMLcore.readProfileLog(ISMLcore.profileLogPath)[-1]["opens"], 1)
+
+    def testCallIncludesItsCallsAndHelperThreads(self):
+        def hashFolder():
+            ISMLcore.profiled(self.hashFile)(self.paths[0])
+            ISMLcore.mapInThreads(self.hashFile, self.paths, 4)
+            return list(ISMLcore.iterDirEntries(self.tempDir))
+        ISMLcore.profiled(hashFolder)()
+        inner, outer = ISMLcore.profileRecords[-2], ISMLcore.profileRecords[-1]
+        self.assertEqual((inner["name"], inner["opens"]), ("hashFile", 1))
+        self.assertEqual((outer["name"], outer["opens"], outer["stats"], outer["listings"]), ("hashFolder", 5, 5, 1))
+        self.assertFalse(outer["overlapped"])  # The helper threads are part of the call
+
+    def testCallsOnOtherThreadsAreOverlapped(self):
+        started = threading.Event()
+        finish = threading.Event()
+
+        def waitForFinish():
+            started.set()
+            finish.wait(10)
+        thread = threading.Thread(target=ISMLcore.profiled(waitForFinish))
+        thread.start()
+        started.wait(10)
+        ISMLcore.profiled(self.hashFile)(self.paths[0])
+        finish.set()
+        thread.join()
+        self.assertEqual([(record["name"], record["overlapped"]) for record in list(ISMLcore.profileRecords)[-2:]],
+                         [("hashFile", True), ("waitForFinish", True)])
+        self.assertEqual(ISMLcore.profileRecords[-1]["opens"], 0)  # The file calls of the other thread aren't counted
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import shutil
+import unittest
+
+from helpers import mock, makeTempDir, createShader, runDispatched, openLibraryWindow
+import ISMLcore
+import ISML
+
+
+@unittest.skipIf(mock is None, "needs unittest.mock")
+class RefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = makeTempDir(self)
+        self.shaderDir = os.path.join(self.tempDir, "projectA")
+        self.metalPath = createShader(self.shaderDir, "metal", tag="Metal")
+        self.woodPath = createShader(self.shaderDir, "wood", tag="Wood")
+        self.dispatched = openLibraryWindow(self, [self.shaderDir])
+
+    def testRefreshIndexesShadersOnTheMainThread(self):
+        ISML.refreshShaderTab()
+        self.assertEqual(ISML.indexedShaderPaths, {})  # Nothing is touched before the scan is dispatched back
+        runDispatched(ISML.taskExecutor, self.dispatched)
+
+        metalButton = ISML.getIconButtonName("metal_0001", "projectA")
+        woodButton = ISML.getIconButtonName("wood_0001", "projectA")
+        self.assertEqual(ISML.indexedShaderPaths, {metalButton: self.metalPath, woodButton: self.woodPath})
+        self.assertEqual(ISMLcore.searchIndex(ISML.shaderSearchIndex, "metal"), set([metalButton]))
+        self.assertEqual(ISMLcore.searchIndex(ISML.shaderSearchIndex, "wood projecta"), set([woodButton]))
+        self.assertEqual(ISML.displayedDirectoryList, [(self.shaderDir, "Shader")])
+        self.assertFalse(ISML.pm.warning.called)
+
+    def testMissingDirectoryOnlyWarns(self):
+        missingDir = os.path.join(self.tempDir, "missing")
+        ISML.globalDirectoryList = [[self.shaderDir, "Shader"], [missingDir, "Shader"]]
+        ISML.refreshShaderTab()
+        runDispatched(ISML.taskExecutor, self.dispatched)
+
+        self.assertTrue(ISML.pm.warning.called)
+        self.assertEqual(len(ISML.indexedShaderPaths), 2)
+        self.assertEqual(ISMLcore.searchIndex(ISML.shaderSearchIndex, "missing"), set())
+
+    def testUpdateOnlyTouchesChangedShaders(self):
+        ISML.refreshShaderTab()
+        runDispatched(ISML.taskExecutor, self.dispatched)
+        layout = ISML.tabLayouts["Shader"]
+        metalButton = ISML.getIconButtonName("metal_0001", "projectA")
+        woodButton = ISML.getIconButtonName("wood_0001", "projectA")
+        ISML.pm.reset_mock()
+
+        glassPath = createShader(self.shaderDir, "glass", tag="Glass")
+        shutil.rmtree(os.path.dirname(self.woodPath))
+        ISML.updateShaderTab()
+        runDispatched(ISML.taskExecutor, self.dispatched)
+        glassButton = ISML.getIconButtonName("glass_0001", "projectA")
+        self.assertEqual([iconName for iconName, iconArgs in ISML.layoutIcons[layout]], [metalButton, glassButton])
+        self.assertEqual(ISML.indexedShaderPaths, {metalButton: self.metalPath, glassButton: glassPath})
+        self.assertEqual(ISMLcore.searchIndex(ISML.shaderSearchIndex, "glass"), set([glassButton]))
+        self.assertNotIn(woodButton, [state[0] for state in ISML.slotStates.values() if state is not None])
+        self.assertFalse(ISML.pm.deleteUI.called)
+        metalSlot = ISML.iconSlots[layout][0]
+        self.assertFalse(any(call[0] == (metalSlot,) and call[1].get("e") for call in ISML.pm.iconTextButton.call_args_list))  # Unchanged icon
+
+    def testIconRenderedAgainIsShown(self):
+        iconPath = os.path.join(os.path.dirname(self.metalPath), "metal_icon.png")
+        with open(iconPath, "w") as iconFile:
+            iconFile.write("png")
+        ISML.refreshShaderTab()
+        runDispatched(ISML.taskExecutor, self.dispatched)
+        metalSlot = [slotName for slotName, state in ISML.slotStates.items() if state and state[0] == ISML.getIconButtonName("metal_0001", "projectA")][0]
+        ISML.pm.iconTextButton.reset_mock()
+
+        folderMtime = os.stat(os.path.dirname(iconPath)).st_mtime
+        os.utime(iconPath, (folderMtime + 10, folderMtime + 10))  # Rendered again, the render worker touches the folder
+        os.utime(os.path.dirname(iconPath), (folderMtime, folderMtime))
+        ISMLcore.touchShaderDir(os.path.dirname(iconPath))
+        ISML.updateShaderTab()
+        runDispatched(ISML.taskExecutor, self.dispatched)
+        self.assertEqual([call[1]["i"] for call in ISML.pm.iconTextButton.call_args_list if call[0] == (metalSlot,) and "i" in call[1]], [iconPath])
+        self.assertEqual(ISML.slotStates[metalSlot][3], folderMtime + 10)
+
+    def testTabIsRefreshedAfterTheExport(self):
+        shaderPath = os.path.join(self.shaderDir, "glass", "glass.ma")
+        exportPath = os.path.join(self.tempDir, "export.ma")
+        with open(exportPath, "w") as exportFile:
+            exportFile.write("//Maya ASCII 2020 scene\n")
+        ISML.pm.fileDialog2.return_value = [os.path.join(self.shaderDir, "glass.ma")]
+        with mock.patch.object(ISML, "exportWithoutUVChoosers", return_value=exportPath), \
+                mock.patch.object(ISML, "getCopyTexturesOption", return_value=False), \
+                mock.patch.object(ISML, "updateShaderTab") as updateShaderTab:
+            self.assertEqual(ISML.exportSG(), shaderPath)
+            self.assertFalse(updateShaderTab.called)
+            runDispatched(ISML.taskExecutor, self.dispatched)
+            self.assertEqual(updateShaderTab.call_count, 1)
+        self.assertTrue(os.path.isfile(shaderPath))
+
+
+@unittest.skipIf(mock is None, "needs unittest.mock")
+class IconPageTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = makeTempDir(self)
+        self.shaderDir = os.path.join(self.tempDir, "projectA")
+        for i in range(100):
+            createShader(self.shaderDir, "shader%03d" % i)
+        self.dispatched = openLibraryWindow(self, [self.shaderDir])
+        ISML.refreshShaderTab()
+        runDispatched(ISML.taskExecutor, self.dispatched)
+        self.layout = ISML.tabLayouts["Shader"]
+        self.pageSize = ISML.getIconPageSize(self.layout)
+
+    def getShownIconNames(self):
+        return [ISML.slotStates[slotName][0] for slotName in ISML.iconSlots[self.layout] if ISML.slotStates[slotName] is not None]
+
+    def testScrollingReusesTheButtons(self):
+        poolSize = ISML.iconPoolPages * self.pageSize
+        slots = list(ISML.iconSlots[self.layout])
+        self.assertEqual(len(slots), poolSize)
+        allNames = [ISML.getIconButtonName("shader%03d_0001" % i, "projectA") for i in range(100)]
+        self.assertEqual(self.getShownIconNames(), allNames[:poolSize])
+        ISML.pm.reset_mock()
+
+        while ISML.scrollIcons(self.layout, self.pageSize) > 0:
+            first = ISML.firstShownIcons[self.layout]
+            self.assertEqual(self.getShownIconNames(), allNames[first : first+poolSize])
+        self.assertEqual(self.getShownIconNames(), allNames[-(-(100 - poolSize) // 3) * 3 :])  # The last row starts a row of 3
+        while ISML.scrollIcons(self.layout, -self.pageSize) < 0:
+            first = ISML.firstShownIcons[self.layout]
+            self.assertEqual(self.getShownIconNames(), allNames[first : first+poolSize])
+        self.assertEqual(self.getShownIconNames(), allNames[:poolSize])
+
+        self.assertEqual(ISML.iconSlots[self.layout], slots)
+        self.assertFalse(ISML.pm.deleteUI.called)
+        self.assertFalse(any(call[1].get("p") == self.layout for call in ISML.pm.iconTextButton.call_args_list))  # Nothing was created
+
+    def testFilteringStartsAtTheTop(self):
+        ISML.scrollIcons(self.layout, self.pageSize)
+        self.assertEqual(ISML.firstShownIcons[self.layout], self.pageSize)
+        ISML.filterIcons("All", "All", "shader09")
+        self.assertEqual(ISML.firstShownIcons[self.layout], 0)
+        self.assertEqual(self.getShownIconNames(), [ISML.getIconButtonName("shader%03d_0001" % i, "projectA") for i in range(90, 100)])
+        ISML.filterIcons("All", "All", "")
+        self.assertEqual(len(self.getShownIconNames()), ISML.iconPoolPages * self.pageSize)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import json
+import unittest
+
+from helpers import makeTempDir, writeFile, readFile, writeShaderScene
+import ISMLcore
+
+
+class RelinkJobTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = makeTempDir(self)
+        self.texturePath = os.path.join(self.tempDir, "sourceimages", "rust.png").replace("\\", "/")
+        writeFile(self.texturePath, "rust")
+        self.shaderPath = os.path.join(self.tempDir, "projectA", "metal", "metal_0001.ma")
+        writeShaderScene(self.shaderPath, [self.texturePath])
+        self.journalPath = os.path.join(self.tempDir, "maya", "2020", "scripts", "ISMLrelinkJournal.json")
+
+    def testReportDoesntWriteTheJournal(self):
+        job = ISMLcore.planRelinkJob([self.shaderPath])
+        self.assertEqual(job["files"], 1)
+        ISMLcore.formatRelinkReport(job)
+        self.assertEqual(ISMLcore.readRelinkJournal(self.journalPath, job), None)
+        self.assertFalse(os.path.exists(os.path.dirname(self.journalPath)))
+
+    def testJobCreatesTheJournalFolder(self):
+        job = ISMLcore.planRelinkJob([self.shaderPath])
+        stats = ISMLcore.runRelinkJob(job, self.journalPath, workers=1)
+        self.assertEqual(stats["failed"], [])
+        self.assertEqual(stats["copied"], 1)
+        newTexturePath = os.path.join(os.path.dirname(self.shaderPath), "textures", "rust.png").replace("\\", "/")
+        self.assertIn(newTexturePath, readFile(self.shaderPath))
+        self.assertFalse(os.path.exists(self.journalPath))  # Removed once everything was relinked
+
+    def testInterruptedJobIsResumed(self):
+        otherShaderPath = os.path.join(self.tempDir, "projectA", "wood", "wood_0001.ma")
+        writeShaderScene(otherShaderPath, [self.texturePath])
+        job = ISMLcore.planRelinkJob([self.shaderPath, otherShaderPath])
+        ISMLcore.startJournal(self.journalPath, {"shaders": sorted([self.shaderPath, otherShaderPath])})
+        with open(self.journalPath, "a") as journal:
+            journal.write("%s\n" % json.dumps({"done": self.shaderPath}))
+        self.assertEqual(ISMLcore.readRelinkJournal(self.journalPath, job), set([self.shaderPath]))
+
+        stats = ISMLcore.runRelinkJob(job, self.journalPath, workers=1)
+        self.assertEqual(stats["copied"], 1)  # Only the shader that wasn't done
+        self.assertFalse(os.path.exists(self.journalPath))
+
+    def testBrokenSceneOnlyFailsItself(self):
+        brokenPath = os.path.join(self.tempDir, "projectA", "broken", "broken_0001.ma")
+        writeShaderScene(brokenPath, [self.texturePath])
+        listTexturesInMaFile = ISMLcore.listTexturesInMaFile
+        relinkTexturesInMaFile = ISMLcore.relinkTexturesInMaFile
+
+        def failOnBroken(func):
+            def wrapper(maFile, *args):
+                if maFile == brokenPath:
+                    raise ValueError("Can't parse %s" % maFile)
+                return func(maFile, *args)
+            return wrapper
+        try:
+            ISMLcore.listTexturesInMaFile = failOnBroken(listTexturesInMaFile)
+            job = ISMLcore.planRelinkJob([self.shaderPath, brokenPath])
+            self.assertEqual([shader["path"] for shader in job["shaders"]], [self.shaderPath])
+            self.assertEqual([shaderPath for shaderPath, ex in job["unreadable"]], [brokenPath])
+            self.assertIn("1 unreadable scenes", ISMLcore.formatRelinkReport(job))
+
+            ISMLcore.listTexturesInMaFile = listTexturesInMaFile
+            job = ISMLcore.planRelinkJob([self.shaderPath, brokenPath])
+            ISMLcore.relinkTexturesInMaFile = failOnBroken(relinkTexturesInMaFile)
+            stats = ISMLcore.runRelinkJob(job, self.journalPath, workers=2)
+        finally:
+            ISMLcore.listTexturesInMaFile = listTexturesInMaFile
+            ISMLcore.relinkTexturesInMaFile = relinkTexturesInMaFile
+        self.assertEqual([path for path, ex in stats["failed"]], [brokenPath])
+        self.assertEqual(ISMLcore.readRelinkJournal(self.journalPath, job), set([self.shaderPath]))
+
+
+class UdimRelinkTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = makeTempDir(self)
+        self.sourceDir = os.path.join(self.tempDir, "sourceimages").replace("\\", "/")
+        for tile in ("1001", "1002", "1011"):
+            writeFile(os.path.join(self.sourceDir, "rust.%s.png" % tile), tile)
+        self.shaderPath = os.path.join(self.tempDir, "projectA", "metal", "metal_0001.ma")
+        writeShaderScene(self.shaderPath, [self.sourceDir + "/rust.<UDIM>.png"])
+        self.textureDir = os.path.join(os.path.dirname(self.shaderPath), "textures").replace("\\", "/")
+
+    def testUdimPatternIsRelinked(self):
+        os.makedirs(self.textureDir)
+        stats = ISMLcore.copyAndLinkTexturesInMaFile(self.shaderPath, self.textureDir, warnings=[])
+        self.assertEqual(stats["copied"], 3)
+        self.assertEqual(sorted(os.listdir(self.textureDir)), ["rust.1001.png", "rust.1002.png", "rust.1011.png"])
+        self.assertIn('"%s/rust.<UDIM>.png"' % self.textureDir, readFile(self.shaderPath))
+
+    def testUdimPatternIsKeptIfATileFailed(self):
+        relink = ISMLcore.getTransferredRelink({self.sourceDir + "/rust.1001.png": self.textureDir + "/rust.1001.png"})
+        self.assertEqual(relink(self.sourceDir + "/rust.<UDIM>.png"), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
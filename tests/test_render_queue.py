@@ -0,0 +1,62 @@
+import os
+import unittest
+
+from helpers import makeTempDir, createShader
+import ISMLcore
+
+
+# A backend whose renderer crashes on every shader.
+def renderIconBroken(shaderPath, iconPath, templateScene):
+    raise RuntimeError("No license")
+
+
+class RenderQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = makeTempDir(self)
+        self.queueDir = os.path.join(self.tempDir, "renderQueue")
+        self.metalPath = createShader(self.tempDir, "metal")
+        self.woodPath = createShader(self.tempDir, "wood")
+        ISMLcore.renderBackends["broken"] = renderIconBroken
+
+    def tearDown(self):
+        ISMLcore.renderBackends.pop("broken", None)
+
+    def testStubBackendRendersEveryIcon(self):
+        self.assertEqual(ISMLcore.queueIconRenders([self.metalPath, self.woodPath], "stub", None, self.queueDir), 2)
+        self.assertEqual(ISMLcore.queueIconRenders([self.metalPath], "stub", None, self.queueDir), 1)  # Already queued
+        self.assertEqual(len(os.listdir(self.queueDir)), 2)
+
+        self.assertEqual(ISMLcore.runRenderWorker(self.queueDir), (2, 0))
+        for shaderPath in (self.metalPath, self.woodPath):
+            with open(ISMLcore.getIconRenderPath(shaderPath), "rb") as iconFile:
+                self.assertEqual(iconFile.read(8), b"\x89PNG\r\n\x1a\n")
+        self.assertEqual(os.listdir(self.queueDir), [])
+        self.assertEqual(ISMLcore.collectFailedRenders(self.queueDir), [])
+
+    def testFailedJobsAreReportedOnce(self):
+        ISMLcore.queueIconRenders([self.metalPath], "broken", None, self.queueDir)
+        self.assertEqual(ISMLcore.runRenderWorker(self.queueDir), (0, 1))
+        self.assertFalse(os.path.exists(ISMLcore.getIconRenderPath(self.metalPath)))
+        self.assertEqual(ISMLcore.collectFailedRenders(self.queueDir), [(self.metalPath, "No license")])
+        self.assertEqual(os.listdir(self.queueDir), [])
+        self.assertEqual(ISMLcore.collectFailedRenders(self.queueDir), [])
+
+    def testQueuingAgainRemovesTheFailure(self):
+        ISMLcore.queueIconRenders([self.metalPath], "broken", None, self.queueDir)
+        ISMLcore.runRenderWorker(self.queueDir)
+        ISMLcore.queueIconRenders([self.metalPath], "stub", None, self.queueDir)
+        self.assertEqual([name for name in os.listdir(self.queueDir) if name.endswith(".failed")], [])
+        self.assertEqual(ISMLcore.runRenderWorker(self.queueDir), (1, 0))
+        self.assertTrue(os.path.isfile(ISMLcore.getIconRenderPath(self.metalPath)))
+
+    def testJobsOfStoppedWorkersAreRecovered(self):
+        ISMLcore.queueIconRenders([self.metalPath], "stub", None, self.queueDir)
+        claimedPath = ISMLcore.claimRenderJob(self.queueDir)
+        self.assertTrue(claimedPath.endswith(".running"))
+        self.assertEqual(ISMLcore.claimRenderJob(self.queueDir), None)
+        ISMLcore.recoverRenderJobs(self.queueDir)
+        self.assertEqual(ISMLcore.runRenderWorker(self.queueDir), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from helpers import ISMLcore
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = ISMLcore.newSearchIndex()
+        ISMLcore.addToSearchIndex(self.index, "metal", name="metal_rough_0001", tag="Metal", project="projectA", comment="Brushed steel")
+        ISMLcore.addToSearchIndex(self.index, "wood", name="wood_oak_0003", tag="Wood", project="projectA", comment="")
+        ISMLcore.addToSearchIndex(self.index, "rust", name="rust_0002", tag="Metal", project="projectB", comment="Old steel\nwith paint")
+
+    def testTermsMatchAnywhereInTheText(self):
+        self.assertEqual(ISMLcore.searchIndex(self.index, "rough"), set(["metal"]))
+        self.assertEqual(ISMLcore.searchIndex(self.index, "STEEL"), set(["metal", "rust"]))
+        self.assertEqual(ISMLcore.searchIndex(self.index, "eel"), set(["metal", "rust"]))
+        self.assertEqual(ISMLcore.searchIndex(self.index, "oak_0003"), set(["wood"]))
+        self.assertEqual(ISMLcore.searchIndex(self.index, "steel with"), set(["rust"]))
+
+    def testShortTermsMatchTheBeginningOfWords(self):
+        self.assertEqual(ISMLcore.searchIndex(self.index, "wo"), set(["wood"]))
+        self.assertEqual(ISMLcore.searchIndex(self.index, "ak"), set())
+        self.assertEqual(ISMLcore.searchIndex(self.index, "pa"), set(["rust"]))  # "paint", not "projectA"
+
+    def testEveryTermMustMatch(self):
+        self.assertEqual(ISMLcore.searchIndex(self.index, "metal projectb"), set(["rust"]))
+        self.assertEqual(ISMLcore.searchIndex(self.index, "metal wood"), set())
+        self.assertEqual(ISMLcore.searchIndex(self.index, "  "), set(["metal", "wood", "rust"]))
+
+    def testChangedAndRemovedDocuments(self):
+        ISMLcore.addToSearchIndex(self.index, "wood", name="wood_oak_0004", tag="Floor", project="projectA")
+        self.assertEqual(ISMLcore.searchIndex(self.index, "wood"), set(["wood"]))
+        self.assertEqual(ISMLcore.searchIndex(self.index, "0003"), set())
+        self.assertEqual(ISMLcore.searchIndex(self.index, "fl"), set(["wood"]))
+        self.assertEqual(ISMLcore.getSearchIndexFields(self.index, "wood")["tag"], "Floor")
+
+        ISMLcore.removeFromSearchIndex(self.index, "rust")
+        ISMLcore.removeFromSearchIndex(self.index, "missing")
+        self.assertEqual(ISMLcore.searchIndex(self.index, "steel"), set(["metal"]))
+        self.assertEqual(ISMLcore.searchIndex(self.index, "pa"), set())
+        self.assertEqual(ISMLcore.getSearchIndexFields(self.index, "rust"), None)
+        self.assertNotIn("paint", self.index["tokens"])
+
+
+if __name__ == "__main__":
+    unittest.main()
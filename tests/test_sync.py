@@ -0,0 +1,53 @@
+import os
+import json
+import unittest
+
+from helpers import makeTempDir, writeFile
+import ISMLcore
+
+
+class SyncTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = makeTempDir(self)
+        self.source = os.path.join(self.tempDir, "projectA")
+        self.destination = os.path.join(self.tempDir, "copy")
+        writeFile(os.path.join(self.source, "metal", "metal_0001.ma"), "//Maya ASCII 2020 scene\n")
+        writeFile(os.path.join(self.source, "metal", "textures", "rust.png"), "rust")
+        self.journalPath = os.path.join(self.tempDir, "maya", "ISMLsyncJournal.json")
+
+    def testReportDoesntWriteTheJournal(self):
+        self.assertEqual(ISMLcore.main(["sync", self.source, self.destination, "--report", "--journal", self.journalPath]), 0)
+        self.assertFalse(os.path.exists(os.path.dirname(self.journalPath)))
+        self.assertFalse(os.path.exists(self.destination))
+
+    def testReportKeepsTheJournalOfAnInterruptedSync(self):
+        ISMLcore.startJournal(self.journalPath, {"source": self.source, "destination": self.destination})
+        with open(self.journalPath, "a") as journal:
+            journal.write("%s\n" % json.dumps({"done": "metal/metal_0001.ma", "size": 1, "mtime": 1}))
+        with open(self.journalPath, "r") as journal:
+            text = journal.read()
+        ISMLcore.main(["sync", self.source, self.destination, "--report", "--journal", self.journalPath])
+        with open(self.journalPath, "r") as journal:
+            self.assertEqual(journal.read(), text)
+
+    def testSyncCreatesTheJournalFolder(self):
+        job = ISMLcore.planSync(self.source, self.destination, journalPath=self.journalPath)
+        self.assertEqual(job["files"], 2)
+        stats = ISMLcore.runSync(job, self.journalPath, workers=2)
+        self.assertEqual(stats["failed"], [])
+        self.assertEqual(stats["copied"], 2)
+        self.assertTrue(os.path.isfile(os.path.join(self.destination, "metal", "textures", "rust.png")))
+        self.assertFalse(os.path.exists(self.journalPath))  # Removed once everything was synced
+
+    def testLockAndTempFilesArentSynced(self):
+        writeFile(os.path.join(self.source, "metal", "metal_0001.ma.lock"), "")
+        writeFile(os.path.join(self.source, "metal", ".metal_0002.ma.tmp"), "")
+        writeFile(os.path.join(self.destination, "metal", "metal_0001.ma.1234.5678.tmp"), "")
+        job = ISMLcore.planSync(self.source, self.destination, mirror=True)
+        self.assertEqual(sorted(relPath for relPath, size, mtime in job["copy"]),
+                         [os.path.join("metal", "metal_0001.ma"), os.path.join("metal", "textures", "rust.png")])
+        self.assertEqual(job["delete"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
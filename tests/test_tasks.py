@@ -0,0 +1,81 @@
+import time
+import threading
+import unittest
+
+from helpers import runDispatched
+import ISMLcore
+
+
+class TaskExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.dispatched = []
+        self.states = []
+        self.executor = ISMLcore.startTaskExecutor(self.dispatched.append, listener=self.taskChanged, workers=1)
+
+    def tearDown(self):
+        ISMLcore.stopTaskExecutor(self.executor)
+
+    def taskChanged(self, task):
+        self.states.append((task["name"], task["state"]))
+
+    def testTasksRunInOrder(self):
+        results = []
+        for i in range(5):
+            ISMLcore.submitTask(self.executor, "Task %s" % i, lambda i=i: i, onDone=results.append)
+        runDispatched(self.executor, self.dispatched)
+        self.assertEqual(results, [0, 1, 2, 3, 4])
+        self.assertEqual(ISMLcore.getActiveTasks(self.executor), [])
+
+    def testTaskIsRunningWhileItRuns(self):
+        seen = []
+        task = ISMLcore.submitTask(self.executor, "Task", lambda: seen.append(task["state"]))
+        runDispatched(self.executor, self.dispatched)
+        self.assertEqual(seen, ["running"])
+        self.assertEqual(task["state"], "done")
+
+    def testQueuedTaskIsCancelled(self):
+        release = threading.Event()
+        ISMLcore.submitTask(self.executor, "Blocking", lambda: release.wait(10))
+        ran = []
+        task = ISMLcore.submitTask(self.executor, "Queued", lambda: ran.append(True), onDone=ran.append)
+        ISMLcore.cancelTask(self.executor, task)
+        self.assertEqual(task["state"], "cancelled")
+        self.assertEqual([activeTask["name"] for activeTask in ISMLcore.getActiveTasks(self.executor)], ["Blocking"])
+        release.set()
+        runDispatched(self.executor, self.dispatched)
+        self.assertEqual(ran, [])
+        self.assertNotIn(("Queued", "running"), self.states)
+
+    def testRunningTaskStopsAtTheNextProgress(self):
+        started = threading.Event()
+        results = []
+
+        def copyFiles(progress):
+            started.set()
+            for i in range(1000):
+                if progress(i, 1000, i, 1000) is False:
+                    return i
+                time.sleep(0.01)
+            return 1000
+        task = ISMLcore.submitTask(self.executor, "Copying", copyFiles, onDone=results.append, withProgress=True)
+        started.wait(10)
+        ISMLcore.cancelTask(self.executor, task)
+        runDispatched(self.executor, self.dispatched)
+        self.assertEqual(task["state"], "cancelled")
+        self.assertTrue(results[0] < 1000)
+
+    def testErrorGoesToOnError(self):
+        errors = []
+
+        def fail():
+            raise IOError("The share is gone")
+        task = ISMLcore.submitTask(self.executor, "Failing", fail, onDone=self.fail, onError=errors.append)
+        ISMLcore.submitTask(self.executor, "Next", lambda: None)
+        runDispatched(self.executor, self.dispatched)
+        self.assertEqual(task["state"], "failed")
+        self.assertEqual([str(error) for error in errors], ["The share is gone"])
+        self.assertIn(("Next", "done"), self.states)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import os
+import unittest
+
+from helpers import makeTempDir, writeFile, readFile
+import ISMLcore
+
+
+class TransferTextureTest(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = makeTempDir(self)
+        self.src = os.path.join(self.tempDir, "rust.png")
+        self.dst = os.path.join(self.tempDir, "rust_copy.png")
+
+    def tearDown(self):
+        ISMLcore.fileHashCache.clear()
+
+    def testIdenticalTextureIsSkipped(self):
+        writeFile(self.src, "rust", 1000000000)
+        writeFile(self.dst, "rust", 1000000000)
+        self.assertEqual(ISMLcore.transferTexture(self.src, self.dst), ("skipped", 4))
+
+    def testTextureChangedWithinTheMtimeStepIsCopied(self):
+        writeFile(self.src, "rust", 1000000000)
+        self.assertEqual(ISMLcore.transferTexture(self.src, self.dst), ("copied", 4))
+        ISMLcore.hashFile(self.src)
+        writeFile(self.src, "dust", 1000000001)  # Same size, saved again a second later
+        self.assertEqual(ISMLcore.transferTexture(self.src, self.dst), ("copied", 4))
+        self.assertEqual(readFile(self.dst), "dust")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+import unittest
+
+from helpers import makeTempDir, writeFile, readFile
+import ISMLcore
+
+
+class VersionNameTest(unittest.TestCase):
+    def testNumberedNames(self):
+        self.assertEqual(ISMLcore.splitVersionName("wall_0003.ma"), ("wall", 3, ".ma"))
+        self.assertEqual(ISMLcore.splitVersionName("wall_01000.mb"), ("wall", 1000, ".mb"))
+        self.assertEqual(ISMLcore.formatVersionName("wall", 3, ".ma"), "wall_0003.ma")
+        self.assertEqual(ISMLcore.formatVersionName("wall", 1000, ".ma"), "wall_01000.ma")
+
+    def testYearIsNotAVersion(self):
+        self.assertEqual(ISMLcore.splitVersionName("wall_2020.ma"), ("wall_2020", 1, ".ma"))
+
+
+class ReserveVersionTest(unittest.TestCase):
+    def setUp(self):
+        self.mtlDir = makeTempDir(self)
+        self.shaderPath = os.path.join(self.mtlDir, "wall_0001.ma")
+        writeFile(self.shaderPath, "//Maya ASCII 2020 scene\n")
+        self.exportDir = makeTempDir(self)
+        self.exportPath = os.path.join(self.exportDir, "export.ma")
+        writeFile(self.exportPath, "//Maya ASCII 2020 scene\n//New\n")
+
+    def tearDown(self):
+        ISMLcore.versionIndex.clear()
+
+    def testReservedVersionIsHiddenUntilPublished(self):
+        versionPath = ISMLcore.reserveVersionPath(self.shaderPath)
+        self.assertEqual(os.path.basename(versionPath), "wall_0002.ma")
+        self.assertFalse(os.path.exists(versionPath))
+        self.assertEqual(ISMLcore.getVersionPaths(self.mtlDir), [self.shaderPath])
+
+        ISMLcore.publishReservedVersion(self.exportPath, versionPath)
+        with open(versionPath, "r") as versionFile:
+            self.assertEqual(versionFile.read(), "//Maya ASCII 2020 scene\n//New\n")
+        self.assertEqual(sorted(os.listdir(self.mtlDir)), ["wall_0001.ma", "wall_0002.ma"])
+
+    def testConcurrentReservationsGetOwnNumbers(self):
+        versionPaths = []
+        threads = [threading.Thread(target=lambda: versionPaths.append(ISMLcore.reserveVersionPath(self.shaderPath))) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(os.path.basename(versionPath) for versionPath in versionPaths), ["wall_%04d.ma" % i for i in range(2, 10)])
+
+    def testReleasedNumberIsReused(self):
+        versionPath = ISMLcore.reserveVersionPath(self.shaderPath)
+        ISMLcore.releaseVersionPath(versionPath)
+        self.assertEqual(ISMLcore.reserveVersionPath(self.shaderPath), versionPath)
+
+    def testNamesWithYearsDontRaiseTheNumber(self):
+        writeFile(os.path.join(self.mtlDir, "wall_2020.ma"), "")
+        self.assertEqual(os.path.basename(ISMLcore.reserveVersionPath(self.shaderPath)), "wall_0002.ma")
+
+
+class VersionStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.shaderDir = makeTempDir(self)
+        self.mtlDir = os.path.join(self.shaderDir, "wall")
+        os.mkdir(self.mtlDir)
+        self.versionPaths = []
+        for i in range(1, 4):
+            versionPath = os.path.join(self.mtlDir, "wall_%04d.ma" % i)
+            nodes = ['createNode file -n "file%s";\n\tsetAttr ".ftn" -type "string" "%s";\n' % (j, "x" * 20000) for j in range(3)]
+            writeFile(versionPath, "//Maya ASCII 2020 scene\n" + "".join(nodes) + 'createNode blinn -n "wall%s";\n' % i)
+            self.versionPaths.append(versionPath)
+        self.rebuiltVersionDir = ISMLcore.rebuiltVersionDir
+        ISMLcore.rebuiltVersionDir = os.path.join(self.shaderDir, "rebuilt")
+
+    def tearDown(self):
+        ISMLcore.rebuiltVersionDir = self.rebuiltVersionDir
+        ISMLcore.versionIndex.clear()
+        ISMLcore.catalogCache.clear()
+
+    def testPackedVersionIsRebuiltAndReleased(self):
+        content = readFile(self.versionPaths[0])
+        ISMLcore.packVersion(self.versionPaths[0])
+        ISMLcore.packVersion(self.versionPaths[1])
+        self.assertFalse(os.path.exists(self.versionPaths[0]))
+        self.assertTrue(os.path.isfile(self.versionPaths[0] + ISMLcore.versionManifestExt))
+        self.assertTrue(ISMLcore.getShaderVersions(self.mtlDir)[0]["packed"])
+
+        rebuiltPath = ISMLcore.materializeVersion(self.versionPaths[0])
+        self.assertEqual(readFile(rebuiltPath), content)
+        ISMLcore.releaseVersion(rebuiltPath)
+        self.assertEqual(os.listdir(ISMLcore.rebuiltVersionDir), [])
+        self.assertEqual(ISMLcore.materializeVersion(self.versionPaths[2]), self.versionPaths[2])
+        ISMLcore.releaseVersion(self.versionPaths[2])
+        self.assertTrue(os.path.isfile(self.versionPaths[2]))
+
+    def testAllButTheNewestVersionArePacked(self):
+        warnings = []
+        packed, savedBytes = ISMLcore.packOldVersions([self.shaderDir], warnings)
+        self.assertEqual((packed, warnings), (2, []))
+        self.assertTrue(savedBytes > 60000)  # The file nodes of the second version are stored once
+        self.assertEqual(sorted(os.listdir(self.mtlDir)), ["wall_0001.ma" + ISMLcore.versionManifestExt, "wall_0002.ma" + ISMLcore.versionManifestExt, "wall_0003.ma"])
+        self.assertEqual(ISMLcore.packOldVersions([self.shaderDir], warnings), (0, 0))
+
+    def testNewVersionKeepsItsAuthor(self):
+        versionPath = os.path.join(self.mtlDir, "wall_0004.ma")
+        writeFile(versionPath, "//Maya ASCII 2020 scene\n")
+        versions = ISMLcore.addShaderVersion(versionPath, "anna")
+        self.assertEqual([(version["number"], version["author"]) for version in versions][-2 :], [(3, ""), (4, "anna")])
+        self.assertEqual(ISMLcore.getLatestVersionPath(self.mtlDir), versionPath)
+        self.assertEqual(ISMLcore.readMetadataFile(versionPath)["authors"], {"wall_0004.ma": "anna"})
+
+    def testOldRebuiltVersionsArePruned(self):
+        ISMLcore.packVersion(self.versionPaths[0])
+        leftPath = ISMLcore.materializeVersion(self.versionPaths[0])  # Never released, like after a crash
+        oldTime = time.time() - ISMLcore.rebuiltVersionAge - 10
+        os.utime(os.path.dirname(leftPath), (oldTime, oldTime))
+        rebuiltPath = ISMLcore.materializeVersion(self.versionPaths[0])
+        self.assertEqual(os.listdir(ISMLcore.rebuiltVersionDir), [os.path.basename(os.path.dirname(rebuiltPath))])
+
+    def testStorePruningKeepsChunksOfPackedVersions(self):
+        ISMLcore.packVersion(self.versionPaths[0])
+        ISMLcore.packVersion(self.versionPaths[1])
+        self.assertEqual(ISMLcore.pruneVersionStore(self.shaderDir), (0, 0))
+        os.remove(self.versionPaths[1] + ISMLcore.versionManifestExt)
+        removed, removedBytes = ISMLcore.pruneVersionStore(self.shaderDir)
+        self.assertEqual(removed, 1)  # Only the chunk with "wall2", the file nodes are shared
+        rebuiltPath = ISMLcore.materializeVersion(self.versionPaths[0])
+        self.assertIn('createNode blinn -n "wall1";', readFile(rebuiltPath))
+
+
+if __name__ == "__main__":
+    unittest.main()